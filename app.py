@@ -5,8 +5,32 @@ A comprehensive Streamlit application for exploring the Taj Mahal
 
 import streamlit as st
 import folium
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
+import dataclasses
 from datetime import datetime
+from html import escape
+import math
+import time
+
+from tour_guide.answers import FALLBACK_SOURCE, answer_service_from_env
+from tour_guide.chatbot import answer_kind
+from tour_guide.history import ChatHistory
+from tour_guide.images import prefetch_link_html, site_image_sets
+from tour_guide.live_map import LIVE_MAP_MODE, live_map, map_layout, map_mode_from_env, publish_layout
+from tour_guide.content import ContentError, DEFAULT_LANGUAGE, DEFAULT_SITE_KEY, LANGUAGE_NAMES, Tour
+from tour_guide.crowds import expected_wait_seconds, occupancy_tracker_from_env
+from tour_guide.geo import site_stop_index
+from tour_guide.metrics import metrics_from_env
+from tour_guide.paths import site_walking_paths
+from tour_guide.persistence import new_session_token, session_store_from_env
+from tour_guide.prefetch import prefetcher_from_env
+from tour_guide.question_log import question_log_from_env
+from tour_guide.reload import DEFAULT_WARM_STEPS, content_watcher_from_env
+from tour_guide.rendering import PAGE_CSS, build_map, render_location_panel
+from tour_guide.routing import RoutePlanner
+from tour_guide.shared_store import map_key, shared_store_from_env
+from tour_guide.sites import SiteRegistry
+from tour_guide.tiles import tile_layer_from_env
 
 # Page configuration
 st.set_page_config(
@@ -17,490 +41,678 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
-    <style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #8B4513;
-        text-align: center;
-        padding: 1rem 0;
-        border-bottom: 3px solid #DAA520;
-        margin-bottom: 1rem;
-    }
-    .location-title {
-        font-size: 2rem;
-        color: #8B4513;
-        margin-bottom: 1rem;
-    }
-    .progress-indicator {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        text-align: center;
-        margin-bottom: 1rem;
-        font-size: 1.2rem;
-        color: #8B4513;
-    }
-    .info-section {
-        background-color: #FFF8DC;
-        padding: 1.5rem;
-        border-radius: 0.5rem;
-        margin-bottom: 1rem;
-        border-left: 4px solid #DAA520;
-    }
-    .navigation-section {
-        background-color: #E6F3FF;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-top: 1rem;
-        border-left: 4px solid #4682B4;
-    }
-    .chatbot-message {
-        padding: 0.8rem;
-        border-radius: 0.5rem;
-        margin-bottom: 0.5rem;
-    }
-    .user-message {
-        background-color: #E3F2FD;
-        text-align: right;
-    }
-    .bot-message {
-        background-color: #F5F5F5;
-    }
-    .stButton>button {
-        width: 100%;
-        background-color: #8B4513;
-        color: white;
-        font-weight: bold;
-        border-radius: 0.5rem;
-        padding: 0.5rem 1rem;
-    }
-    .stButton>button:hover {
-        background-color: #A0522D;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Location data structure
-LOCATIONS = {
-    "west_gate": {
-        "name": "West Gate (Entry Point)",
-        "coordinates": [27.1738, 78.0405],
-        "description": "Your journey begins at the West Gate, one of the three main entrances to the Taj Mahal complex. This red sandstone gateway was constructed in the 1630s as part of Shah Jahan's grand vision. The gate features intricate Islamic calligraphy and geometric patterns that set the tone for the architectural marvels ahead.",
-        "historical_significance": "The West Gate served as a principal entrance for dignitaries and royal visitors during the Mughal era. Its design reflects the transition from defensive architecture to ornamental gateways, symbolizing the shift from military to cultural dominance of the Mughal Empire. The gate's inscriptions include verses from the Quran, welcoming visitors to this earthly paradise.",
-        "architectural_features": [
-            "Constructed from locally quarried red sandstone",
-            "Features 22 small domes representing the 22 years of construction",
-            "Octagonal towers on each corner reaching 30 feet in height",
-            "Decorated with floral motifs and Arabic calligraphy",
-            "Original wooden doors with brass fittings still intact"
-        ],
-        "visitor_tips": [
-            "Arrive early morning (6-7 AM) to avoid crowds",
-            "Security check required - avoid bringing large bags",
-            "Photography is permitted at this location",
-            "Ticket counters are located adjacent to this gate"
-        ],
-        "next_directions": "Walk straight ahead through the entrance corridor. The Main Gateway will be visible approximately 150 meters ahead.",
-        "walking_time": "2-3 minutes",
-        "walking_distance": "150 meters",
-        "best_photo_spot": "Frame the entrance arch with the pathway leading inward"
-    },
-    "main_gateway": {
-        "name": "Main Gateway (Darwaza-i-rauza)",
-        "coordinates": [27.1744, 78.0418],
-        "description": "The magnificent Main Gateway, known as Darwaza-i-rauza, stands 30 meters tall and serves as the ceremonial entrance to the inner complex. Built entirely of red sandstone with white marble inlays, this monumental structure was completed in 1648. The gateway frames your first breathtaking view of the Taj Mahal's white marble dome.",
-        "historical_significance": "The Main Gateway represents the threshold between the earthly realm and the paradise garden beyond. Shah Jahan commissioned this structure to create anticipation and wonder, with its central arch precisely framing the Taj Mahal when viewed from the entrance. The inscriptions above the archways are verses from the Quran inviting the faithful to enter paradise, drawing parallels between the garden complex and Islamic concepts of heaven.",
-        "architectural_features": [
-            "Central iwan (vaulted hall) stands 30 meters high",
-            "Decorated with intricate pietra dura (stone inlay work)",
-            "Features 11 white marble chhatris (domed pavilions) on the roof",
-            "Quranic verses inlaid in black marble using Thuluth script",
-            "Four octagonal towers at corners, each topped with a chhatri",
-            "Interior ceiling decorated with geometric patterns and floral designs"
-        ],
-        "visitor_tips": [
-            "This is the most iconic first-view spot for photography",
-            "Morning light provides the best illumination of the Taj Mahal through the arch",
-            "Take time to examine the detailed inlay work up close",
-            "Notice how the gateway perfectly frames the mausoleum"
-        ],
-        "next_directions": "Pass through the central archway and descend the steps into the Charbagh Gardens. Follow the central marble pathway straight ahead.",
-        "walking_time": "3-4 minutes",
-        "walking_distance": "250 meters",
-        "best_photo_spot": "Stand centered under the main arch for the classic framed view of the Taj Mahal"
-    },
-    "charbagh_gardens": {
-        "name": "Charbagh Gardens",
-        "coordinates": [27.1748, 78.0418],
-        "description": "The Charbagh Gardens exemplify the Persian concept of paradise on earth, divided into four quadrants by water channels representing the four rivers of paradise mentioned in the Quran. Originally planted with fruit trees, roses, and narcissus, the 300-meter long garden was designed to symbolize abundance and the beauty of creation. The meticulous symmetry reflects Mughal ideals of harmony and order.",
-        "historical_significance": "The term 'Charbagh' literally means 'four gardens' in Persian, a design principle that the Mughals brought from Central Asia. This layout represents the Islamic concept of paradise described in the Quran, with four rivers flowing through eternal gardens. Emperor Babur, founder of the Mughal dynasty, first introduced this garden style to India in the early 16th century, and Shah Jahan perfected it at the Taj Mahal. The gardens were maintained by over 40 gardeners during the Mughal period.",
-        "architectural_features": [
-            "Covers approximately 300 square meters",
-            "Divided into 16 sunken parterres (flower beds)",
-            "Central water channel with fountains (originally 100 fountains)",
-            "Raised pathways made of red sandstone",
-            "Four main water channels intersecting at a raised lotus pool",
-            "Originally featured cypress trees symbolizing death and fruit trees symbolizing life",
-            "Underground water system still functional after 370 years"
-        ],
-        "visitor_tips": [
-            "Walk along the side pathways for varied photo perspectives",
-            "The fountains operate during specific hours - check schedule",
-            "Early morning provides the best light for garden photography",
-            "Benches along the pathways offer rest spots with excellent views"
-        ],
-        "next_directions": "Continue along the central marble pathway toward the Reflecting Pool, which lies approximately 100 meters ahead at the garden's center.",
-        "walking_time": "2 minutes",
-        "walking_distance": "100 meters",
-        "best_photo_spot": "From the raised pathways on either side for symmetrical garden views"
-    },
-    "reflecting_pool": {
-        "name": "Reflecting Pool",
-        "coordinates": [27.1751, 78.0421],
-        "description": "The Reflecting Pool (Hauz-al-Kawthar) serves as the focal point of the Charbagh Gardens, creating a perfect mirror image of the Taj Mahal on calm days. This 60-meter long pool was designed to reflect the sky and the mausoleum, doubling the visual impact of the monument. The pool's name references the Tank of Abundance in Islamic paradise.",
-        "historical_significance": "Named after the celestial pool of abundance described in Islamic texts, this reflecting pool serves both aesthetic and symbolic purposes. In Mughal architecture, water represented life, purity, and the reflection of divine beauty. The pool's reflection creates an illusion of the Taj Mahal floating between heaven and earth. During Shah Jahan's time, the pool was adorned with floating lotus flowers and rose petals during special ceremonies, and moonlight viewing parties were held here for the royal court.",
-        "architectural_features": [
-            "Measures 60 meters in length and 7 meters in width",
-            "Depth of approximately 1.5 meters",
-            "Constructed with red sandstone lining",
-            "Fed by underground water channels from the Yamuna River",
-            "Originally had a raised marble platform at its center",
-            "Perfectly aligned with the central axis of the Taj Mahal",
-            "Surrounded by sandstone pathways for viewing"
-        ],
-        "visitor_tips": [
-            "Best viewed early morning or late afternoon for clearest reflections",
-            "Avoid windy days if you want perfect mirror reflections",
-            "This is one of the most photographed spots - arrive early",
-            "The reflection is most dramatic during sunrise and sunset",
-            "Moonlight viewings (check schedule) offer ethereal reflections"
-        ],
-        "next_directions": "Continue straight along the central pathway, ascending the marble steps to reach the raised platform (plinth) of the Main Tomb, located 150 meters ahead.",
-        "walking_time": "3-4 minutes",
-        "walking_distance": "150 meters",
-        "best_photo_spot": "Low angle from the northern edge to capture the reflection with the Taj Mahal"
-    },
-    "main_tomb": {
-        "name": "Main Tomb (Rauza)",
-        "coordinates": [27.1751, 78.0421],
-        "description": "The heart of the Taj Mahal complex, the Main Tomb (Rauza) is a masterpiece of Mughal architecture that took 22 years to complete (1632-1654). Standing 73 meters tall, the white marble mausoleum houses the cenotaphs of Mumtaz Mahal and Shah Jahan. Over 20,000 artisans, including calligraphers from Persia, sculptors from Bukhara, and inlay specialists from Delhi worked on this eternal monument to love.",
-        "historical_significance": "Emperor Shah Jahan commissioned this mausoleum following the death of his beloved wife, Mumtaz Mahal, who died in 1631 during childbirth of their 14th child. The name 'Taj Mahal' is believed to derive from her full name 'Mumtaz Mahal' meaning 'Crown of the Palace.' Construction required materials from across Asia: white marble from Rajasthan, jade and crystal from China, turquoise from Tibet, lapis lazuli from Afghanistan, and sapphires from Sri Lanka. The tomb represents the pinnacle of Mughal architecture, combining elements from Persian, Islamic, and Indian architectural traditions. Shah Jahan himself was later interred here beside his wife after his death in 1666.",
-        "architectural_features": [
-            "Central dome reaches 73 meters (240 feet) in height and 17 meters in diameter",
-            "Constructed from translucent white Makrana marble that changes color with sunlight",
-            "Features 28 types of precious and semi-precious stones in pietra dura inlay work",
-            "Four minarets, each 40 meters tall, positioned at corners (deliberately tilted outward for earthquake protection)",
-            "Octagonal base structure measuring 95 meters on each side",
-            "Interior ceiling decorated with sun motif symbolizing God",
-            "Intricate jali (lattice) screens surrounding the cenotaphs",
-            "Exterior verses from the Quran inscribed in black marble",
-            "Double dome construction: outer ornamental dome and inner acoustic dome",
-            "Symmetrical design with four iwans (arched entrances) on each facade"
-        ],
-        "visitor_tips": [
-            "Remove shoes before entering the mausoleum (shoe covers provided)",
-            "Photography prohibited inside the tomb chamber",
-            "Speak softly inside - the acoustics amplify sound",
-            "The marble changes color: pinkish in morning, milky white in afternoon, golden at sunset",
-            "Actual graves are in a crypt below; the interior houses cenotaphs (decorative markers)",
-            "Examine the pietra dura work closely - some flowers contain 64 individual stone pieces",
-            "Circumambulate the tomb to see it from all angles"
-        ],
-        "next_directions": "Exit the tomb and walk to your left (west) side. The Red Sandstone Mosque is located approximately 80 meters away on the western side of the platform.",
-        "walking_time": "2 minutes",
-        "walking_distance": "80 meters",
-        "best_photo_spot": "From the corners of the platform for dramatic angle shots, or from the steps for classic frontal views"
-    },
-    "mosque": {
-        "name": "Red Sandstone Mosque",
-        "coordinates": [27.1749, 78.0415],
-        "description": "The Red Sandstone Mosque, located on the western side of the Taj Mahal complex, serves as a fully functional place of worship. Built in 1648, this three-domed mosque is constructed from red sandstone with marble accents. The mosque exemplifies traditional Mughal mosque architecture and provides architectural balance to the complex by mirroring the Guest House on the eastern side.",
-        "historical_significance": "In Islamic tradition, mosques are always oriented toward Mecca (facing west), which is why this mosque occupies the western position in the complex. Shah Jahan commissioned this mosque not only for religious purposes but also to sanctify the entire complex as a holy site. The mosque continues to serve worshippers today, making the Taj Mahal more than just a monument - it remains a living religious space. During the Mughal era, prayers were conducted here five times daily, with special gatherings on Fridays. The mosque's placement also served to fulfill Islamic requirements for proper burial of the faithful within sight of a place of worship.",
-        "architectural_features": [
-            "Three marble domes with finials pointing toward the sky",
-            "Constructed primarily from red sandstone with white marble detailing",
-            "Prayer hall measures approximately 60 meters in length",
-            "Features three arched entrances (iwans) on the eastern facade",
-            "Interior has traditional mihrab (prayer niche) pointing toward Mecca",
-            "Minbar (pulpit) for delivering sermons on Fridays",
-            "Floor covered with 569 prayer mats outlined in black marble",
-            "Walls decorated with Quranic inscriptions",
-            "Two small minarets flanking the main structure"
-        ],
-        "visitor_tips": [
-            "Non-Muslims may view from the entrance but should respect prayer times",
-            "Remove shoes before entering the mosque premises",
-            "Dress modestly - shoulders and knees should be covered",
-            "During prayer times (check schedule), maintain silence nearby",
-            "The mosque offers excellent views of the Taj Mahal from its courtyard",
-            "Morning light beautifully illuminates the red sandstone"
-        ],
-        "next_directions": "Walk back across the platform, passing in front of the Main Tomb, to reach the Guest House (Mihman Khana) on the eastern side, approximately 160 meters away.",
-        "walking_time": "3-4 minutes",
-        "walking_distance": "160 meters",
-        "best_photo_spot": "From the mosque's courtyard for side views of the Taj Mahal"
-    },
-    "guest_house": {
-        "name": "Guest House (Mihman Khana)",
-        "coordinates": [27.1749, 78.0427],
-        "description": "The Guest House (Mihman Khana) architecturally mirrors the mosque on the opposite side, maintaining the complex's perfect symmetry. Constructed from the same red sandstone with marble accents, this building served as a gathering place for pilgrims and visitors. While identical in appearance to the mosque, it faces east and served secular rather than religious purposes.",
-        "historical_significance": "The Guest House exemplifies the Mughal principle of architectural balance and symmetry. Built simultaneously with the mosque between 1643-1648, it was designed to serve multiple purposes: accommodating pilgrims visiting Mumtaz Mahal's tomb, hosting visitors to the complex, and providing a resting place for travelers. The building also served as a jawab (answer) to the mosque, creating perfect bilateral symmetry essential to Mughal architectural philosophy. During the Mughal period, the guest house hosted poetry readings, musical performances, and gatherings of scholars and artists, making it a center of cultural activity.",
-        "architectural_features": [
-            "Identical dimensions to the mosque: approximately 60 meters in length",
-            "Three domes matching the mosque's design",
-            "Constructed from red sandstone with white marble inlay work",
-            "Three arched entrances mirroring the mosque's facade",
-            "Interior features decorative niches and chambers",
-            "Original purpose was for assembly rather than prayer",
-            "No mihrab or Islamic prayer elements in the interior",
-            "Ventilation system designed to keep interior cool"
-        ],
-        "visitor_tips": [
-            "Provides excellent photographic angles of the Taj Mahal",
-            "Less crowded than the mosque, offering peaceful viewing",
-            "Interior is usually open for exploration",
-            "Compare the symmetry between this building and the mosque",
-            "Late afternoon light beautifully illuminates the red sandstone",
-            "Good spot for resting with shade and seating areas"
-        ],
-        "next_directions": "Walk down the steps from the main platform and follow the eastern pathway through the gardens toward the East Gate, located approximately 350 meters ahead.",
-        "walking_time": "5-6 minutes",
-        "walking_distance": "350 meters",
-        "best_photo_spot": "From the Guest House courtyard for eastern perspective views of the Taj Mahal"
-    },
-    "east_gate": {
-        "name": "East Gate (Exit Point)",
-        "coordinates": [27.1756, 78.0433],
-        "description": "The East Gate serves as the primary exit for the Taj Mahal complex, though it can also be used as an entrance. This red sandstone gateway, similar in style to the West Gate, provides a contemplative conclusion to your visit. The gate opens onto the Yamuna River bank, offering final views of the mausoleum's riverside profile.",
-        "historical_significance": "The East Gate was primarily used by the royal family and special dignitaries arriving by boat via the Yamuna River. During the Mughal era, the river served as a major transportation route, and elaborate boat processions would arrive at this gate. The gate also provided access to the moonlight garden (Mahtab Bagh) across the river, where Shah Jahan would view the Taj Mahal's reflection in the moonlight. Historical accounts suggest that Shah Jahan planned to build a black marble replica of the Taj Mahal for himself across the river, though this project never materialized.",
-        "architectural_features": [
-            "Constructed from red sandstone matching other gates",
-            "Features ornamental domes and chhatris",
-            "Inscriptions include verses welcoming departed souls to paradise",
-            "Octagonal towers at corners",
-            "Originally had wooden doors with brass decorations",
-            "Steps leading down to the river bank (restricted area now)"
-        ],
-        "visitor_tips": [
-            "Shops and facilities available outside this gate",
-            "Provides access to restrooms and refreshments",
-            "Look back for a final view of the Taj Mahal before exiting",
-            "River view offers a different perspective (from outside the walls)",
-            "Auto-rickshaws and transportation readily available",
-            "Consider visiting Mahtab Bagh across the river for sunset views"
-        ],
-        "next_directions": "Your tour is complete. Thank you for visiting the Taj Mahal virtually. For actual visits, transportation and facilities are available outside this gate.",
-        "walking_time": "N/A",
-        "walking_distance": "N/A",
-        "best_photo_spot": "Final farewell shot looking back at the Taj Mahal from the exit pathway"
-    }
-}
-
-# Define tour modes
-TOUR_MODES = {
-    "complete": {
-        "name": "Complete Tour",
-        "duration": "60 minutes",
-        "locations": ["west_gate", "main_gateway", "charbagh_gardens", "reflecting_pool", "main_tomb", "mosque", "guest_house", "east_gate"],
-        "description": "Experience all 8 locations with comprehensive historical information and architectural details."
-    },
-    "express": {
-        "name": "Express Tour",
-        "duration": "25 minutes",
-        "locations": ["west_gate", "main_gateway", "main_tomb", "east_gate"],
-        "description": "Visit the 4 essential locations focusing on the main highlights of the Taj Mahal."
-    },
-    "photography": {
-        "name": "Photography Tour",
-        "duration": "40 minutes",
-        "locations": ["west_gate", "main_gateway", "reflecting_pool", "main_tomb", "east_gate"],
-        "description": "Focus on the 5 best photo spots with camera tips and composition guidance."
-    }
-}
-
-# Chatbot knowledge base
-CHATBOT_RESPONSES = {
-    "who built": "The Taj Mahal was commissioned by Mughal Emperor Shah Jahan in 1632, in memory of his beloved wife Mumtaz Mahal, who died during childbirth in 1631. The monument took 22 years to complete (1632-1654) and required over 20,000 artisans, including master craftsmen from Persia, the Ottoman Empire, and Europe. The chief architect is believed to be Ustad Ahmad Lahauri, though multiple architects contributed to the design.",
-
-    "when built": "Construction of the Taj Mahal began in 1632 and was completed in 1654, taking 22 years in total. The main mausoleum was finished by 1648, but the surrounding complex, including the mosque, guest house, and outer courtyard, required an additional 6 years. Shah Jahan spared no expense, and the project cost approximately 32 million rupees at the time (equivalent to over $1 billion today).",
-
-    "best photo": "The best photo spots at the Taj Mahal are:\n1. **Main Gateway arch** - Classic framed view (early morning light)\n2. **Reflecting Pool** - Mirror reflections (sunrise/sunset)\n3. **Platform corners** - Dramatic angles with minarets\n4. **Diana Bench** (near reflecting pool) - Princess Diana's iconic spot\n5. **Mosque courtyard** - Side profile views\n\n**Photography Tips:**\n- Arrive at sunrise (6-7 AM) for golden light and fewer crowds\n- Sunset (5-6 PM) provides warm tones\n- Full moon nights offer special viewing (check schedule)\n- Use wide-angle lens for architecture, telephoto for details\n- The marble changes color: pinkish (dawn), white (noon), golden (sunset)",
-
-    "how long": "A thorough visit typically takes 2-3 hours. Here's a breakdown:\n- **Express visit**: 1-1.5 hours (main highlights only)\n- **Standard visit**: 2-3 hours (most locations with moderate pace)\n- **Comprehensive visit**: 3-4 hours (all areas with detailed exploration)\n- **Photography focused**: 2-4 hours (depending on light conditions)\n\nPlan extra time for:\n- Security checks (15-30 minutes)\n- Ticket queues (15-45 minutes, longer on weekends)\n- Travel to/from your accommodation",
-
-    "what bring": "**Essential Items to Bring:**\n- Valid ID and tickets (printed or digital)\n- Camera or smartphone\n- Water bottle (small, sealed)\n- Sunscreen and hat\n- Comfortable walking shoes\n- Modest clothing (shoulders and knees covered)\n\n**Items NOT Allowed:**\n- Large bags, backpacks\n- Food items (except small sealed water)\n- Tobacco products\n- Tripods (require special permission)\n- Drones\n- Any sharp objects\n\n**Useful Tips:**\n- Carry minimal items to speed through security\n- Shoe covers provided for mausoleum entry\n- Lockers available for prohibited items\n- ATMs and facilities available outside",
-
-    "best time": "**Best Times to Visit:**\n\n**By Season:**\n- **October-March**: Ideal weather (pleasant and cool)\n- **April-June**: Very hot (avoid if possible)\n- **July-September**: Monsoon season (fewer crowds, lush gardens)\n\n**By Time of Day:**\n- **Sunrise (6:00-8:00 AM)**: Best light, fewer crowds, marble glows pinkish\n- **Late Afternoon (4:00-6:00 PM)**: Golden hour light, cooler temperatures\n- **Full Moon Nights**: Special viewings (limited capacity, advance booking required)\n\n**Days to Avoid:**\n- Fridays (mosque closed for prayers)\n- Weekends and Indian holidays (very crowded)\n- Summer midday (extreme heat and harsh light)",
-
-    "ticket": "**Ticket Information:**\n\n**Prices:**\n- Foreign tourists: ₹1,100 (includes all areas)\n- Indian citizens: ₹50\n- Children under 15: Free\n\n**Booking:**\n- Online booking recommended: www.tajmahal.gov.in\n- Tickets available at gate (longer queues)\n- Valid for 3 hours from entry time\n\n**Entry Gates:**\n- West Gate (most popular)\n- East Gate (less crowded)\n- South Gate (for tourists from Agra Fort)\n\n**Important:**\n- Closed on Fridays\n- Open sunrise to sunset (6 AM - 7 PM)\n- Special night viewing on full moon (±2 days)",
-
-    "history": "The Taj Mahal's story begins with a great love and profound loss. In 1631, Mumtaz Mahal, the beloved wife of Emperor Shah Jahan, died during the birth of their 14th child. Devastated, Shah Jahan commissioned the construction of the world's most beautiful mausoleum in her memory.\n\nConstruction began in 1632, requiring:\n- 22 years to complete\n- 20,000+ artisans and craftsmen\n- 1,000 elephants to transport materials\n- Materials from across Asia and the Middle East\n\nThe Taj Mahal survived:\n- British colonial rule (19th century)\n- World War II (scaffolding camouflaged it)\n- Indo-Pakistani wars (protective measures)\n\nIn 1983, UNESCO designated it a World Heritage Site. Today, it attracts 7-8 million visitors annually and stands as a symbol of eternal love.",
-
-    "architecture": "The Taj Mahal represents the pinnacle of Mughal architecture, blending Persian, Islamic, and Indian styles.\n\n**Key Architectural Features:**\n- **Perfect symmetry**: Bilateral symmetry except for Shah Jahan's tomb (added later)\n- **Golden ratio**: Proportions follow mathematical perfection\n- **Materials**: White Makrana marble embedded with 28 types of precious stones\n- **Pietra dura**: Intricate stone inlay work featuring floral designs\n- **Calligraphy**: Quranic verses in Thuluth script\n- **Four minarets**: 40 meters tall, tilted outward for earthquake protection\n- **Central dome**: 73 meters high, double-layered for acoustics\n- **Charbagh garden**: Persian paradise garden concept\n\n**Innovative Features:**\n- Changes color with sunlight (pink at dawn, white at noon, golden at sunset)\n- Minarets designed to fall away from tomb in case of collapse\n- Translucent marble allows light to illuminate interior",
-
-    "default": "I'm here to help you explore the Taj Mahal! I can answer questions about:\n- History and construction (\"Who built it?\" \"When was it built?\")\n- Photography tips (\"Best photo spots?\")\n- Visit planning (\"How long does a tour take?\" \"What should I bring?\")\n- Tickets and timings (\"When should I visit?\" \"How much are tickets?\")\n- Architecture and design (\"Tell me about the architecture\")\n\nWhat would you like to know?"
-}
-
-def get_chatbot_response(user_input):
-    """Generate chatbot response based on user input"""
-    user_input_lower = user_input.lower()
-
-    for keyword, response in CHATBOT_RESPONSES.items():
-        if keyword in user_input_lower:
-            return response
+st.markdown(f"<style>\n{PAGE_CSS}</style>", unsafe_allow_html=True)
+
+# Site content (locations, tours, chatbot knowledge) lives in
+# tour_guide/data/sites. Sites are loaded when a session first selects them
+# and the registry keeps the SITE_CACHE_SIZE most recently used in memory.
+SITE_CACHE_SIZE = 8
+
+@st.cache_resource(show_spinner=False)
+def get_site_registry():
+    """Create the process-wide site registry"""
+    return SiteRegistry(capacity=SITE_CACHE_SIZE)
+
+def get_site(site_key, language=DEFAULT_LANGUAGE):
+    """Return the content for a site in a language, loading it if it is not in memory"""
+    return get_site_registry().get(site_key, language)
+
+# Phase timings and counters; off unless enabled in the environment
+# (see tour_guide/metrics.py)
+@st.cache_resource(show_spinner=False)
+def get_metrics():
+    """Create the process-wide metrics registry and its exporters"""
+    return metrics_from_env()
+
+def rerun(reason):
+    """Count a script rerun triggered by an interaction, then rerun"""
+    get_metrics().increment("reruns_total", reason=reason)
+    st.rerun()
+
+# Chatbot answers are produced on a shared thread pool and streamed into the
+# sidebar; updates are batched to at most one per STREAM_RENDER_INTERVAL seconds
+STREAM_RENDER_INTERVAL = 0.05
+
+@st.cache_resource(show_spinner=False)
+def get_answer_service():
+    """Create the process-wide chatbot answer service"""
+    return answer_service_from_env()
+
+# Questions and the responses they got are logged in the background for
+# tools/question_report.py (see tour_guide/question_log.py)
+@st.cache_resource(show_spinner=False)
+def get_question_log():
+    """Open the process-wide question log, or None if logging is off"""
+    return question_log_from_env()
+
+def log_question(site, question, response_id, source):
+    """Queue a question and its response ID for the question log"""
+    question_log = get_question_log()
+    if question_log is not None:
+        question_log.record(site, question, response_id, source)
+
+# Map tiles come from a local tile cache when one is configured
+# (see tour_guide/tiles.py), otherwise from the public OpenStreetMap servers
+@st.cache_resource(show_spinner=False)
+def get_tile_layer():
+    """Return (tiles, attribution) for the map, starting the local tile server if configured"""
+    return tile_layer_from_env() or ('OpenStreetMap', None)
+
+# Sidebar shortcuts: (button label, question shown in the chat, response key)
+QUICK_QUESTIONS = [
+    ("🏛️ Who built it?", "Who built the {site}?", "who built"),
+    ("📸 Best photo spots?", "Best photo spots?", "best photo"),
+    ("⏱️ How long to visit?", "How long does a tour take?", "how long"),
+]
+
+def create_map(site, current_location, tour_locations):
+    """Create an interactive Folium map with all tour locations"""
+    tiles, attribution = get_tile_layer()
+    return build_map(site, current_location, tour_locations, tiles, attribution)
+
+# Rendered map HTML is shared across sessions, one entry per (site, tour
+# stops, stop); the LRU bound keeps the hot sites' maps. A site bundle is
+# immutable and the map is built from the bundle the run holds (_site, not
+# hashed), keyed on its version: a digest of its files, distinct per site and
+# language. So a run that started before a content reload never caches the new
+# bundle's map under the old version, or the reverse. Keying on the stop
+# sequence rather than the tour mode lets custom tours share the cache.
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+MAP_CACHE_MAX_ENTRIES = 256
+
+@st.cache_data(max_entries=MAP_CACHE_MAX_ENTRIES, show_spinner=False)
+def get_map_html(_site, version, tour_locations, current_location):
+    """Render the map for a stop of a tour to standalone HTML, cached per (site version, tour stops, stop)"""
+    metrics = get_metrics()
+    with metrics.phase("map_build"):
+        figure = folium.Figure().add_child(create_map(_site, current_location, tour_locations))
+    with metrics.phase("map_serialize"):
+        return figure.render()
+
+# In live mode (TOUR_GUIDE_MAP_MODE=live) the map stays mounted in the
+# browser: a tour's layout is published once, and a rerun only sends the
+# layout digest and the current stop (see tour_guide/live_map.py)
+MAP_MODE = map_mode_from_env()
+
+# The live map marks stops with circles rather than folium's icons
+MAP_LEGEND = """
+**Map Legend:**
+- 🔴 Red Star: Current Location
+- 🟢 Green Check: Completed Locations
+- 🔵 Blue Info: Upcoming Locations
+"""
+LIVE_MAP_LEGEND = """
+**Map Legend:**
+- 🔴 Large Red Circle: Current Location
+- 🟢 Green Circle: Completed Locations
+- 🔵 Blue Circle: Upcoming Locations
+"""
 
-    return CHATBOT_RESPONSES["default"]
+@st.cache_data(max_entries=MAP_CACHE_MAX_ENTRIES, show_spinner=False)
+def get_map_layout(_site, version, tour_locations):
+    """Publish the live map layout for a tour and return its digest, cached per (site version, tour stops)"""
+    tiles, attribution = get_tile_layer()
+    metrics = get_metrics()
+    with metrics.phase("map_build"):
+        layout = map_layout(_site, tour_locations, (tiles, attribution) if attribution else None)
+    with metrics.phase("map_serialize"):
+        return publish_layout(layout)
+
+# Cluster workers (tour_guide/cluster.py) attach a read-only store of maps,
+# panels and chatbot models pre-built by the launcher and shared by every
+# worker; anything it does not hold is built here as usual
+@st.cache_resource(show_spinner=False)
+def get_shared_store():
+    """Open the shared store named in the environment, or return None"""
+    return shared_store_from_env()
+
+def shared_map_html(site, tour_locations, current_location):
+    """Return the pre-rendered map for a stop from the shared store, or None"""
+    store = get_shared_store()
+    if store is None or store.meta.get("tiles") != list(get_tile_layer()):
+        return None
+    return store.get_text(map_key(site, tour_locations, current_location))
+
+# While a stop is shown, the next stop's map and details are built on a
+# background thread, so pressing Next finds them ready (see tour_guide/prefetch.py)
+@st.cache_resource(show_spinner=False)
+def get_prefetcher():
+    """Create the process-wide prefetcher, or None if prefetching is off"""
+    return prefetcher_from_env()
+
+def prefetched_map_key(site, tour_locations, location_key):
+    """Prefetcher key of the map HTML for a stop of a tour, in one version of a site bundle"""
+    return ('map', site.key, site.language, site.version, tuple(tour_locations), location_key)
+
+def prefetch_next_stop(site, tour_locations, next_index, is_photo_tour):
+    """Queue the map and details of the stop at next_index to be built in the background"""
+    prefetcher = get_prefetcher()
+    if prefetcher is None or next_index >= len(tour_locations):
+        return
+    owner = st.session_state.session_token
+    location_key = tour_locations[next_index]
+    following_key = tour_locations[next_index + 1] if next_index + 1 < len(tour_locations) else None
+
+    def warm_panel():
+        # The panel is kept with the site, where the next run finds it; returning
+        # None keeps a second copy out of the prefetcher's byte budget
+        render_location_panel(site, location_key, following_key, is_photo_tour)
+
+    prefetcher.prefetch(
+        owner, ('panel', site.key, site.language, site.version, location_key, following_key, is_photo_tour), warm_panel
+    )
+    if MAP_MODE == LIVE_MAP_MODE or shared_map_html(site, tour_locations, location_key) is not None:
+        return
+    # Resolved here: the prefetch thread has no Streamlit session
+    tiles, attribution = get_tile_layer()
+
+    def build_map_html():
+        return folium.Figure().add_child(build_map(site, location_key, tour_locations, tiles, attribution)).render()
+
+    prefetcher.prefetch(owner, prefetched_map_key(site, tour_locations, location_key), build_map_html)
+
+def cancel_prefetch():
+    """Drop this session's queued prefetches, which no longer match where it is going"""
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        prefetcher.cancel(st.session_state.session_token)
+
+def display_map(site, tour_locations, current_location):
+    """Display the map for the current stop"""
+    if MAP_MODE == LIVE_MAP_MODE:
+        layout_digest = get_map_layout(site, site.version, tuple(tour_locations))
+        live_map(layout_digest, tour_locations.index(current_location), height=MAP_HEIGHT + 10, key='live_map')
+        return
+    map_html = shared_map_html(site, tour_locations, current_location)
+    if map_html is None and get_prefetcher() is not None:
+        map_html = get_prefetcher().get(prefetched_map_key(site, tour_locations, current_location))
+        if map_html is not None:
+            get_metrics().increment("prefetch_hits_total", asset="map")
+    if map_html is None:
+        map_html = get_map_html(site, site.version, tuple(tour_locations), current_location)
+    components.html(map_html, width=MAP_WIDTH, height=MAP_HEIGHT + 10)
+
+# With TOUR_GUIDE_RELOAD_INTERVAL set, edited content files are reloaded into
+# the registry as new snapshots, warmed before they are swapped in (see
+# tour_guide/reload.py). Caches here are keyed by site.version, so a
+# reloaded site never gets another snapshot's maps or panels.
+@st.cache_resource(show_spinner=False)
+def get_content_watcher():
+    """Start the process-wide content watcher, or return None if reloading is off"""
+    warm_steps = [*DEFAULT_WARM_STEPS, lambda site: site.derived("route_planner", build_route_planner)]
+    prefetcher = get_prefetcher()
+    if prefetcher is not None and MAP_MODE != LIVE_MAP_MODE:
+        # Resolved here: the watcher thread has no Streamlit session
+        tiles, attribution = get_tile_layer()
+
+        def prefetch_maps(site):
+            for tour in site.tours.values():
+                for location_key in tour.locations:
+                    prefetcher.prefetch(
+                        "content-reload",
+                        prefetched_map_key(site, tour.locations, location_key),
+                        lambda location_key=location_key, stops=tour.locations: folium.Figure().add_child(
+                            build_map(site, location_key, stops, tiles, attribution)).render(),
+                    )
+
+        warm_steps.append(prefetch_maps)
+    metrics = get_metrics()
+
+    def on_reload(site, seconds):
+        metrics.observe("content_reload", seconds)
+        metrics.increment("content_reloads_total", site=site.key)
+
+    return content_watcher_from_env(get_site_registry(), warm_steps=warm_steps, on_reload=on_reload)
+
+def fit_session_to_content(site):
+    """Move the session's tour position onto a reloaded site's tours, if they changed under it"""
+    custom_tour = st.session_state.get('custom_tour')
+    if custom_tour is not None and not set(custom_tour.locations) <= set(site.locations):
+        st.session_state.custom_tour = None
+    tour = get_tour_modes(site).get(st.session_state.tour_mode)
+    if tour is None or st.session_state.tour_index >= len(tour.locations):
+        st.session_state.tour_mode = next(iter(site.tours))
+        st.session_state.tour_index = 0
+        st.session_state.crowd_order = None
+        cancel_prefetch()
+    st.session_state.content_version = site.version
+
+# Custom tours are planned per session from any selection of stops
+CUSTOM_TOUR_KEY = 'custom'
+CUSTOM_BUDGET_MINUTES = (10, 240, 60)  # min, max, default
+
+def build_route_planner(site):
+    """Create the custom tour planner for a site"""
+    dwell_seconds = {key: location.dwell_minutes * 60 for key, location in site.locations.items()}
+    stop_index = site_stop_index(site)
+    walking_paths = site_walking_paths(site)
+    walking_metres = None
+    if walking_paths is not None:
+        walking_metres = walking_paths.walking_matrix(stop_index.distance_matrix())
+    return RoutePlanner(stop_index, dwell_seconds, walking_metres=walking_metres)
+
+def get_tour_modes(site):
+    """Return the site's tours plus the session's custom tour, if one was planned
+
+    A tour reordered around crowds for this session comes back in its new order.
+    """
+    custom_tour = st.session_state.get('custom_tour')
+    tours = site.tours if custom_tour is None else {**site.tours, CUSTOM_TOUR_KEY: custom_tour}
+    crowd_order = st.session_state.get('crowd_order')
+    if crowd_order is not None:
+        site_key, tour_mode, stops = crowd_order
+        tour = tours.get(tour_mode)
+        if site_key == site.key and tour is not None and sorted(tour.locations) == sorted(stops):
+            tours = {**tours, tour_mode: dataclasses.replace(tour, locations=stops)}
+    return tours
+
+def plan_custom_tour(site_key):
+    """Plan a custom tour from the sidebar selection and switch to it"""
+    site = get_site(site_key, st.session_state.language)
+    route = site.derived("route_planner", build_route_planner).plan(
+        st.session_state[f'custom_stops_{site_key}'],
+        st.session_state[f'custom_start_{site_key}'],
+        st.session_state[f'custom_end_{site_key}'],
+        budget_seconds=st.session_state[f'custom_budget_{site_key}'] * 60,
+    )
 
-def create_map(current_location, tour_locations):
-    """Create an interactive Folium map with all tour locations"""
-    # Center map on Taj Mahal
-    m = folium.Map(
-        location=[27.1751, 78.0421],
-        zoom_start=17,
-        tiles='OpenStreetMap'
+    description = f"Your own route through {len(route.stops)} stops, ordered to keep walking short."
+    if route.skipped:
+        skipped = ", ".join(site.locations[key].name for key in route.skipped)
+        description += f" Left out to fit your time: {skipped}."
+    if not route.within_budget:
+        description += " Even the shortest route takes longer than the time you have."
+
+    st.session_state.custom_tour = Tour(
+        key=CUSTOM_TOUR_KEY,
+        name="Custom Tour",
+        duration=f"{math.ceil(route.total_seconds / 60)} minutes",
+        locations=route.stops,
+        description=description,
     )
+    st.session_state.tour_mode = CUSTOM_TOUR_KEY
+    st.session_state.tour_index = 0
+    st.session_state.crowd_order = None
+    cancel_prefetch()
+    # Runs as a button callback, before the tour mode radio is created
+    st.session_state[f'tour_mode_radio_{site_key}'] = CUSTOM_TOUR_KEY
+
+def display_custom_tour_planner(site):
+    """Display the sidebar form for planning a custom tour"""
+    location_keys = list(site.locations)
+    default_tour = next(iter(site.tours.values()))
+    with st.expander("🧭 Plan a Custom Tour"):
+        st.multiselect(
+            "Stops to visit:",
+            options=location_keys,
+            format_func=lambda x: site.locations[x].name,
+            key=f'custom_stops_{site.key}'
+        )
+        st.selectbox(
+            "Start at:",
+            options=location_keys,
+            index=location_keys.index(default_tour.locations[0]),
+            format_func=lambda x: site.locations[x].name,
+            key=f'custom_start_{site.key}'
+        )
+        st.selectbox(
+            "Finish at:",
+            options=location_keys,
+            index=location_keys.index(default_tour.locations[-1]),
+            format_func=lambda x: site.locations[x].name,
+            key=f'custom_end_{site.key}'
+        )
+        min_minutes, max_minutes, default_minutes = CUSTOM_BUDGET_MINUTES
+        st.slider(
+            "Time available (minutes):",
+            min_value=min_minutes,
+            max_value=max_minutes,
+            value=default_minutes,
+            step=5,
+            key=f'custom_budget_{site.key}'
+        )
+        st.button("Plan Tour", on_click=plan_custom_tour, args=(site.key,), use_container_width=True)
+
+# Visitor progress is saved server-side (see tour_guide/persistence.py) under
+# a token kept in the page URL, so a reconnect resumes at the same stop
+SESSION_QUERY_PARAM = 'session'
+
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    """Open the process-wide session store, or None if persistence is off"""
+    return session_store_from_env()
+
+def session_snapshot():
+    """Return the session state worth saving, as plain JSON-ready values"""
+    custom_tour = st.session_state.get('custom_tour')
+    crowd_order = st.session_state.crowd_order
+    return {
+        'site_key': st.session_state.site_key,
+        'language': st.session_state.language,
+        'tour_mode': st.session_state.tour_mode,
+        'tour_index': st.session_state.tour_index,
+        'custom_tour': dataclasses.asdict(custom_tour) if custom_tour is not None else None,
+        'crowd_order': [crowd_order[0], crowd_order[1], list(crowd_order[2])] if crowd_order is not None else None,
+        'chat': [list(turn) for turn in st.session_state.chat_history.turns()],
+    }
 
-    # Add markers for each location in the tour
-    for idx, location_key in enumerate(tour_locations, 1):
-        location = LOCATIONS[location_key]
-
-        # Determine marker color based on current location
-        if location_key == current_location:
-            color = 'red'
-            icon = 'star'
-        elif tour_locations.index(location_key) < tour_locations.index(current_location):
-            color = 'green'
-            icon = 'check'
-        else:
-            color = 'blue'
-            icon = 'info-sign'
-
-        # Create popup content
-        popup_html = f"""
-        <div style="width: 250px;">
-            <h4 style="color: #8B4513; margin-bottom: 10px;">{location['name']}</h4>
-            <p style="font-size: 12px;"><strong>Stop {idx} of {len(tour_locations)}</strong></p>
-            <p style="font-size: 11px;">{location['description'][:150]}...</p>
-            <hr style="margin: 8px 0;">
-            <p style="font-size: 11px;"><strong>Next:</strong> {location.get('next_directions', 'Tour complete')[:100]}</p>
-            <p style="font-size: 11px;"><strong>Walking time:</strong> {location.get('walking_time', 'N/A')}</p>
-        </div>
-        """
-
-        folium.Marker(
-            location=location['coordinates'],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=location['name'],
-            icon=folium.Icon(color=color, icon=icon)
-        ).add_to(m)
-
-    return m
+def restore_session_state(state):
+    """Restore a saved snapshot into the session; returns False if it no longer fits the content"""
+    try:
+        site_key, language = state['site_key'], state['language']
+        if site_key not in get_site_registry().available() or language not in get_site_registry().languages(site_key):
+            return False
+        site = get_site(site_key, language)
+        custom_tour = None
+        if state['custom_tour'] is not None:
+            custom_tour = Tour(**{**state['custom_tour'], 'locations': tuple(state['custom_tour']['locations'])})
+            if not all(key in site.locations for key in custom_tour.locations):
+                return False
+        tours = {**site.tours, CUSTOM_TOUR_KEY: custom_tour} if custom_tour else site.tours
+        tour_mode, tour_index = state['tour_mode'], int(state['tour_index'])
+        if tour_mode not in tours or not 0 <= tour_index < len(tours[tour_mode].locations):
+            return False
+        crowd_order = state.get('crowd_order')
+        if crowd_order is not None:
+            crowd_order = (crowd_order[0], crowd_order[1], tuple(crowd_order[2]))
+        chat_history = ChatHistory()
+        chat_history.restore(state['chat'])
+    except (ContentError, KeyError, TypeError, ValueError):
+        return False
+
+    st.session_state.site_key = site_key
+    st.session_state.language = language
+    st.session_state.custom_tour = custom_tour
+    st.session_state.tour_mode = tour_mode
+    st.session_state.tour_index = tour_index
+    st.session_state.crowd_order = crowd_order
+    st.session_state.chat_history = chat_history
+    # The tour mode radio reads its selection from its key
+    st.session_state[f'tour_mode_radio_{site_key}'] = tour_mode
+    return True
+
+def resume_session():
+    """Pick up the session named in the URL, or start a new one"""
+    store = get_session_store()
+    token = st.query_params.get(SESSION_QUERY_PARAM)
+    state = store.load(token) if store is not None and token else None
+    if state is None or not restore_session_state(state):
+        token = new_session_token()
+    st.session_state.session_token = token
+    st.session_state.persisted_state = state
+    if store is not None:
+        st.query_params[SESSION_QUERY_PARAM] = token
+
+def persist_session():
+    """Queue the session for saving if anything worth keeping changed since the last save"""
+    store = get_session_store()
+    if store is None:
+        return
+    snapshot = session_snapshot()
+    if snapshot != st.session_state.persisted_state:
+        store.save(st.session_state.session_token, snapshot)
+        st.session_state.persisted_state = snapshot
 
 def initialize_session_state():
     """Initialize session state variables"""
+    if 'session_token' not in st.session_state:
+        resume_session()
+    if 'site_key' not in st.session_state:
+        st.session_state.site_key = DEFAULT_SITE_KEY
+    if 'language' not in st.session_state:
+        st.session_state.language = DEFAULT_LANGUAGE
     if 'tour_index' not in st.session_state:
         st.session_state.tour_index = 0
     if 'tour_mode' not in st.session_state:
-        st.session_state.tour_mode = 'complete'
+        st.session_state.tour_mode = next(iter(get_site(st.session_state.site_key).tours))
+    if 'crowd_order' not in st.session_state:
+        st.session_state.crowd_order = None
     if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = ChatHistory()
     if 'user_input' not in st.session_state:
         st.session_state.user_input = ''
-
-def display_location_info(location_key, is_photo_tour=False):
+    if 'pending_answer' not in st.session_state:
+        st.session_state.pending_answer = None
+
+def stream_pending_answer(site, placeholder):
+    """Stream the pending chatbot answer into its placeholder, then add it to the history"""
+    answer = st.session_state.pending_answer
+
+    def render(text):
+        placeholder.markdown(f'<div class="chatbot-message bot-message">🤖 {escape(text, quote=False)}</div>', unsafe_allow_html=True)
+
+    # A rerun may have interrupted an earlier run mid-stream; show what arrived so far
+    if answer.text:
+        render(answer.text)
+    last_render = time.monotonic()
+    for _ in answer:
+        # Each update resends the whole message, so batch fast token streams
+        if time.monotonic() - last_render >= STREAM_RENDER_INTERVAL:
+            render(answer.text)
+            last_render = time.monotonic()
+    render(answer.text)
+
+    metrics = get_metrics()
+    metrics.increment("chatbot_answers_total", kind=answer_kind(answer.response_id), source="send")
+    log_question(site, answer.question, answer.response_id, "send")
+    if answer.source == FALLBACK_SOURCE:
+        metrics.increment("answer_fallbacks_total")
+    if answer.response_id is not None:
+        st.session_state.chat_history.add_bot(site, response_id=answer.response_id)
+    else:
+        st.session_state.chat_history.add_bot(site, text=answer.text)
+    st.session_state.pending_answer = None
+
+def clear_chat():
+    """Empty the chat history and abandon any answer still being generated"""
+    if st.session_state.pending_answer is not None:
+        st.session_state.pending_answer.cancel()
+        st.session_state.pending_answer = None
+    st.session_state.chat_history.clear()
+
+def select_site(site_key):
+    """Switch the session to another site and restart its tour"""
+    st.session_state.site_key = site_key
+    if st.session_state.language not in get_site_registry().languages(site_key):
+        st.session_state.language = DEFAULT_LANGUAGE
+    st.session_state.tour_mode = next(iter(get_site(site_key, st.session_state.language).tours))
+    st.session_state.tour_index = 0
+    st.session_state.custom_tour = None
+    st.session_state.crowd_order = None
+    cancel_prefetch()
+    clear_chat()
+
+def select_language(language):
+    """Show the current site in another language, keeping the tour position"""
+    st.session_state.language = language
+    cancel_prefetch()
+    # Stored answers refer to the previous language's search passages
+    clear_chat()
+
+def display_location_info(site, location_key, next_location_key=None, is_photo_tour=False):
     """Display detailed information about a location"""
-    location = LOCATIONS[location_key]
-
-    st.markdown(f'<h2 class="location-title">{location["name"]}</h2>', unsafe_allow_html=True)
-
-    # Description section
-    st.markdown('<div class="info-section">', unsafe_allow_html=True)
-    st.markdown("### Overview")
-    st.write(location['description'])
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    # Historical significance
-    st.markdown('<div class="info-section">', unsafe_allow_html=True)
-    st.markdown("### Historical Significance")
-    st.write(location['historical_significance'])
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    # Architectural features
-    if 'architectural_features' in location:
-        st.markdown('<div class="info-section">', unsafe_allow_html=True)
-        st.markdown("### Architectural Features")
-        for feature in location['architectural_features']:
-            st.markdown(f"- {feature}")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # Photography tips for photo tour
-    if is_photo_tour and 'best_photo_spot' in location:
-        st.markdown('<div class="info-section" style="border-left: 4px solid #DAA520; background-color: #FFFACD;">', unsafe_allow_html=True)
-        st.markdown("### 📸 Photography Tips")
-        st.markdown(f"**Best Spot:** {location['best_photo_spot']}")
-        if location_key == 'main_tomb':
-            st.markdown("""
-            **Camera Settings:**
-            - Use a wide aperture (f/8-f/11) for sharp architectural details
-            - ISO 100-400 for daylight shots
-            - Tripod recommended for long exposures (if permitted)
-            - HDR mode can help with contrast
-            """)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # Visitor tips
-    if 'visitor_tips' in location:
-        st.markdown('<div class="info-section">', unsafe_allow_html=True)
-        st.markdown("### Visitor Tips")
-        for tip in location['visitor_tips']:
-            st.markdown(f"- {tip}")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # Navigation to next location
-    if location.get('next_directions') != 'N/A' and location.get('walking_time') != 'N/A':
-        st.markdown('<div class="navigation-section">', unsafe_allow_html=True)
-        st.markdown("### 🚶 Navigation to Next Stop")
-        st.markdown(f"**Directions:** {location['next_directions']}")
-        st.markdown(f"**Walking Distance:** {location['walking_distance']}")
-        st.markdown(f"**Estimated Time:** {location['walking_time']}")
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # Placeholder for image
-    st.markdown('<div class="info-section">', unsafe_allow_html=True)
-    st.markdown("### 📷 Location View")
-    st.info(f"[Image Placeholder: 400x300px view of {location['name']}]")
-    st.caption(f"Visual representation of {location['name']} would be displayed here")
-    st.markdown('</div>', unsafe_allow_html=True)
+    # The whole panel is one pre-rendered fragment, so it is sent as a single element
+    st.markdown(
+        render_location_panel(site, location_key, next_location_key, is_photo_tour),
+        unsafe_allow_html=True
+    )
+
+def display_chat(site):
+    """Display the chatbot: history, question box and quick questions
+
+    Returns the placeholder a pending answer is streamed into, or None.
+    """
+    st.markdown("## 💬 AI Tour Assistant")
+    st.caption(f"Ask me anything about the {site.name}!")
+
+    # Chat history display
+    chat_container = st.container()
+    with chat_container:
+        for message in st.session_state.chat_history.messages(site, 5):  # Show last 5 messages
+            if message['role'] == 'user':
+                st.markdown(f'<div class="chatbot-message user-message">👤 {escape(message["content"], quote=False)}</div>', unsafe_allow_html=True)
+            else:
+                st.markdown(f'<div class="chatbot-message bot-message">🤖 {escape(message["content"], quote=False)}</div>', unsafe_allow_html=True)
+        # Filled in at the end of the run, once the rest of the page is up
+        answer_placeholder = st.empty() if st.session_state.pending_answer is not None else None
+
+    # Chat input
+    user_question = st.text_input("Ask a question:", key='chat_input', placeholder=f"e.g., Who built the {site.name}?")
+    if st.button("Send", use_container_width=True) and user_question:
+        # Add user message
+        st.session_state.chat_history.add_user(site, user_question)
+
+        # Start the bot response in the background; it is streamed in after the page renders
+        if st.session_state.pending_answer is not None:
+            st.session_state.pending_answer.cancel()
+        st.session_state.pending_answer = get_answer_service().ask(site, user_question)
+
+        rerun("chat_send")
+
+    # Quick question buttons
+    st.markdown("### Quick Questions:")
+    for label, question, response_key in QUICK_QUESTIONS:
+        if st.button(label, use_container_width=True):
+            question = question.format(site=site.name)
+            st.session_state.chat_history.add_user(site, question)
+            # Stored by key; the response text is looked up when displayed
+            st.session_state.chat_history.add_bot(site, response_id=response_key)
+            get_metrics().increment("chatbot_answers_total", kind=answer_kind(response_key), source="quick_question")
+            log_question(site, question, response_key, "quick_question")
+            rerun("quick_question")
+
+    return answer_placeholder
+
+# With TOUR_GUIDE_CROWD_WINDOW set, each run reports the visitor's stop to a
+# process-wide occupancy tracker, and moving on reorders the rest of the tour
+# to put crowded stops later (see tour_guide/crowds.py)
+@st.cache_resource(show_spinner=False)
+def get_occupancy_tracker():
+    """Create the process-wide occupancy tracker, or None if crowd tracking is off"""
+    return occupancy_tracker_from_env()
+
+def report_position(site, location_key):
+    """Count this session at its current stop"""
+    tracker = get_occupancy_tracker()
+    if tracker is not None:
+        tracker.record(st.session_state.session_token, site.key, location_key)
+
+def reorder_around_crowds(site, tour):
+    """Reorder the stops after the current one so crowded stops come later"""
+    tracker = get_occupancy_tracker()
+    if tracker is None:
+        return
+    tour_index = st.session_state.tour_index
+    remaining = tour.locations[tour_index + 1:]
+    wait_seconds = expected_wait_seconds(tracker.occupancy(site.key))
+    planner = site.derived("route_planner", build_route_planner)
+    reordered = planner.avoid_crowds(tour.locations[tour_index], remaining, wait_seconds)
+    if reordered != remaining:
+        st.session_state.crowd_order = (site.key, st.session_state.tour_mode, tour.locations[:tour_index + 1] + reordered)
+        cancel_prefetch()
+        get_metrics().increment("crowd_reorders_total")
+
+def display_navigation(site, tour, is_last_stop, next_location_key):
+    """Display the Previous/Next buttons and the next stop"""
+    st.markdown("---")
+    col_prev, col_center, col_next = st.columns([1, 2, 1])
+
+    with col_prev:
+        if st.button("⬅️ Previous", disabled=(st.session_state.tour_index == 0), use_container_width=True):
+            st.session_state.tour_index -= 1
+            rerun("previous")
+
+    with col_center:
+        if is_last_stop:
+            st.success(f"🎉 Tour Complete! Thank you for visiting the {site.name} virtually.")
+        else:
+            next_location = site.locations[next_location_key]
+            st.info(f"Next Stop: {next_location.name}")
+            if st.session_state.crowd_order is not None:
+                st.caption("👥 Stops reordered to avoid crowds")
+
+    with col_next:
+        if st.button("Next ➡️", disabled=is_last_stop, use_container_width=True):
+            st.session_state.tour_index += 1
+            reorder_around_crowds(site, tour)
+            rerun("next")
 
 def main():
     """Main application function"""
+    metrics = get_metrics()
+    metrics.increment("script_runs_total")
+    # Attach the shared store, if any, before anything reads pre-rendered content
+    get_shared_store()
+    get_content_watcher()
     initialize_session_state()
+    site = get_site(st.session_state.site_key, st.session_state.language)
+    if st.session_state.get('content_version') != site.version:
+        fit_session_to_content(site)
+    tour_modes = get_tour_modes(site)
 
     # Header
-    st.markdown('<h1 class="main-header">🕌 Taj Mahal Virtual Tourist Guide</h1>', unsafe_allow_html=True)
+    st.markdown(f'<h1 class="main-header">{site.icon} {site.name} Virtual Tourist Guide</h1>', unsafe_allow_html=True)
 
     # Sidebar
-    with st.sidebar:
+    with st.sidebar, metrics.phase("sidebar"):
         st.markdown("## 🎯 Tour Options")
 
-        # Tour mode selection
+        # Site selection (only shown when more than one site is installed)
+        available_sites = get_site_registry().available()
+        if len(available_sites) > 1:
+            selected_site = st.selectbox(
+                "Select Site:",
+                options=list(available_sites.keys()),
+                index=list(available_sites.keys()).index(site.key),
+                format_func=lambda x: available_sites[x],
+                key='site_select'
+            )
+            if selected_site != site.key:
+                select_site(selected_site)
+                rerun("site_switch")
+
+        # Language selection (only shown when the site has translations)
+        languages = get_site_registry().languages(site.key)
+        if len(languages) > 1:
+            selected_language = st.selectbox(
+                "Language:",
+                options=list(languages),
+                index=languages.index(site.language),
+                format_func=lambda x: LANGUAGE_NAMES.get(x, x),
+                key=f'language_select_{site.key}'
+            )
+            if selected_language != site.language:
+                select_language(selected_language)
+                rerun("language_switch")
+
+        # Tour mode selection (keyed per site, since each site has its own tours).
+        # The radio's identity includes its labels, so after a language switch or
+        # a content reload it is a new widget; carry the session's tour mode over
+        radio_key = f'tour_mode_radio_{site.key}'
+        if st.session_state.get('tour_mode_radio_content') != (site.key, site.language, site.version):
+            st.session_state[radio_key] = st.session_state.tour_mode
+            st.session_state.tour_mode_radio_content = (site.key, site.language, site.version)
         selected_mode = st.radio(
             "Select Tour Mode:",
-            options=list(TOUR_MODES.keys()),
-            format_func=lambda x: TOUR_MODES[x]['name'],
-            key='tour_mode_radio'
+            options=list(tour_modes.keys()),
+            format_func=lambda x: tour_modes[x].name,
+            key=radio_key
         )
 
         # Update tour mode if changed
         if selected_mode != st.session_state.tour_mode:
             st.session_state.tour_mode = selected_mode
             st.session_state.tour_index = 0
-            st.rerun()
+            st.session_state.crowd_order = None
+            cancel_prefetch()
+            rerun("tour_mode")
 
         # Display tour info
-        current_tour = TOUR_MODES[st.session_state.tour_mode]
-        st.info(f"**Duration:** {current_tour['duration']}\n\n**Stops:** {len(current_tour['locations'])}\n\n{current_tour['description']}")
+        current_tour = tour_modes[st.session_state.tour_mode]
+        st.info(f"**Duration:** {current_tour.duration}\n\n**Stops:** {len(current_tour.locations)}\n\n{current_tour.description}")
+
+        display_custom_tour_planner(site)
 
         st.markdown("---")
 
@@ -508,60 +720,27 @@ def main():
         st.markdown("## 🎮 Tour Controls")
         if st.button("🔄 Reset Tour", use_container_width=True):
             st.session_state.tour_index = 0
-            st.session_state.chat_history = []
-            st.rerun()
+            st.session_state.crowd_order = None
+            cancel_prefetch()
+            clear_chat()
+            rerun("reset")
 
         st.markdown("---")
 
         # Chatbot section
-        st.markdown("## 💬 AI Tour Assistant")
-        st.caption("Ask me anything about the Taj Mahal!")
-
-        # Chat history display
-        chat_container = st.container()
-        with chat_container:
-            for message in st.session_state.chat_history[-5:]:  # Show last 5 messages
-                if message['role'] == 'user':
-                    st.markdown(f'<div class="chatbot-message user-message">👤 {message["content"]}</div>', unsafe_allow_html=True)
-                else:
-                    st.markdown(f'<div class="chatbot-message bot-message">🤖 {message["content"]}</div>', unsafe_allow_html=True)
-
-        # Chat input
-        user_question = st.text_input("Ask a question:", key='chat_input', placeholder="e.g., Who built the Taj Mahal?")
-        if st.button("Send", use_container_width=True) and user_question:
-            # Add user message
-            st.session_state.chat_history.append({'role': 'user', 'content': user_question})
-
-            # Get bot response
-            bot_response = get_chatbot_response(user_question)
-            st.session_state.chat_history.append({'role': 'bot', 'content': bot_response})
-
-            st.rerun()
-
-        # Quick question buttons
-        st.markdown("### Quick Questions:")
-        if st.button("🏛️ Who built it?", use_container_width=True):
-            st.session_state.chat_history.append({'role': 'user', 'content': 'Who built the Taj Mahal?'})
-            st.session_state.chat_history.append({'role': 'bot', 'content': CHATBOT_RESPONSES['who built']})
-            st.rerun()
-
-        if st.button("📸 Best photo spots?", use_container_width=True):
-            st.session_state.chat_history.append({'role': 'user', 'content': 'Best photo spots?'})
-            st.session_state.chat_history.append({'role': 'bot', 'content': CHATBOT_RESPONSES['best photo']})
-            st.rerun()
-
-        if st.button("⏱️ How long to visit?", use_container_width=True):
-            st.session_state.chat_history.append({'role': 'user', 'content': 'How long does a tour take?'})
-            st.session_state.chat_history.append({'role': 'bot', 'content': CHATBOT_RESPONSES['how long']})
-            st.rerun()
+        with metrics.phase("chat"):
+            answer_placeholder = display_chat(site)
 
     # Main content area
-    current_tour = TOUR_MODES[st.session_state.tour_mode]
-    tour_locations = current_tour['locations']
+    current_tour = tour_modes[st.session_state.tour_mode]
+    tour_locations = current_tour.locations
     current_location_key = tour_locations[st.session_state.tour_index]
+    is_last_stop = st.session_state.tour_index == len(tour_locations) - 1
+    next_location_key = None if is_last_stop else tour_locations[st.session_state.tour_index + 1]
+    report_position(site, current_location_key)
 
     # Progress indicator
-    progress_text = f"Stop {st.session_state.tour_index + 1} of {len(tour_locations)} | {current_tour['name']}"
+    progress_text = f"Stop {st.session_state.tour_index + 1} of {len(tour_locations)} | {current_tour.name}"
     st.markdown(f'<div class="progress-indicator">{progress_text}</div>', unsafe_allow_html=True)
 
     # Progress bar
@@ -571,60 +750,55 @@ def main():
     # Create columns for map and info
     col1, col2 = st.columns([3, 2])
 
-    with col1:
+    with col1, metrics.phase("map"):
         st.markdown("### 🗺️ Interactive Map")
-        # Create and display map
-        tour_map = create_map(current_location_key, tour_locations)
-        folium_static(tour_map, width=700, height=500)
+        # Display map (rendered once per tour mode and stop, then served from cache)
+        display_map(site, tour_locations, current_location_key)
 
         # Legend
-        st.markdown("""
-        **Map Legend:**
-        - 🔴 Red Star: Current Location
-        - 🟢 Green Check: Completed Locations
-        - 🔵 Blue Info: Upcoming Locations
-        """)
-
-    with col2:
+        st.markdown(LIVE_MAP_LEGEND if MAP_MODE == LIVE_MAP_MODE else MAP_LEGEND)
+
+    with col2, metrics.phase("details"):
         st.markdown("### 📍 Location Details")
         # Scrollable info panel
         info_container = st.container()
         with info_container:
             display_location_info(
+                site,
                 current_location_key,
+                next_location_key=next_location_key,
                 is_photo_tour=(st.session_state.tour_mode == 'photography')
             )
+        # Let the browser fetch the next stop's photo while this one is read
+        next_image_set = site_image_sets(site).get(next_location_key)
+        if next_image_set is not None:
+            st.markdown(prefetch_link_html(next_image_set), unsafe_allow_html=True)
 
     # Navigation buttons
-    st.markdown("---")
-    col_prev, col_center, col_next = st.columns([1, 2, 1])
-
-    with col_prev:
-        if st.button("⬅️ Previous", disabled=(st.session_state.tour_index == 0), use_container_width=True):
-            st.session_state.tour_index -= 1
-            st.rerun()
-
-    with col_center:
-        if st.session_state.tour_index == len(tour_locations) - 1:
-            st.success("🎉 Tour Complete! Thank you for visiting the Taj Mahal virtually.")
-        else:
-            next_location = LOCATIONS[tour_locations[st.session_state.tour_index + 1]]
-            st.info(f"Next Stop: {next_location['name']}")
-
-    with col_next:
-        if st.button("Next ➡️", disabled=(st.session_state.tour_index == len(tour_locations) - 1), use_container_width=True):
-            st.session_state.tour_index += 1
-            st.rerun()
+    with metrics.phase("navigation"):
+        display_navigation(site, current_tour, is_last_stop, next_location_key)
 
     # Footer
     st.markdown("---")
-    st.markdown("""
+    st.markdown(f"""
     <div style="text-align: center; color: #666; padding: 1rem;">
-        <p>Taj Mahal Virtual Tourist Guide | UNESCO World Heritage Site since 1983</p>
-        <p style="font-size: 0.9rem;">This virtual tour is designed to complement your actual visit to the Taj Mahal</p>
-        <p style="font-size: 0.8rem;">⏰ Open: Sunrise to Sunset (Closed Fridays) | 📍 Agra, Uttar Pradesh, India</p>
+        <p>{site.name} Virtual Tourist Guide | {site.heritage_status}</p>
+        <p style="font-size: 0.9rem;">This virtual tour is designed to complement your actual visit to the {site.name}</p>
+        <p style="font-size: 0.8rem;">⏰ Open: {site.opening_hours} | 📍 {site.address}</p>
     </div>
     """, unsafe_allow_html=True)
 
+    # Build the next stop while the visitor reads this one (and while any answer streams)
+    prefetch_next_stop(site, tour_locations, st.session_state.tour_index + 1,
+                       st.session_state.tour_mode == 'photography')
+
+    # Stream any pending chatbot answer last, so the map and details are already on screen
+    if answer_placeholder is not None:
+        with metrics.phase("answer_stream"):
+            stream_pending_answer(site, answer_placeholder)
+
+    persist_session()
+
 if __name__ == "__main__":
-    main()
+    with get_metrics().phase("script"):
+        main()
@@ -0,0 +1,80 @@
+"""
+Chatbot answer cache and question log cost
+Times answer_question for first-time questions (matching runs) and repeats
+(served from the answer cache), and the cost QuestionLog.record adds to a
+rerun, which only updates an in-memory batch.
+
+Usage: python benchmarks/answer_cache.py [--queries 5000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.chatbot import answer_question, site_answer_cache  # noqa: E402
+from tour_guide.content import load_site  # noqa: E402
+from tour_guide.question_log import QuestionLog  # noqa: E402
+
+SAMPLE_QUESTIONS = [
+    "Who built the Taj Mahal?",
+    "how much is a ticket",
+    "where can I take photos",
+    "are drones allowed",
+    "what is pietra dura",
+    "tell me about the reflecting pool",
+    "is there parking nearby",
+]
+
+
+def timed(function, items):
+    """Call function on each item, returning per-call microseconds"""
+    timings = []
+    for item in items:
+        started = time.perf_counter()
+        function(item)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return timings
+
+
+def report(case, timings):
+    ordered = sorted(timings)
+    print(f"{case:<14} {ordered[len(ordered) // 2]:>8.1f} {ordered[int(len(ordered) * 0.99)]:>8.1f} "
+          f"{statistics.fmean(timings):>8.1f}")
+
+
+def run(query_count, seed):
+    rng = random.Random(seed)
+    site = load_site()
+    # A distinct trailing number makes every first pass a cache miss
+    questions = [f"{rng.choice(SAMPLE_QUESTIONS)} {number}" for number in range(query_count)]
+    site_answer_cache(site).capacity = query_count
+
+    print(f"{'case':<14} {'p50 us':>8} {'p99 us':>8} {'mean us':>8}")
+    report("uncached", timed(lambda question: answer_question(site, question), questions))
+    report("cached", timed(lambda question: answer_question(site, question), questions))
+
+    with tempfile.TemporaryDirectory() as directory:
+        question_log = QuestionLog(os.path.join(directory, "questions.jsonl"))
+        report("log record", timed(lambda question: question_log.record(site, question, "default", "send"), questions))
+        started = time.perf_counter()
+        written = question_log.flush()
+        print(f"flush: {written} entries in {(time.perf_counter() - started) * 1000:.1f} ms (background thread)")
+        question_log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Rerun cost benchmark for the Streamlit app
+Drives app.py headlessly with Streamlit's AppTest through a scripted visitor
+session (tour mode and language switches, Next/Previous, chat sends, Quick
+Questions) and records wall time, allocated memory and element count for
+every rerun. Also times create_map, get_chatbot_response and
+display_location_info on their own, and replays many sessions in parallel
+processes to measure throughput.
+
+Usage: python benchmarks/app_reruns.py [--rounds 3] [--sessions 32] [--concurrency 8] [--micro-runs 200]
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import element_tree  # noqa: E402
+
+from tour_guide.content import LANGUAGE_NAMES, load_site  # noqa: E402
+from tour_guide.sites import SiteRegistry  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "app.py")
+APP_TIMEOUT = 120
+
+# Two patches make the app drivable by AppTest in Streamlit 1.31; neither
+# changes what a run of app.py does, only how the harness starts the next one.
+#
+# AppTest cannot follow st.rerun(): it reruns with the same widget states,
+# so a clicked button fires again on every rerun. Treat st.rerun() as
+# st.stop() and run the script again, as the browser would; the cost of each
+# step is the interrupted run plus that follow-up run.
+st.rerun = st.stop
+
+# AppTest reports a widget's state by finding its value among the displayed
+# labels, which fails once format_func changes them. The app's selectors all
+# display a site, language, tour or stop name, so map those keys to every
+# label they have in any language.
+DISPLAY_NAMES = {}
+
+
+def _add_names(pairs):
+    for key, name in pairs:
+        DISPLAY_NAMES.setdefault(key, []).append(name)
+
+
+_add_names(LANGUAGE_NAMES.items())
+_registry = SiteRegistry()
+for _site_key in _registry.available():
+    for _language in _registry.languages(_site_key):
+        _site = _registry.get(_site_key, _language)
+        _add_names([(_site.key, _site.name)])
+        _add_names((key, tour.name) for key, tour in _site.tours.items())
+        _add_names((key, location.name) for key, location in _site.locations.items())
+
+
+def _option_index(widget, value):
+    """Index of value among a widget's displayed options"""
+    for label in [str(value), *DISPLAY_NAMES.get(value, ())]:
+        if label in widget.options:
+            return widget.options.index(label)
+    raise ValueError(f"{value!r} is not among the options of {widget.key!r}")
+
+
+def _index(widget):
+    return None if widget.value is None else _option_index(widget, widget.value)
+
+
+element_tree.Radio.index = property(_index)
+element_tree.Selectbox.index = property(_index)
+element_tree.Multiselect.indices = property(lambda widget: [_option_index(widget, value) for value in widget.value])
+
+# One visitor session: (step name, action taking an AppTest)
+SESSION_SCRIPT = [
+    ("next", lambda at: click(at, "Next ➡️")),
+    ("next", lambda at: click(at, "Next ➡️")),
+    ("previous", lambda at: click(at, "⬅️ Previous")),
+    ("chat send", lambda at: send(at, "Who built the Taj Mahal?")),
+    ("chat send", lambda at: send(at, "are shoes allowed inside the tomb")),
+    ("quick question", lambda at: click(at, "📸 Best photo spots?")),
+    ("mode switch", lambda at: switch_mode(at, "Photography Tour")),
+    ("next", lambda at: click(at, "Next ➡️")),
+    ("mode switch", lambda at: switch_mode(at, "Express Tour")),
+    ("quick question", lambda at: click(at, "⏱️ How long to visit?")),
+    ("language switch", lambda at: switch_language(at, "हिन्दी")),
+    ("next", lambda at: click(at, "Next ➡️")),
+    ("language switch", lambda at: switch_language(at, "English")),
+    ("reset", lambda at: click(at, "🔄 Reset Tour")),
+]
+
+
+# Questions for the chatbot micro-benchmark
+SAMPLE_QUESTIONS = [
+    "Who built the Taj Mahal?",
+    "when do the fountains run",
+    "what is pietra dura",
+    "where can I take photos",
+]
+
+
+def click(at, label):
+    """Click the button with the given label"""
+    for button in at.button:
+        if button.label == label:
+            button.click()
+            return
+    raise LookupError(f"no button labelled {label!r}")
+
+
+def send(at, question):
+    """Type a chat question and press Send"""
+    at.text_input(key="chat_input").input(question)
+    click(at, "Send")
+
+
+def switch_mode(at, tour_name):
+    """Select a tour mode in the sidebar radio by its displayed name"""
+    # The label maps to the same index the browser would send
+    at.radio(key=f"tour_mode_radio_{at.session_state.site_key}").set_value(tour_name)
+
+
+def switch_language(at, language_name):
+    """Select a content language in the sidebar by its displayed name"""
+    at.selectbox(key=f"language_select_{at.session_state.site_key}").set_value(language_name)
+
+
+def count_elements(node):
+    """Count the nodes of a rendered element tree"""
+    children = getattr(node, "children", None) or {}
+    return 1 + sum(count_elements(child) for child in children.values())
+
+
+def timed_run(at, measure_memory=False):
+    """Run the script once, returning (seconds, bytes allocated, element count)"""
+    if measure_memory:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    allocated = tracemalloc.get_traced_memory()[1] - before if measure_memory else 0
+    if at.exception:
+        raise RuntimeError(f"app raised: {at.exception[0].value}")
+    return elapsed, allocated, count_elements(at._tree)
+
+
+def run_session(measure_memory=False):
+    """Play SESSION_SCRIPT once, returning [(step, seconds, bytes, elements)]"""
+    at = AppTest.from_file(APP_PATH, default_timeout=APP_TIMEOUT)
+    samples = [("first load", *timed_run(at, measure_memory))]
+    for step, action in SESSION_SCRIPT:
+        action(at)
+        elapsed, allocated, elements = timed_run(at, measure_memory)
+        # The follow-up run stands in for the st.rerun() the step triggered
+        rerun_elapsed, rerun_allocated, elements = timed_run(at, measure_memory)
+        samples.append((step, elapsed + rerun_elapsed, allocated + rerun_allocated, elements))
+    return samples
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report_session(rounds):
+    """Play the scripted session several times and print per-step costs"""
+    tracemalloc.start()
+    samples = {}
+    for _ in range(rounds):
+        for step, elapsed, allocated, elements in run_session(measure_memory=True):
+            samples.setdefault(step, []).append((elapsed, allocated, elements))
+    tracemalloc.stop()
+
+    print("\nPer-interaction cost (script run + triggered rerun)")
+    print(f"{'step':<16} {'n':>4} {'p50 ms':>8} {'max ms':>8} {'peak KiB':>9} {'elements':>9}")
+    for step, rows in samples.items():
+        timings = [row[0] * 1000 for row in rows]
+        print(f"{step:<16} {len(rows):>4} {statistics.median(timings):>8.1f} {max(timings):>8.1f} "
+              f"{statistics.median(row[1] for row in rows) / 1024:>9.0f} {rows[-1][2]:>9}")
+
+
+def report_micro(runs):
+    """Time the app's heavy helpers outside the script runner"""
+    import app
+    from tour_guide.chatbot import get_chatbot_response
+
+    site = load_site()
+    tour = next(iter(site.tours.values()))
+    stops = tour.locations
+    cases = [
+        ("create_map", lambda number: app.create_map(site, stops[number % len(stops)], stops)),
+        ("get_chatbot_response", lambda number: get_chatbot_response(site, SAMPLE_QUESTIONS[number % len(SAMPLE_QUESTIONS)])),
+        ("display_location_info", lambda number: app.display_location_info(site, stops[number % len(stops)], None)),
+    ]
+
+    print(f"\nMicro-benchmarks ({runs} calls each)")
+    print(f"{'function':<24} {'p50 us':>9} {'p99 us':>9}")
+    for name, call in cases:
+        timings = []
+        for number in range(runs):
+            started = time.perf_counter()
+            call(number)
+            timings.append((time.perf_counter() - started) * 1e6)
+        print(f"{name:<24} {statistics.median(timings):>9.1f} {percentile(timings, 0.99):>9.1f}")
+
+
+def _play_sessions(session_count, results):
+    """Worker process for report_concurrent: play sessions, then send the samples back"""
+    results.put([run_session() for _ in range(session_count)])
+
+
+def report_concurrent(sessions, concurrency):
+    """Replay the session from many simulated visitors at once"""
+    # AppTest keeps a process-wide runtime, so each simulated visitor needs
+    # its own process; that also keeps them from sharing one GIL
+    results = multiprocessing.Queue()
+    shares = [sessions // concurrency + (worker < sessions % concurrency) for worker in range(concurrency)]
+    workers = [multiprocessing.Process(target=_play_sessions, args=(share, results)) for share in shares if share]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    collected = []
+    for _ in workers:
+        collected.extend(results.get())
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    timings = [sample[1] * 1000 for session in collected for sample in session[1:]]
+    print(f"Concurrent sessions: {sessions} sessions, {concurrency} at a time")
+    print(f"{len(timings)} interactions in {elapsed:.1f}s ({len(timings) / elapsed:.1f}/s), "
+          f"p50 {statistics.median(timings):.1f} ms, p99 {percentile(timings, 0.99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--micro-runs", type=int, default=200)
+    args = parser.parse_args()
+    # Concurrent sessions go first: AppTest replaces __main__ while a script
+    # runs, after which worker processes cannot find their entry point
+    if args.sessions:
+        report_concurrent(args.sessions, args.concurrency)
+    report_session(args.rounds)
+    report_micro(args.micro_runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Script rerun throughput of the multi-process cluster
+Starts the cluster (shared store, workers and sticky balancer) with 1 to
+--workers workers and drives it with --sessions concurrent websocket
+sessions, each asking for a rerun as soon as its last one finished, the way
+a browser does on every click. Reports reruns per second at each size.
+
+Reruns are CPU bound, so throughput grows with workers only up to the
+machine's core count.
+
+Usage: python benchmarks/cluster_throughput.py [--workers 4] [--sessions 16] [--seconds 20]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.cluster import StickyBalancer, WorkerPool, build_shared_store  # noqa: E402
+
+BALANCER_PORT = 8591
+WORKER_PORT = 8620
+
+
+async def drive_session(url, deadline, counts):
+    """Rerun the script over one websocket session until the deadline"""
+    connection = await websocket_connect(url, subprotocols=["streamlit"])
+    rerun = BackMsg()
+    rerun.rerun_script.query_string = ""
+    request = rerun.SerializeToString()
+    try:
+        while time.monotonic() < deadline:
+            connection.write_message(request, binary=True)
+            while True:
+                message = await connection.read_message()
+                if message is None:
+                    return
+                forward = ForwardMsg()
+                forward.ParseFromString(message)
+                if forward.WhichOneof("type") == "script_finished":
+                    if forward.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                        counts.append(time.monotonic())
+                    break
+    finally:
+        connection.close()
+
+
+async def measure(port, sessions, seconds, warmup):
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    counts = []
+    started = time.monotonic()
+    await asyncio.gather(*(drive_session(url, started + warmup + seconds, counts) for _ in range(sessions)))
+    return sum(1 for finished in counts if finished >= started + warmup) / seconds
+
+
+def run(max_workers, sessions, seconds, warmup):
+    store_path = os.path.join(tempfile.gettempdir(), "tour_guide_bench_store.bin")
+    # Worker output would interleave with the table
+    log_dir = os.path.join(tempfile.gettempdir(), "tour_guide_bench_logs")
+    entries, size = build_shared_store(store_path)
+    print(f"shared store: {entries} entries, {size / 1e6:.1f} MB; {os.cpu_count()} CPUs, {sessions} sessions")
+    print(f"{'workers':>7} {'reruns/s':>9} {'speedup':>8}")
+    baseline = None
+    for count in range(1, max_workers + 1):
+        pool = WorkerPool(count, store_path, WORKER_PORT, log_dir=log_dir)
+        try:
+            pool.wait_ready()
+            balancer = StickyBalancer([("127.0.0.1", port) for port in pool.ports], "127.0.0.1", BALANCER_PORT).start()
+            try:
+                rate = asyncio.run(measure(balancer.port, sessions, seconds, warmup))
+            finally:
+                balancer.stop()
+        finally:
+            pool.stop()
+        baseline = baseline or rate
+        print(f"{count:>7} {rate:>9.1f} {rate / baseline:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of reruns not counted")
+    args = parser.parse_args()
+    run(args.workers, args.sessions, args.seconds, args.warmup)
+
+
+if __name__ == "__main__":
+    main()
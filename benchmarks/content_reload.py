@@ -0,0 +1,92 @@
+"""
+Content hot reload time and snapshot memory
+Edits a copy of the site content repeatedly and times how long ContentWatcher
+takes to load and warm each new snapshot, measures the memory one warmed
+snapshot holds (tracemalloc), and checks that replaced snapshots are freed
+once released while max_retired bounds how many a reload lets pile up.
+
+Usage: python benchmarks/content_reload.py [--reloads 20] [--site taj_mahal]
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.content import DATA_DIR, site_path  # noqa: E402
+from tour_guide.reload import DEFAULT_MAX_RETIRED, ContentWatcher, warm_site  # noqa: E402
+from tour_guide.sites import SiteRegistry  # noqa: E402
+
+
+def edit(site_key, data_dir, number):
+    """Change the description of a site's first stop"""
+    path = site_path(site_key, data_dir)
+    with open(path, encoding="utf-8") as content_file:
+        data = json.load(content_file)
+    location = next(iter(data["locations"].values()))
+    location["description"] = f"{location['description'].split(' [')[0]} [edit {number}]"
+    with open(path, "w", encoding="utf-8") as content_file:
+        json.dump(data, content_file, ensure_ascii=False)
+
+
+def run(reload_count, site_key):
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = os.path.join(directory, "data")
+        shutil.copytree(DATA_DIR, data_dir)
+        registry = SiteRegistry(data_dir)
+        registry.get(site_key)
+        watcher = ContentWatcher(registry, interval=1)
+
+        # Reload time: load, warm and swap, as the watcher thread does it
+        timings = []
+        for number in range(reload_count):
+            edit(site_key, data_dir, number)
+            timings.extend(seconds * 1000 for _, _, seconds in watcher.check())
+        print(f"reload (load + warm): {len(timings)} reloads, p50 {statistics.median(timings):.1f} ms, "
+              f"max {max(timings):.1f} ms")
+
+        # Memory one warmed snapshot holds
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        site = registry.reload(site_key, warm=warm_site)
+        gc.collect()
+        held = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+        tracemalloc.stop()
+        print(f"snapshot memory: {held / 1024:.0f} KiB per warmed bundle")
+        del site
+
+        # Released snapshots are freed; held ones are counted and bound reloads
+        gc.collect()
+        print(f"retired snapshots alive after release: {registry.retired()}")
+        holders = []
+        for number in range(DEFAULT_MAX_RETIRED + 3):
+            holders.append(registry.get(site_key))
+            edit(site_key, data_dir, reload_count + number)
+            watcher.check()
+        print(f"with every snapshot held: {registry.retired()} retired alive "
+              f"(max {DEFAULT_MAX_RETIRED}), {watcher.reloads} reloads done")
+        holders.clear()
+        gc.collect()
+        edit(site_key, data_dir, reload_count + DEFAULT_MAX_RETIRED + 3)
+        watcher.check()
+        print(f"after holders finish: {registry.retired()} retired alive, {watcher.reloads} reloads done")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reloads", type=int, default=20)
+    parser.add_argument("--site", default="taj_mahal")
+    args = parser.parse_args()
+    run(args.reloads, args.site)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Event cost benchmark for the crowd occupancy tracker
+Replays progress reports from growing numbers of simulated sessions walking
+a site's tours, on a simulated clock so buckets keep expiring, and reports
+the cost per report and per occupancy read. Both should stay flat as the
+session count grows.
+
+Usage: python benchmarks/crowd_events.py [--sessions 1000 10000 50000] [--events 500000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.content import DEFAULT_SITE_KEY, load_site  # noqa: E402
+from tour_guide.crowds import OccupancyTracker  # noqa: E402
+
+WINDOW_SECONDS = 900
+# Simulated seconds between consecutive reports across all sessions
+REPORT_SPACING = 0.01
+
+
+def run(session_counts, event_count, seed):
+    site = load_site(DEFAULT_SITE_KEY)
+    tours = [tour.locations for tour in site.tours.values()]
+    print(f"{'sessions':>9} {'active':>8} {'record ns':>10} {'read us':>8}")
+    for session_count in session_counts:
+        rng = random.Random(seed)
+        now = [0.0]
+        tracker = OccupancyTracker(WINDOW_SECONDS, clock=lambda: now[0])
+        # Each session walks one tour, a stop further every few reports
+        walks = [(rng.choice(tours), rng.randrange(8)) for _ in range(session_count)]
+        reports = []
+        for _ in range(event_count):
+            session = rng.randrange(session_count)
+            tour, offset = walks[session]
+            reports.append((f"session-{session}", tour[(offset + len(reports) // 50_000) % len(tour)]))
+
+        started = time.perf_counter()
+        for number, (session, location_key) in enumerate(reports):
+            now[0] = number * REPORT_SPACING
+            tracker.record(session, DEFAULT_SITE_KEY, location_key)
+        record_ns = (time.perf_counter() - started) / event_count * 1e9
+
+        reads = 10_000
+        started = time.perf_counter()
+        for _ in range(reads):
+            tracker.occupancy(DEFAULT_SITE_KEY)
+        read_us = (time.perf_counter() - started) / reads * 1e6
+        print(f"{session_count:>9} {len(tracker):>8} {record_ns:>10.0f} {read_us:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sessions, args.events, args.seed)
+
+
+if __name__ == "__main__":
+    main()
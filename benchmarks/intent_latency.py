@@ -0,0 +1,78 @@
+"""
+Classification latency benchmark for the chatbot intent classifier
+Trains the classifier on a site bundle, then times uncached questions
+(paraphrases, misspellings and unrelated questions, made unique so the LRU
+cache never hits) and cached repeats, reporting p50/p99 for each.
+
+Usage: python benchmarks/intent_latency.py [--language en] [--queries 5000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.content import DEFAULT_LANGUAGE, DEFAULT_SITE_KEY, load_site  # noqa: E402
+from tour_guide.intents import IntentClassifier, train_intent_model, training_examples  # noqa: E402
+
+SAMPLE_QUESTIONS = [
+    "who made this?",
+    "cost of entry",
+    "how many hours do I need here",
+    "tikcet price for foreigners",
+    "where to take good pictures at sunrise",
+    "are backpacks allowed inside the complex",
+    "tell me about the reflecting pool",
+    "what is the building made of",
+]
+
+
+def percentile(samples, fraction):
+    """Return the sample at the given fraction of the sorted samples"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def timed(classifier, queries):
+    """Classify each query, returning per-query microseconds"""
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        classifier.classify(query)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return timings
+
+
+def run(site_key, language, query_count, seed):
+    """Benchmark training, uncached and cached classification"""
+    rng = random.Random(seed)
+    examples = training_examples(load_site(site_key, language=language))
+    started = time.perf_counter()
+    classifier = IntentClassifier(train_intent_model(examples), cache_size=query_count)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"{len(classifier)} examples, {len(classifier.vocabulary)} features, trained in {build_ms:.1f} ms")
+
+    # A distinct trailing number keeps every question out of the cache
+    queries = [f"{rng.choice(SAMPLE_QUESTIONS)} {number}" for number in range(query_count)]
+    print(f"{'case':<10} {'p50 us':>8} {'p99 us':>8} {'mean us':>8}")
+    for case, timings in (("uncached", timed(classifier, queries)), ("cached", timed(classifier, queries))):
+        print(f"{case:<10} {percentile(timings, 0.50):>8.1f} {percentile(timings, 0.99):>8.1f} "
+              f"{statistics.fmean(timings):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--site", default=DEFAULT_SITE_KEY)
+    parser.add_argument("--language", default=DEFAULT_LANGUAGE)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.site, args.language, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Per-click map payload for the two map modes
+Walks every tour of a site stop by stop and measures the map element a rerun
+sends to the browser: the full folium document in html mode, against the
+component arguments in live mode (plus the layout each tour publishes once).
+Sizes are the serialized Streamlit protobuf messages for the element.
+
+Usage: python benchmarks/map_payload.py [--site taj_mahal]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folium  # noqa: E402
+from streamlit.proto.Components_pb2 import ComponentInstance  # noqa: E402
+from streamlit.proto.IFrame_pb2 import IFrame  # noqa: E402
+
+from tour_guide.content import DEFAULT_SITE_KEY, load_site  # noqa: E402
+from tour_guide.live_map import map_layout, publish_layout  # noqa: E402
+
+MAP_HEIGHT = 510
+
+
+def html_mode_bytes(app, site, stops, current_location):
+    """Bytes of the components.html element for one stop"""
+    figure = folium.Figure().add_child(app.create_map(site, current_location, stops))
+    return IFrame(srcdoc=figure.render(), width=700, height=MAP_HEIGHT).ByteSize()
+
+
+def live_mode_bytes(layout_digest, current_index):
+    """Bytes of the live map component element for one stop"""
+    args = {"layout": layout_digest, "current": current_index, "height": MAP_HEIGHT, "key": "live_map", "default": None}
+    return ComponentInstance(
+        id="$$GENERATED_WIDGET_ID-0000-live_map",
+        component_name="tour_guide.live_map.tour_map",
+        json_args=json.dumps(args),
+    ).ByteSize()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--site", default=DEFAULT_SITE_KEY)
+    args = parser.parse_args()
+
+    import app
+
+    site = load_site(args.site)
+    print(f"{'tour':<14} {'stops':>5} {'html KB/click':>14} {'live B/click':>13} {'layout KB once':>15}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for tour in site.tours.values():
+            stops = tour.locations
+            layout_digest = publish_layout(map_layout(site, stops), cache_dir)
+            layout_bytes = os.path.getsize(os.path.join(cache_dir, layout_digest[:2], f"{layout_digest}.json"))
+            html_sizes = [html_mode_bytes(app, site, stops, key) for key in stops]
+            live_sizes = [live_mode_bytes(layout_digest, index) for index in range(len(stops))]
+            print(f"{tour.key:<14} {len(stops):>5} {statistics.mean(html_sizes) / 1024:>14.1f} "
+                  f"{statistics.mean(live_sizes):>13.0f} {layout_bytes / 1024:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
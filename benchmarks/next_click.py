@@ -0,0 +1,74 @@
+"""
+Next click latency with and without prefetching
+Walks the default tour with Streamlit's AppTest, pausing on each stop as a
+reader would, and times the rerun each Next click triggers. Every round runs
+in a fresh process (cold caches), once with prefetching off
+(TOUR_GUIDE_PREFETCH_MB=0) and once on.
+
+Usage: python benchmarks/next_click.py [--rounds 3] [--pause 0.5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tour_guide.prefetch import PREFETCH_MB_ENV  # noqa: E402
+
+
+def walk(pause):
+    """Walk the default tour once; prints the milliseconds of each Next rerun"""
+    # Imported here so only the child processes load Streamlit; app_reruns also
+    # patches AppTest to follow st.rerun() and read the app's labelled selectors
+    from streamlit.testing.v1 import AppTest
+    from app_reruns import APP_PATH, APP_TIMEOUT
+
+    at = AppTest.from_file(APP_PATH, default_timeout=APP_TIMEOUT)
+    at.run()
+    while True:
+        time.sleep(pause)
+        button = next(button for button in at.button if button.label == "Next ➡️")
+        if button.disabled:
+            break
+        button.click()
+        # The click's run stops at st.rerun(); the second run shows the next stop
+        started = time.perf_counter()
+        at.run()
+        at.run()
+        print(f"{(time.perf_counter() - started) * 1000:.2f}")
+
+
+def run(rounds, pause):
+    print(f"{'prefetch':<9} {'clicks':>6} {'p50 ms':>8} {'mean ms':>8} {'max ms':>8}")
+    for label, megabytes in (("off", "0"), ("on", os.environ.get(PREFETCH_MB_ENV) or "32")):
+        timings = []
+        for _ in range(rounds):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", "--pause", str(pause)],
+                env={**os.environ, PREFETCH_MB_ENV: megabytes, "TOUR_GUIDE_SESSION_DB": ""},
+                capture_output=True, text=True, check=True,
+            ).stdout
+            timings.extend(float(line) for line in output.split())
+        print(f"{label:<9} {len(timings):>6} {statistics.median(timings):>8.1f} "
+              f"{statistics.fmean(timings):>8.1f} {max(timings):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--pause", type=float, default=0.5, help="seconds spent on each stop")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        walk(args.pause)
+    else:
+        run(args.rounds, args.pause)
+
+
+if __name__ == "__main__":
+    main()
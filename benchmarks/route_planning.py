@@ -0,0 +1,73 @@
+"""
+Planning latency benchmark for custom tours
+Scatters synthetic stops over a site-sized area and times uncached plans at
+several selection sizes and time budgets, plus a memoized repeat.
+
+Usage: python benchmarks/route_planning.py [--stops 10 25 50 100] [--runs 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.content import Location  # noqa: E402
+from tour_guide.geo import StopIndex  # noqa: E402
+from tour_guide.routing import RoutePlanner  # noqa: E402
+
+# Roughly the footprint of the Taj Mahal complex, in degrees
+SITE_ORIGIN = (27.1720, 78.0390)
+SITE_SPAN = 0.005
+
+
+def build_planner(stop_count, rng):
+    """Create a planner over stop_count randomly placed stops"""
+    locations = {}
+    for number in range(stop_count):
+        key = f"stop{number}"
+        coordinates = (SITE_ORIGIN[0] + rng.random() * SITE_SPAN, SITE_ORIGIN[1] + rng.random() * SITE_SPAN)
+        locations[key] = Location(key, key, coordinates, "", "", dwell_minutes=rng.choice((2, 5, 10)))
+    dwell_seconds = {key: location.dwell_minutes * 60 for key, location in locations.items()}
+    return RoutePlanner(StopIndex(locations), dwell_seconds, cache_size=1), list(locations)
+
+
+def run(stop_counts, runs, seed):
+    """Benchmark each selection size and print a results table"""
+    rng = random.Random(seed)
+    print(f"{'stops':>6} {'budget':>8} {'p50 ms':>8} {'max ms':>8} {'kept':>5} {'cached us':>10}")
+    for stop_count in stop_counts:
+        planner, keys = build_planner(stop_count, rng)
+        for budget_minutes in (None, 120, 45):
+            timings = []
+            for _ in range(runs):
+                selection = rng.sample(keys, len(keys))
+                start, end = selection[0], selection[-1]
+                budget = None if budget_minutes is None else budget_minutes * 60
+                started = time.perf_counter()
+                route = planner.plan(selection, start, end, budget)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            planner.plan(selection, start, end, budget)
+            cached_us = (time.perf_counter() - started) * 1e6
+
+            label = "none" if budget_minutes is None else f"{budget_minutes}m"
+            print(f"{stop_count:>6} {label:>8} {statistics.median(timings):>8.2f} {max(timings):>8.2f} "
+                  f"{len(route.stops):>5} {cached_us:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stops", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.stops, args.runs, args.seed)
+
+
+if __name__ == "__main__":
+    main()
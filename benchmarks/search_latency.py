@@ -0,0 +1,94 @@
+"""
+Query latency benchmark for the location search index
+Grows the corpus by cloning the Taj Mahal stops into synthetic sites and
+reports index build time and p50/p99 query latency at each size.
+
+Usage: python benchmarks/search_latency.py [--sites 1 10 100 500] [--queries 2000]
+"""
+
+import argparse
+import dataclasses
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.content import load_site  # noqa: E402
+from tour_guide.search import build_location_index  # noqa: E402
+
+SAMPLE_QUESTIONS = [
+    "are shoes allowed in the tomb?",
+    "how tall is the central dome",
+    "where are the restrooms",
+    "what is pietra dura",
+    "can I take photos at the mosque",
+    "when do the fountains run",
+    "why is the mosque facing west",
+    "where did the marble come from",
+]
+
+
+def build_corpus(site_count, rng):
+    """Clone every stop into site_count synthetic sites with shuffled text"""
+    corpus = {}
+    for site in range(site_count):
+        for key, location in load_site().locations.items():
+            changes = {}
+            for field in ("architectural_features", "visitor_tips"):
+                items = list(getattr(location, field))
+                rng.shuffle(items)
+                changes[field] = tuple(items) + (f"site{site} {key} notes",)
+            clone_key = f"site{site}_{key}"
+            corpus[clone_key] = dataclasses.replace(location, key=clone_key, **changes)
+    return corpus
+
+
+def percentile(samples, fraction):
+    """Return the sample at the given fraction of the sorted samples"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(site_counts, query_count, seed):
+    """Benchmark each corpus size and print a results table"""
+    rng = random.Random(seed)
+    print(f"{'sites':>6} {'passages':>9} {'terms':>7} {'build ms':>9} {'p50 us':>8} {'p99 us':>8} {'mean us':>8}")
+    for site_count in site_counts:
+        corpus = build_corpus(site_count, rng)
+        started = time.perf_counter()
+        index = build_location_index(corpus)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        # Mix fixed questions with queries drawn from indexed text
+        vocabulary = list(index.vocabulary)
+        queries = []
+        for _ in range(query_count):
+            if rng.random() < 0.5:
+                queries.append(rng.choice(SAMPLE_QUESTIONS))
+            else:
+                queries.append(" ".join(rng.sample(vocabulary, k=min(4, len(vocabulary)))))
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, limit=3)
+            timings.append((time.perf_counter() - started) * 1e6)
+
+        print(f"{site_count:>6} {len(index):>9} {len(index.vocabulary):>7} {build_ms:>9.1f} "
+              f"{percentile(timings, 0.50):>8.1f} {percentile(timings, 0.99):>8.1f} {statistics.fmean(timings):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sites", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sites, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
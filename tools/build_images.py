@@ -0,0 +1,45 @@
+"""
+Build location photo derivatives
+Resizes every source photo under tour_guide/data/images/<site>/ into WebP
+and JPEG derivatives plus a blurred placeholder, on a process pool. Photos
+already in the content-addressed cache are skipped, so re-running after
+adding a photo only builds the new one. Restart the app to pick them up.
+
+Usage: python tools/build_images.py [--site taj_mahal ...] [--workers 4]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.content import load_site_index  # noqa: E402
+from tour_guide.images import CACHE_DIR, IMAGE_DIR, build_all, source_images  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--site", nargs="+", help="site keys (default: every site)")
+    parser.add_argument("--workers", type=int, default=None, help="build processes (default: CPU count)")
+    parser.add_argument("--images", default=IMAGE_DIR, help="source photo directory")
+    parser.add_argument("--cache", default=CACHE_DIR, help="derivative cache directory")
+    args = parser.parse_args()
+
+    sources = []
+    for site_key in args.site or load_site_index():
+        found = source_images(site_key, args.images)
+        print(f"{site_key}: {len(found)} source photos")
+        sources.extend(found.values())
+    if not sources:
+        return
+
+    started = time.perf_counter()
+    results = build_all(sources, args.cache, args.workers)
+    built = sum(1 for _, was_built in results.values() if was_built)
+    print(f"built {built}, already cached {len(results) - built}, in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Export tours as static pages
+Renders every stop of every tour (all sites and languages by default) into a
+directory that any static file server, CDN or kiosk browser can serve. Run it
+again after editing content and only the pages that changed are rebuilt.
+
+Usage:
+  python tools/export_tours.py --out /tmp/tour-export
+  python tools/export_tours.py --out /tmp/tour-export --site taj_mahal --language en --workers 4
+  python tools/export_tours.py --out /tmp/tour-export --tile-url https://tiles.example.org/tiles/{z}/{x}/{y}.png
+Then open /tmp/tour-export/index.html, or serve it: python -m http.server -d /tmp/tour-export
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.export import export_tours  # noqa: E402
+from tour_guide.tiles import TILE_ATTRIBUTION  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--site", action="append", help="site key (repeatable; default: every site)")
+    parser.add_argument("--language", action="append", help="language code (repeatable; default: every language)")
+    parser.add_argument("--tile-url", help="tile URL template for the maps (default: OpenStreetMap)")
+    parser.add_argument("--workers", type=int, help="rendering processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="render every page even if unchanged")
+    args = parser.parse_args()
+
+    tile_layer = (args.tile_url, TILE_ATTRIBUTION) if args.tile_url else None
+    started = time.perf_counter()
+    rendered, unchanged = export_tours(
+        args.out, args.site, args.language, tile_layer=tile_layer, workers=args.workers, force=args.force,
+        progress=lambda path: print(f"rendered {path}"),
+    )
+    print(f"{rendered} pages rendered, {unchanged} unchanged, in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Report the chatbot questions that need new responses
+Aggregates the question log (and its rotated files, and the logs of cluster
+workers) into the questions most often answered with the 'default'
+response, which are candidates for new chatbot_responses entries, plus a
+breakdown of how all questions were answered.
+
+Usage:
+  TOUR_GUIDE_QUESTION_LOG=~/.cache/tour_guide/questions.jsonl python tools/question_report.py
+  python tools/question_report.py --site taj_mahal --language en --top 50
+  python tools/question_report.py --kind search --log /var/log/tour_guide/questions.jsonl
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.question_log import QUESTION_LOG_ENV, read_entries  # noqa: E402
+
+
+def log_paths(path):
+    """The log at path plus the per-worker logs a cluster writes next to it"""
+    root, extension = os.path.splitext(path)
+    return [path] + sorted(glob.glob(f"{glob.escape(root)}.worker*{glob.escape(extension)}"))
+
+
+def aggregate(paths, site_key=None, language=None, since=None):
+    """Return (questions by kind, {kind: times asked}, first and last time seen)"""
+    # kind -> (site, language, question) -> Counter of response IDs
+    questions = defaultdict(lambda: defaultdict(Counter))
+    kinds = Counter()
+    first = last = None
+    for path in paths:
+        for entry in read_entries(path):
+            if site_key and entry["site"] != site_key or language and entry["lang"] != language:
+                continue
+            if since and entry["t"] < since:
+                continue
+            kinds[entry["kind"]] += entry["n"]
+            questions[entry["kind"]][entry["site"], entry["lang"], entry["q"]][entry["r"]] += entry["n"]
+            first = entry["t"] if first is None else min(first, entry["t"])
+            last = entry["t"] if last is None else max(last, entry["t"])
+    return questions, kinds, (first, last)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--log", default=os.environ.get(QUESTION_LOG_ENV), help=f"default: ${QUESTION_LOG_ENV}")
+    parser.add_argument("--site")
+    parser.add_argument("--language")
+    parser.add_argument("--kind", default="default", help="answer kind to list (default, search, keyword, external)")
+    parser.add_argument("--days", type=float, help="only questions from the last N days")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+    if not args.log:
+        parser.error(f"no question log: pass --log or set {QUESTION_LOG_ENV}")
+
+    since = time.time() - args.days * 86400 if args.days else None
+    questions, kinds, (first, last) = aggregate(log_paths(args.log), args.site, args.language, since)
+    total = sum(kinds.values())
+    if not total:
+        print(f"no questions logged in {args.log}")
+        return
+
+    period = f"{time.strftime('%Y-%m-%d', time.localtime(first))} to {time.strftime('%Y-%m-%d', time.localtime(last))}"
+    print(f"{total} questions, {period}")
+    for kind, count in kinds.most_common():
+        print(f"  {kind:<10} {count:>7} {count / total:>6.1%}")
+
+    ranked = sorted(questions[args.kind].items(), key=lambda item: (-sum(item[1].values()), item[0]))
+    print(f"\nTop {min(args.top, len(ranked))} of {len(ranked)} distinct questions answered with '{args.kind}':")
+    for (site_key, language, question), responses in ranked[:args.top]:
+        line = f"{sum(responses.values()):>6}  [{site_key}/{language}] {question}"
+        if args.kind != "default":
+            line += f"  -> {', '.join(response or '-' for response in responses)}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Serve the guide from several Streamlit worker processes
+Builds the shared store (every map, details panel and chatbot model, built
+once), starts one worker per CPU on local ports and a sticky-session
+balancer in front of them, and runs until interrupted. A tile cache named by
+TOUR_GUIDE_TILES is served once here rather than by every worker.
+
+Usage:
+  python tools/serve_cluster.py --workers 4 --port 8501
+  TOUR_GUIDE_TILES=/var/tiles/taj_mahal.tiles TOUR_GUIDE_TILE_URL=http://guide.example.org:8765/tiles/{z}/{x}/{y}.png \\
+      python tools/serve_cluster.py
+  python tools/serve_cluster.py --log-dir /var/log/tour_guide
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.cluster import (  # noqa: E402
+    DEFAULT_BALANCER_PORT, DEFAULT_WORKER_PORT, StickyBalancer, WorkerPool, build_shared_store,
+)
+from tour_guide.tiles import tile_layer_from_env  # noqa: E402
+
+DEFAULT_STORE_PATH = os.path.join(tempfile.gettempdir(), "tour_guide_shared_store.bin")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=DEFAULT_BALANCER_PORT, help="port browsers connect to")
+    parser.add_argument("--worker-port", type=int, default=DEFAULT_WORKER_PORT, help="port of the first worker")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="shared store file to build")
+    parser.add_argument("--log-dir", help="write each worker's output to worker<N>.log here (default: this terminal)")
+    args = parser.parse_args()
+
+    tile_layer = tile_layer_from_env()
+    started = time.perf_counter()
+    entries, size = build_shared_store(args.store, tile_layer=tile_layer)
+    print(f"shared store: {entries} entries, {size / 1e6:.1f} MB, built in {time.perf_counter() - started:.1f} s")
+
+    pool = WorkerPool(args.workers, os.path.abspath(args.store), args.worker_port,
+                      tile_url=tile_layer[0] if tile_layer else None, log_dir=args.log_dir)
+    try:
+        pool.wait_ready()
+        balancer = StickyBalancer([("127.0.0.1", port) for port in pool.ports], port=args.port).start()
+        print(f"{args.workers} workers on ports {pool.ports[0]}-{pool.ports[-1]}, serving on port {balancer.port}")
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
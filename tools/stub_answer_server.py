@@ -0,0 +1,65 @@
+"""
+Stub answer server for developing the streaming chatbot
+Speaks the protocol HTTPAnswerProvider expects: a JSON POST with "site" and
+"question", answered with newline-delimited {"token": ...} objects. Tokens
+are sent with a delay so streaming, timeouts and fallback can be exercised
+without a real model server.
+
+Usage: python tools/stub_answer_server.py [--port 8765] [--delay 0.05] [--stall 0] [--fail]
+Then run the app with TOUR_GUIDE_ANSWER_URL=http://127.0.0.1:8765/answer
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(delay, stall, fail):
+    """Build a request handler class with the given behaviour"""
+
+    class StubAnswerHandler(BaseHTTPRequestHandler):
+        """Streams a canned answer one word at a time"""
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if fail:
+                self.send_error(500, "stub failure")
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            # Wait before the first token, e.g. to trigger the first-chunk timeout
+            time.sleep(stall)
+            answer = f"(stub answer for {request.get('site')}) You asked: {request.get('question', '')}"
+            for word in answer.split(" "):
+                self.wfile.write(json.dumps({"token": word + " "}).encode("utf-8") + b"\n")
+                self.wfile.flush()
+                time.sleep(delay)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubAnswerHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds between tokens")
+    parser.add_argument("--stall", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--fail", action="store_true", help="answer every request with HTTP 500")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.delay, args.stall, args.fail))
+    print(f"Stub answer server on http://{args.host}:{args.port}/answer")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Build and serve offline map tile caches
+Creates an MBTiles file covering a site's stops at zooms 15-19, from a z/x/y
+tile directory or by downloading once from a tile server, and serves it.
+The fixture command writes a synthetic checkerboard tileset, so the whole
+pipeline can be tried without network access.
+
+Usage:
+  python tools/tile_cache.py fixture --site taj_mahal --out /tmp/fixture-tiles
+  python tools/tile_cache.py build --site taj_mahal --from-dir /tmp/fixture-tiles --out taj_mahal.mbtiles
+  python tools/tile_cache.py build --site taj_mahal --fetch --out taj_mahal.mbtiles
+  python tools/tile_cache.py info taj_mahal.mbtiles
+  python tools/tile_cache.py serve taj_mahal.mbtiles [--host 127.0.0.1] [--port 8766]
+Then run the app with TOUR_GUIDE_TILES=taj_mahal.mbtiles
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tour_guide.content import DEFAULT_SITE_KEY, load_site  # noqa: E402
+from tour_guide.tiles import (  # noqa: E402
+    DEFAULT_MARGIN_M, DEFAULT_TILE_HOST, DEFAULT_TILE_PORT, OSM_TILE_URL, TileServer, TileStore,
+    describe_area, fetch_tiles, import_directory, site_bounds, tiles_in_bounds,
+)
+
+TILE_SIZE = 256
+FIXTURE_COLOURS = ((230, 224, 210), (200, 214, 190))
+
+
+def parse_zooms(text):
+    """Parse '15-19' or '15,17' into a list of zoom levels"""
+    if "-" in text:
+        low, high = text.split("-", 1)
+        return list(range(int(low), int(high) + 1))
+    return [int(zoom) for zoom in text.split(",")]
+
+
+def solid_png(colour):
+    """Encode a TILE_SIZE square PNG of one RGB colour"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + bytes(colour) * TILE_SIZE
+    header = struct.pack(">IIBBBBB", TILE_SIZE, TILE_SIZE, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(row * TILE_SIZE, 9)) + chunk(b"IEND", b""))
+
+
+def write_fixture(args):
+    """Write a checkerboard z/x/y tileset covering the site"""
+    bounds = site_bounds(load_site(args.site), args.margin)
+    images = [solid_png(colour) for colour in FIXTURE_COLOURS]
+    written = 0
+    for zoom, x, y in tiles_in_bounds(bounds, args.zooms):
+        directory = os.path.join(args.out, str(zoom), str(x))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{y}.png"), "wb") as tile_file:
+            tile_file.write(images[(x + y) % 2])
+        written += 1
+    print(f"wrote {written} fixture tiles to {args.out}")
+
+
+def build(args):
+    """Fill an MBTiles file for a site from a directory or a tile server"""
+    site = load_site(args.site)
+    bounds = site_bounds(site, args.margin)
+    store = TileStore(args.out)
+    describe_area(store, site.name, bounds, args.zooms)
+    if args.from_dir:
+        added = import_directory(store, args.from_dir, bounds, args.zooms)
+        print(f"imported {added} tiles from {args.from_dir}")
+    if args.fetch:
+        wanted = sum(1 for _ in tiles_in_bounds(bounds, args.zooms))
+        print(f"fetching up to {wanted} tiles from {args.source}")
+        added = fetch_tiles(store, bounds, args.zooms, args.source, progress=lambda *tile: print(*tile, end="\r"))
+        print(f"fetched {added} new tiles")
+    show_counts(store)
+    store.close()
+
+
+def show_counts(store):
+    """Print the tiles stored per zoom level"""
+    for zoom, count in store.counts().items():
+        print(f"  z{zoom}: {count} tiles")
+
+
+def info(args):
+    """Print an MBTiles file's metadata and tile counts"""
+    store = TileStore(args.path)
+    for name, value in sorted(store.metadata().items()):
+        print(f"{name}: {value}")
+    show_counts(store)
+    store.close()
+
+
+def serve(args):
+    """Serve an MBTiles file until interrupted"""
+    server = TileServer(TileStore(args.path), host=args.host, port=args.port).start()
+    print(f"serving {args.path} at {server.url_template}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def area_options(command):
+        command.add_argument("--site", default=DEFAULT_SITE_KEY)
+        command.add_argument("--zooms", type=parse_zooms, default=parse_zooms("15-19"))
+        command.add_argument("--margin", type=float, default=DEFAULT_MARGIN_M, help="metres around the stops")
+
+    fixture = commands.add_parser("fixture", help="write a synthetic tileset for offline testing")
+    area_options(fixture)
+    fixture.add_argument("--out", required=True)
+    fixture.set_defaults(handler=write_fixture)
+
+    build_command = commands.add_parser("build", help="create or top up an MBTiles file for a site")
+    area_options(build_command)
+    build_command.add_argument("--out", required=True)
+    build_command.add_argument("--from-dir", help="import tiles from a z/x/y.png directory")
+    build_command.add_argument("--fetch", action="store_true", help="download missing tiles")
+    build_command.add_argument("--source", default=OSM_TILE_URL, help="tile URL template for --fetch")
+    build_command.set_defaults(handler=build)
+
+    info_command = commands.add_parser("info", help="show an MBTiles file's metadata and tile counts")
+    info_command.add_argument("path")
+    info_command.set_defaults(handler=info)
+
+    serve_command = commands.add_parser("serve", help="serve an MBTiles file over HTTP")
+    serve_command.add_argument("path")
+    serve_command.add_argument("--host", default=DEFAULT_TILE_HOST, help="interface to listen on")
+    serve_command.add_argument("--port", type=int, default=DEFAULT_TILE_PORT)
+    serve_command.set_defaults(handler=serve)
+
+    args = parser.parse_args()
+    if args.command == "build" and not (args.from_dir or args.fetch):
+        parser.error("build needs --from-dir and/or --fetch")
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
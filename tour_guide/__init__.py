@@ -0,0 +1,5 @@
+"""
+Support modules for the Taj Mahal Virtual Tourist Guide
+Everything here is imported once per process, so structures built at import
+or first use are shared by every Streamlit session and rerun.
+"""
@@ -0,0 +1,267 @@
+"""
+Pluggable, streaming answer providers for the chatbot
+A provider turns a question into a stream of text chunks. AnswerService runs
+the chosen provider on a shared thread pool so a slow answer source (a
+retrieval service, a local model server) never blocks the script thread,
+and falls back to the keyword chatbot on errors or timeouts.
+
+Set TOUR_GUIDE_ANSWER_URL to stream answers from a local HTTP model server;
+tools/stub_answer_server.py is a stand-in for development.
+"""
+
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from tour_guide.chatbot import Answer, answer_question
+
+ANSWER_URL_ENV = "TOUR_GUIDE_ANSWER_URL"
+DEFAULT_WORKERS = 8
+# Seconds to wait for the first chunk, and for the whole answer
+DEFAULT_FIRST_CHUNK_TIMEOUT = 5.0
+DEFAULT_TOTAL_TIMEOUT = 30.0
+
+FALLBACK_SOURCE = "fallback"
+
+
+class AnswerProvider:
+    """Source of chatbot answers; subclasses implement stream()"""
+
+    name = "provider"
+
+    def stream(self, site, question, on_cancel=None):
+        """Yield the answer to question as text chunks
+
+        A provider may instead yield a single chatbot Answer, whose response
+        ID lets the chat history store it without copying the text. A provider
+        that blocks on I/O passes a callback to on_cancel, which runs it (from
+        another thread) when the answer is cancelled, to unblock the read.
+        """
+        raise NotImplementedError
+
+
+class KeywordAnswerProvider(AnswerProvider):
+    """Answers from the site's keyword responses and location search index"""
+
+    name = "keyword"
+
+    def stream(self, site, question, on_cancel=None):
+        """Yield the keyword/search Answer as one chunk"""
+        yield answer_question(site, question)
+
+
+class HTTPAnswerProvider(AnswerProvider):
+    """Streams answers from a local model server
+
+    The server receives a JSON POST {"site": ..., "question": ...} and replies
+    with newline-delimited JSON objects, each carrying a "token" string.
+    """
+
+    name = "http"
+
+    def __init__(self, url, timeout=DEFAULT_FIRST_CHUNK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def stream(self, site, question, on_cancel=None):
+        """Yield tokens from the server as they arrive; cancelling shuts the connection"""
+        url = urllib.parse.urlsplit(self.url)
+        connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(url.netloc, timeout=self.timeout)
+        try:
+            connection.connect()
+            if on_cancel is not None:
+                # A stalled server would otherwise hold the worker until the socket
+                # times out; the connection drops its reference once the response is read
+                sock = connection.sock
+                on_cancel(lambda: _shutdown(sock))
+            body = json.dumps({"site": site.key, "question": question}).encode("utf-8")
+            path = url.path or "/"
+            if url.query:
+                path += "?" + url.query
+            connection.request(
+                "POST",
+                path,
+                body=body,
+                headers={"Content-Type": "application/json", "Accept": "application/x-ndjson"},
+            )
+            response = connection.getresponse()
+            if not 200 <= response.status < 300:
+                raise OSError(f"answer server replied {response.status} {response.reason}")
+            for line in response:
+                line = line.strip()
+                if not line:
+                    continue
+                token = json.loads(line).get("token", "")
+                if token:
+                    yield token
+        finally:
+            connection.close()
+
+
+def _shutdown(sock):
+    """Shut a socket down so a read blocked on it in another thread returns"""
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class AnswerStream:
+    """Handle on an answer being generated in the background
+
+    Iterating yields new chunks as they arrive. The text received so far is
+    kept on the handle, so a Streamlit rerun that interrupts iteration can
+    render it and carry on from the same stream.
+    """
+
+    def __init__(self, question, fallback, first_chunk_timeout, total_timeout):
+        self.question = question
+        self.text = ""
+        self.source = None
+        # Set when the whole answer is a stored chatbot response
+        self.response_id = None
+        self.done = False
+        self.error = None
+        self._fallback = fallback
+        self._chunks = queue.Queue()
+        self._cancelled = threading.Event()
+        self._cancel_callbacks = []
+        self._cancel_lock = threading.Lock()
+        self._started = time.monotonic()
+        self._first_chunk_timeout = first_chunk_timeout
+        self._total_timeout = total_timeout
+
+    def cancel(self):
+        """Ask the producer to stop; the stream ends with what it has"""
+        with self._cancel_lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def _on_cancel(self, callback):
+        """Run callback when the stream is cancelled, or now if it already was"""
+        with self._cancel_lock:
+            if not self._cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    @property
+    def cancelled(self):
+        """Whether the stream was cancelled or gave up"""
+        return self._cancelled.is_set()
+
+    def _produce(self, provider, site):
+        """Run provider on a worker thread, feeding chunks to the queue"""
+        try:
+            for chunk in provider.stream(site, self.question, on_cancel=self._on_cancel):
+                if self._cancelled.is_set():
+                    break
+                self._chunks.put(("chunk", provider.name, chunk))
+            self._chunks.put(("end", provider.name, None))
+        except Exception as error:  # any provider failure falls back to keywords
+            self._chunks.put(("error", provider.name, error))
+
+    def _use_fallback(self, error=None):
+        """Replace whatever was received with the fallback answer"""
+        self.cancel()
+        self.error = error
+        self.source = FALLBACK_SOURCE
+        self._take_answer(self._fallback())
+        self.done = True
+        return self.text
+
+    def _take_answer(self, answer):
+        """Accept a chunk that is a whole chatbot Answer"""
+        self.response_id = answer.response_id
+        self.text = answer.text
+
+    def __iter__(self):
+        while not self.done:
+            elapsed = time.monotonic() - self._started
+            limit = self._first_chunk_timeout if not self.text else self._total_timeout
+            try:
+                kind, source, payload = self._chunks.get(timeout=max(0.0, limit - elapsed))
+            except queue.Empty:
+                if not self.text:
+                    yield self._use_fallback(TimeoutError("answer provider did not respond in time"))
+                else:
+                    # Keep the partial answer rather than discarding it
+                    self.cancel()
+                    self.error = TimeoutError("answer provider timed out mid-answer")
+                    self.text += " …"
+                    self.done = True
+                    yield " …"
+                return
+            if kind == "chunk":
+                self.source = source
+                if isinstance(payload, Answer):
+                    self._take_answer(payload)
+                    payload = payload.text
+                else:
+                    self.response_id = None
+                    self.text += payload
+                yield payload
+            elif kind == "end":
+                self.done = True
+                if not self.text:
+                    yield self._use_fallback()
+            else:
+                if not self.text:
+                    yield self._use_fallback(payload)
+                else:
+                    self.error = payload
+                    self.done = True
+
+
+class AnswerService:
+    """Runs answer providers off the script thread with timeouts and fallback"""
+
+    def __init__(self, provider=None, fallback=None, max_workers=DEFAULT_WORKERS,
+                 first_chunk_timeout=DEFAULT_FIRST_CHUNK_TIMEOUT, total_timeout=DEFAULT_TOTAL_TIMEOUT):
+        self.fallback = fallback or KeywordAnswerProvider()
+        self.provider = provider or self.fallback
+        self.first_chunk_timeout = first_chunk_timeout
+        self.total_timeout = total_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="answer")
+
+    def ask(self, site, question):
+        """Start answering question and return its AnswerStream"""
+        stream = AnswerStream(
+            question,
+            fallback=lambda: self._fallback_answer(site, question),
+            first_chunk_timeout=self.first_chunk_timeout,
+            total_timeout=self.total_timeout,
+        )
+        self._executor.submit(stream._produce, self.provider, site)
+        return stream
+
+    def _fallback_answer(self, site, question):
+        """Run the fallback provider inline and return its Answer"""
+        chunks = list(self.fallback.stream(site, question))
+        if len(chunks) == 1 and isinstance(chunks[0], Answer):
+            return chunks[0]
+        return Answer(None, "".join(chunks))
+
+    def shutdown(self):
+        """Stop accepting questions and release the worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def answer_service_from_env(**options):
+    """Create an AnswerService using the HTTP provider if TOUR_GUIDE_ANSWER_URL is set"""
+    url = os.environ.get(ANSWER_URL_ENV)
+    provider = HTTPAnswerProvider(url) if url else None
+    return AnswerService(provider=provider, **options)
@@ -0,0 +1,192 @@
+"""
+Keyword, intent and retrieval chatbot
+Answers come from the site's canned chatbot_responses when a keyword
+matches or the intent classifier recognises a paraphrase of one, otherwise
+from the best passages of the location search index, otherwise from the
+'default' response. Answers are cached per site bundle by normalized
+question, so repeated questions skip matching.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+from tour_guide.content import DEFAULT_RESPONSE_KEY
+from tour_guide.intents import IntentClassifier, load_intent_model, train_intent_model, training_examples
+from tour_guide.matcher import KeywordMatcher, load_keyword_matcher
+from tour_guide.search import build_location_index, load_search_index
+from tour_guide.shared_store import attached_store
+
+# Free-form questions that match no keyword are answered from location text
+SEARCH_RESULT_LIMIT = 3
+SEARCH_MIN_SCORE = 2.0
+DEFAULT_ANSWER_CACHE_SIZE = 1024
+
+# response_id is the matched response key, DEFAULT_RESPONSE_KEY, or
+# SEARCH_RESPONSE_PREFIX followed by the passage numbers used
+Answer = namedtuple("Answer", ["response_id", "text"])
+SEARCH_RESPONSE_PREFIX = "search:"
+
+
+class AnswerCache:
+    """LRU cache of Answers by normalized question"""
+
+    def __init__(self, capacity=DEFAULT_ANSWER_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._answers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._answers)
+
+    def get(self, question):
+        """Return the cached Answer for a normalized question, or None"""
+        with self._lock:
+            answer = self._answers.get(question)
+            if answer is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._answers.move_to_end(question)
+            return answer
+
+    def put(self, question, answer):
+        with self._lock:
+            self._answers[question] = answer
+            self._answers.move_to_end(question)
+            while len(self._answers) > self.capacity:
+                self._answers.popitem(last=False)
+
+
+def normalize_question(text):
+    """Lowercase a question and collapse its whitespace, the form answers are cached under"""
+    return " ".join(text.lower().split())
+
+
+def site_answer_cache(site):
+    """Return the site bundle's answer cache"""
+    return site.derived("answer_cache", lambda site: AnswerCache())
+
+
+def keyword_matcher_key(site):
+    """Shared store prefix of a site bundle's keyword matcher"""
+    return f"keywords/{site.key}/{site.language}/{site.version}"
+
+
+def site_keyword_matcher(site):
+    """Return the site's keyword matcher, compiled from the phrases of its language
+
+    The automaton comes from the attached shared store when it has one for the site.
+    """
+    def build(site):
+        store = attached_store()
+        matcher = load_keyword_matcher(store, keyword_matcher_key(site)) if store is not None else None
+        return matcher or KeywordMatcher(site.chatbot_keywords)
+
+    return site.derived("keyword_matcher", build)
+
+
+def intent_model_key(site):
+    """Shared store prefix of a site bundle's intent model"""
+    return f"intents/{site.key}/{site.language}/{site.version}"
+
+
+def site_intent_classifier(site):
+    """Return the site's intent classifier, trained on the phrases of its language
+
+    The model comes from the attached shared store when it has one for the site.
+    """
+    def build(site):
+        store = attached_store()
+        model = load_intent_model(store, intent_model_key(site)) if store is not None else None
+        return IntentClassifier(model or train_intent_model(training_examples(site)))
+
+    return site.derived("intent_classifier", build)
+
+
+def search_index_key(site):
+    """Shared store prefix of a site bundle's location search index"""
+    return f"search/{site.key}/{site.language}/{site.version}"
+
+
+def site_search_index(site):
+    """Return the site's location search index
+
+    The index comes from the attached shared store when it has one for the site.
+    """
+    def build(site):
+        store = attached_store()
+        index = load_search_index(store, search_index_key(site)) if store is not None else None
+        return index or build_location_index(site.locations)
+
+    return site.derived("location_index", build)
+
+
+def format_search_results(site, passages):
+    """Format ranked location passages as a chatbot answer"""
+    lines = ["Here's what I found along the tour:"]
+    for passage in passages:
+        lines.append(f"- **{site.locations[passage.location_key].name}:** {passage.text}")
+    return "\n".join(lines)
+
+
+def answer_question(site, user_input):
+    """Return the Answer for a question, from the site's answer cache when it was asked before"""
+    question = normalize_question(user_input)
+    cache = site_answer_cache(site)
+    answer = cache.get(question)
+    if answer is None:
+        answer = _answer_question(site, question)
+        cache.put(question, answer)
+    return answer
+
+
+def _answer_question(site, user_input):
+    keyword = site_keyword_matcher(site).best_match(user_input)
+    if keyword:
+        response_key = site.chatbot_keywords[keyword]
+        return Answer(response_key, site.chatbot_responses[response_key])
+
+    intent = site_intent_classifier(site).classify(user_input)
+    if intent is not None:
+        return Answer(intent.response_key, site.chatbot_responses[intent.response_key])
+
+    index = site_search_index(site)
+    results = index.search(user_input, limit=SEARCH_RESULT_LIMIT, min_score=SEARCH_MIN_SCORE)
+    if results:
+        response_id = SEARCH_RESPONSE_PREFIX + ",".join(str(result.passage_id) for result in results)
+        return Answer(response_id, format_search_results(site, [result.passage for result in results]))
+
+    return Answer(DEFAULT_RESPONSE_KEY, site.chatbot_responses[DEFAULT_RESPONSE_KEY])
+
+
+def get_chatbot_response(site, user_input):
+    """Generate chatbot response based on user input"""
+    return answer_question(site, user_input).text
+
+
+def response_text(site, response_id, version=None):
+    """Return the text of a stored response_id, as produced by answer_question
+
+    version is the content version the ID was produced with, if not site's.
+    """
+    if response_id.startswith(SEARCH_RESPONSE_PREFIX):
+        passages = site_search_index(site).passages
+        ids = [int(passage_id) for passage_id in response_id[len(SEARCH_RESPONSE_PREFIX):].split(",")]
+        # Passage IDs number one version's passages; a reload renumbers them
+        if version in (None, site.version) and all(passage_id < len(passages) for passage_id in ids):
+            return format_search_results(site, [passages[passage_id] for passage_id in ids])
+        return site.chatbot_responses[DEFAULT_RESPONSE_KEY]
+    return site.chatbot_responses.get(response_id, site.chatbot_responses[DEFAULT_RESPONSE_KEY])
+
+
+def answer_kind(response_id):
+    """Classify a response_id as 'keyword', 'search', 'default' or 'external' (no ID)"""
+    if response_id is None:
+        return "external"
+    if response_id == DEFAULT_RESPONSE_KEY:
+        return "default"
+    if response_id.startswith(SEARCH_RESPONSE_PREFIX):
+        return "search"
+    return "keyword"
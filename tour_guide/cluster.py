@@ -0,0 +1,266 @@
+"""
+Multi-process serving
+A Streamlit process runs every script rerun under one GIL, so one process
+uses one core. The cluster runs N Streamlit workers on local ports behind a
+sticky-session balancer: a browser's first request is sent to the worker
+with the fewest open connections, and a cookie keeps its later requests
+and its websocket on that worker, where its session lives.
+
+Before the workers start, the launcher renders every tour map and details
+panel, trains every intent model and builds every keyword matcher and
+search index into one shared store file (tour_guide/shared_store.py), which
+the workers map read-only instead of each building their own copies.
+Workers inherit the launcher's output, or write worker<N>.log files into a
+log directory when one is given. Crowd tracking (tour_guide/crowds.py) stays
+per worker, so each one sees only its own visitors.
+
+tools/serve_cluster.py runs it.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import folium
+
+from tour_guide.chatbot import intent_model_key, keyword_matcher_key, search_index_key
+from tour_guide.content import DATA_DIR, load_site, load_site_index, site_languages
+from tour_guide.intents import save_intent_model, train_intent_model, training_examples
+from tour_guide.matcher import KeywordMatcher, save_keyword_matcher
+from tour_guide.metrics import METRICS_JSONL_ENV, METRICS_PORT_ENV, PROFILE_ENV
+from tour_guide.question_log import QUESTION_LOG_ENV
+from tour_guide.rendering import build_map, render_location_panel
+from tour_guide.search import build_location_index, save_search_index
+from tour_guide.shared_store import SHARED_STORE_ENV, StoreWriter, map_key, panel_key
+from tour_guide.tiles import TILE_PORT_ENV, TILE_URL_ENV, TILES_ENV
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+WORKER_COOKIE = "tour_guide_worker"
+DEFAULT_BALANCER_PORT = 8501
+DEFAULT_WORKER_PORT = 8600
+PHOTO_TOUR_KEY = "photography"
+WORKER_START_TIMEOUT = 60
+# Request heads larger than this are refused
+_MAX_HEAD = 64 * 1024
+_PIPE_CHUNK = 64 * 1024
+
+
+def build_shared_store(path, site_keys=None, data_dir=DATA_DIR, tile_layer=None):
+    """Pre-render every tour map and details panel, and build every chatbot model, into a store file
+
+    tile_layer is (URL template, attribution), or None for OpenStreetMap; the
+    workers must show the same tiles. Returns (entries, bytes written).
+    """
+    tiles, attribution = tile_layer or ("OpenStreetMap", None)
+    writer = StoreWriter()
+    for site_key in site_keys or load_site_index(data_dir):
+        for language in site_languages(site_key, data_dir):
+            site = load_site(site_key, data_dir, language)
+            save_intent_model(writer, intent_model_key(site), train_intent_model(training_examples(site)))
+            save_keyword_matcher(writer, keyword_matcher_key(site), KeywordMatcher(site.chatbot_keywords))
+            save_search_index(writer, search_index_key(site), build_location_index(site.locations))
+            for tour in site.tours.values():
+                stops = tour.locations
+                for position, location_key in enumerate(stops):
+                    next_location_key = stops[position + 1] if position + 1 < len(stops) else None
+                    is_photo_tour = tour.key == PHOTO_TOUR_KEY
+                    writer.add_text(
+                        panel_key(site, location_key, next_location_key, is_photo_tour),
+                        render_location_panel(site, location_key, next_location_key, is_photo_tour),
+                    )
+                    figure = folium.Figure().add_child(build_map(site, location_key, stops, tiles, attribution))
+                    writer.add_text(map_key(site, stops, location_key), figure.render())
+    size = writer.write(path, meta={"tiles": [tiles, attribution]})
+    return len(writer), size
+
+
+def worker_environment(index, shared_store_path, tile_url=None):
+    """Environment for worker number index: the shared store, and per-worker ports and files"""
+    env = dict(os.environ)
+    env[SHARED_STORE_ENV] = shared_store_path
+    # The launcher serves the tile cache once; workers only need its URL
+    env.pop(TILES_ENV, None)
+    env.pop(TILE_PORT_ENV, None)
+    if tile_url:
+        env[TILE_URL_ENV] = tile_url
+    if env.get(METRICS_PORT_ENV):
+        env[METRICS_PORT_ENV] = str(int(env[METRICS_PORT_ENV]) + index)
+    # Each worker appends to and rotates its own question log and metrics files
+    for name in (METRICS_JSONL_ENV, PROFILE_ENV, QUESTION_LOG_ENV):
+        if env.get(name):
+            root, extension = os.path.splitext(env[name])
+            env[name] = f"{root}.worker{index}{extension}"
+    return env
+
+
+class WorkerPool:
+    """Streamlit worker processes on consecutive local ports"""
+
+    def __init__(self, count, shared_store_path, base_port=DEFAULT_WORKER_PORT, tile_url=None, app_path=APP_PATH,
+                 log_dir=None):
+        self.ports = [base_port + index for index in range(count)]
+        self.log_paths = [None] * count
+        self._processes = []
+        for index, port in enumerate(self.ports):
+            command = [
+                sys.executable, "-m", "streamlit", "run", app_path,
+                "--server.port", str(port), "--server.address", "127.0.0.1", "--server.headless", "true",
+            ]
+            log_file = None
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+                self.log_paths[index] = os.path.join(log_dir, f"worker{index}.log")
+                log_file = open(self.log_paths[index], "ab")
+            try:
+                self._processes.append(subprocess.Popen(
+                    command, env=worker_environment(index, shared_store_path, tile_url),
+                    stdout=log_file, stderr=subprocess.STDOUT if log_file else None,
+                ))
+            finally:
+                # The worker holds its own copy of the descriptor
+                if log_file is not None:
+                    log_file.close()
+
+    def wait_ready(self, timeout=WORKER_START_TIMEOUT):
+        """Block until every worker answers its health check"""
+        deadline = time.monotonic() + timeout
+        for port, process, log_path in zip(self.ports, self._processes, self.log_paths):
+            while True:
+                if process.poll() is not None:
+                    see = f" (see {log_path})" if log_path else ""
+                    raise RuntimeError(f"worker on port {port} exited with status {process.returncode}{see}")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2):
+                        break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"worker on port {port} did not start in {timeout} s") from None
+                    time.sleep(0.2)
+
+    def stop(self):
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def _worker_from_cookie(head, worker_count):
+    """Return the worker index pinned by the request's cookie, or None"""
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() != b"cookie":
+            continue
+        for cookie in value.split(b";"):
+            cookie_name, _, cookie_value = cookie.strip().partition(b"=")
+            if cookie_name == WORKER_COOKIE.encode() and cookie_value.isdigit():
+                index = int(cookie_value)
+                if index < worker_count:
+                    return index
+    return None
+
+
+class StickyBalancer:
+    """TCP proxy pinning each browser to one backend with a cookie
+
+    Only the first request head of each client connection is read; after
+    that bytes are piped both ways, so websocket upgrades pass through.
+    """
+
+    def __init__(self, backends, host="0.0.0.0", port=DEFAULT_BALANCER_PORT):
+        self.backends = list(backends)
+        self.host = host
+        self.port = port
+        self.connections = [0] * len(self.backends)
+        self._next = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    async def _pipe(self, reader, writer):
+        try:
+            while True:
+                data = await reader.read(_PIPE_CHUNK)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, client_reader, client_writer):
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+        index = _worker_from_cookie(head, len(self.backends))
+        pin = index is None
+        if pin:
+            # Fewest open connections; ties rotate so idle workers share new browsers
+            count = len(self.backends)
+            order = [(self._next + offset) % count for offset in range(count)]
+            index = min(order, key=self.connections.__getitem__)
+            self._next = (index + 1) % count
+
+        host, port = self.backends[index]
+        try:
+            backend_reader, backend_writer = await asyncio.open_connection(host, port)
+        except OSError:
+            client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            client_writer.close()
+            return
+
+        self.connections[index] += 1
+        try:
+            backend_writer.write(head)
+            if pin:
+                # Add the cookie to the first response, after its status line
+                response_head = await backend_reader.readuntil(b"\r\n\r\n")
+                status, _, rest = response_head.partition(b"\r\n")
+                cookie = f"Set-Cookie: {WORKER_COOKIE}={index}; Path=/; HttpOnly; SameSite=Lax\r\n".encode()
+                client_writer.write(status + b"\r\n" + cookie + rest)
+            await asyncio.gather(
+                self._pipe(client_reader, backend_writer),
+                self._pipe(backend_reader, client_writer),
+            )
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            backend_writer.close()
+        finally:
+            self.connections[index] -= 1
+
+    async def _serve(self, ready):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=_MAX_HEAD)
+        self.port = self._server.sockets[0].getsockname()[1]
+        ready.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def start(self):
+        """Serve on a daemon thread; returns once listening"""
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=lambda: self._loop.run_until_complete(self._serve(ready)), name="balancer", daemon=True
+        )
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Stop accepting connections and wait for the serving thread"""
+        if self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._thread.join()
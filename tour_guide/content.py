@@ -0,0 +1,429 @@
+"""
+Site content store
+Loads a site's locations, tours and chatbot knowledge from a JSON file,
+validates it once and exposes it as read-only objects. Caching loaded sites
+is left to tour_guide.sites, so Streamlit reruns never re-parse content.
+
+Other languages are overlays in data/translations/<site>/<language>.json
+that replace text fields and add chatbot keywords in that language. Loading
+a site in a language merges the overlay into a complete SiteContent (a
+language bundle) that is used exactly like the English one.
+
+Each bundle carries a version, a digest of the files it was built from, so
+caches kept outside it can tell a reloaded bundle from the one before.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SITE_INDEX_FILE = "sites.json"
+DEFAULT_SITE_KEY = "taj_mahal"
+DEFAULT_RESPONSE_KEY = "default"
+NOT_APPLICABLE = "N/A"
+DEFAULT_DWELL_MINUTES = 5
+DEFAULT_LANGUAGE = "en"
+
+# Display names for the language picker; unknown codes are shown as-is
+LANGUAGE_NAMES = {
+    "en": "English",
+    "hi": "हिन्दी",
+    "es": "Español",
+    "fr": "Français",
+    "de": "Deutsch",
+    "ja": "日本語",
+    "zh": "中文",
+}
+
+# Fields a translation overlay may replace
+TRANSLATABLE_SITE_FIELDS = ("name", "heritage_status", "address", "opening_hours")
+TRANSLATABLE_LOCATION_FIELDS = (
+    "name", "description", "historical_significance", "architectural_features", "visitor_tips",
+    "next_directions", "walking_time", "walking_distance", "best_photo_spot", "camera_settings",
+)
+TRANSLATABLE_TOUR_FIELDS = ("name", "duration", "description")
+
+
+class ContentError(ValueError):
+    """Raised when a site content file is missing or malformed"""
+
+
+@dataclass(frozen=True)
+class Location:
+    """A stop on a tour"""
+    key: str
+    name: str
+    coordinates: tuple
+    description: str
+    historical_significance: str
+    architectural_features: tuple = ()
+    visitor_tips: tuple = ()
+    next_directions: str = NOT_APPLICABLE
+    walking_time: str = NOT_APPLICABLE
+    walking_distance: str = NOT_APPLICABLE
+    best_photo_spot: str = ""
+    camera_settings: tuple = ()
+    dwell_minutes: float = DEFAULT_DWELL_MINUTES
+
+
+@dataclass(frozen=True)
+class Tour:
+    """An ordered selection of stops"""
+    key: str
+    name: str
+    duration: str
+    locations: tuple
+    description: str
+
+
+@dataclass(frozen=True)
+class SiteContent:
+    """Everything the guide knows about one heritage site"""
+    key: str
+    name: str
+    map_center: tuple
+    map_zoom: int
+    locations: MappingProxyType = field(repr=False)
+    tours: MappingProxyType = field(repr=False)
+    chatbot_responses: MappingProxyType = field(repr=False)
+    # Lowercase phrase -> chatbot response key, in this bundle's language
+    chatbot_keywords: MappingProxyType = field(repr=False)
+    # Response key -> example questions, for the intent classifier
+    chatbot_examples: MappingProxyType = field(repr=False)
+    language: str = DEFAULT_LANGUAGE
+    icon: str = ""
+    heritage_status: str = ""
+    address: str = ""
+    opening_hours: str = ""
+    # Digest of the content files this bundle was loaded from
+    version: str = ""
+    # Data directory the bundle was loaded from; its photos live there too
+    data_dir: str = field(default=DATA_DIR, repr=False, compare=False)
+    # Footpath GeoJSON read together with the content (tour_guide/paths.py), or None
+    footpaths: str = field(default=None, repr=False, compare=False)
+    # Structures derived from the content (indexes, rendered fragments), built
+    # on first use and dropped together with the site. The lock is reentrant
+    # because factories may build other derived structures they depend on.
+    _derived: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+    _derived_lock: object = field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+
+    def derived(self, name, factory):
+        """Return the structure stored under name, building it with factory(site) on first use"""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = factory(self)
+            return self._derived[name]
+
+
+def _require(data, name, expected_type, where):
+    """Return data[name], checking that it exists and has the expected type"""
+    if name not in data:
+        raise ContentError(f"{where}: missing required field '{name}'")
+    value = data[name]
+    if not isinstance(value, expected_type):
+        expected = " or ".join(t.__name__ for t in expected_type) if isinstance(expected_type, tuple) else expected_type.__name__
+        raise ContentError(f"{where}: field '{name}' should be {expected}, got {type(value).__name__}")
+    return value
+
+
+def _optional(data, name, expected_type, default, where):
+    """Return data[name] if present, checking its type, else default"""
+    if name not in data:
+        return default
+    return _require(data, name, expected_type, where)
+
+
+def _string_tuple(values, name, where):
+    """Validate a list of strings and freeze it"""
+    if not all(isinstance(value, str) for value in values):
+        raise ContentError(f"{where}: every entry of '{name}' should be a string")
+    return tuple(values)
+
+
+def _coordinates(values, name, where):
+    """Validate a [lat, lon] pair and freeze it"""
+    if len(values) != 2 or not all(isinstance(value, (int, float)) for value in values):
+        raise ContentError(f"{where}: '{name}' should be a [latitude, longitude] pair")
+    latitude, longitude = float(values[0]), float(values[1])
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ContentError(f"{where}: '{name}' is out of range: {values}")
+    return (latitude, longitude)
+
+
+def _parse_location(key, data, where):
+    """Build a Location from its JSON object"""
+    where = f"{where}: location '{key}'"
+    if not isinstance(data, dict):
+        raise ContentError(f"{where} should be an object")
+    return Location(
+        key=key,
+        name=_require(data, "name", str, where),
+        coordinates=_coordinates(_require(data, "coordinates", list, where), "coordinates", where),
+        description=_require(data, "description", str, where),
+        historical_significance=_require(data, "historical_significance", str, where),
+        architectural_features=_string_tuple(_optional(data, "architectural_features", list, [], where), "architectural_features", where),
+        visitor_tips=_string_tuple(_optional(data, "visitor_tips", list, [], where), "visitor_tips", where),
+        next_directions=_optional(data, "next_directions", str, NOT_APPLICABLE, where),
+        walking_time=_optional(data, "walking_time", str, NOT_APPLICABLE, where),
+        walking_distance=_optional(data, "walking_distance", str, NOT_APPLICABLE, where),
+        best_photo_spot=_optional(data, "best_photo_spot", str, "", where),
+        camera_settings=_string_tuple(_optional(data, "camera_settings", list, [], where), "camera_settings", where),
+        dwell_minutes=_optional(data, "dwell_minutes", (int, float), DEFAULT_DWELL_MINUTES, where),
+    )
+
+
+def _parse_tour(key, data, locations, where):
+    """Build a Tour from its JSON object, checking its stops exist"""
+    where = f"{where}: tour '{key}'"
+    if not isinstance(data, dict):
+        raise ContentError(f"{where} should be an object")
+    stops = _string_tuple(_require(data, "locations", list, where), "locations", where)
+    if not stops:
+        raise ContentError(f"{where}: tour has no locations")
+    unknown = [stop for stop in stops if stop not in locations]
+    if unknown:
+        raise ContentError(f"{where}: unknown locations {unknown}")
+    if len(set(stops)) != len(stops):
+        raise ContentError(f"{where}: a location is visited more than once")
+    return Tour(
+        key=key,
+        name=_require(data, "name", str, where),
+        duration=_require(data, "duration", str, where),
+        locations=stops,
+        description=_require(data, "description", str, where),
+    )
+
+
+def parse_site(data, where="site"):
+    """Validate decoded site JSON and build a read-only SiteContent"""
+    if not isinstance(data, dict):
+        raise ContentError(f"{where}: site content should be a JSON object")
+
+    locations = {
+        key: _parse_location(key, value, where)
+        for key, value in _require(data, "locations", dict, where).items()
+    }
+    if not locations:
+        raise ContentError(f"{where}: site has no locations")
+
+    tours = {
+        key: _parse_tour(key, value, locations, where)
+        for key, value in _require(data, "tours", dict, where).items()
+    }
+    if not tours:
+        raise ContentError(f"{where}: site has no tours")
+
+    responses = _require(data, "chatbot_responses", dict, where)
+    if not all(isinstance(value, str) for value in responses.values()):
+        raise ContentError(f"{where}: every chatbot response should be a string")
+    if DEFAULT_RESPONSE_KEY not in responses:
+        raise ContentError(f"{where}: chatbot_responses needs a '{DEFAULT_RESPONSE_KEY}' entry")
+
+    # Each response key is its own keyword; chatbot_keywords adds more phrases
+    # (synonyms, or the words of another language) per response
+    keywords = {key.lower(): key for key in responses if key != DEFAULT_RESPONSE_KEY}
+    for response_key, phrases in _optional(data, "chatbot_keywords", dict, {}, where).items():
+        if response_key not in responses or response_key == DEFAULT_RESPONSE_KEY:
+            raise ContentError(f"{where}: chatbot keywords for unknown response '{response_key}'")
+        if not isinstance(phrases, list):
+            raise ContentError(f"{where}: chatbot keywords for '{response_key}' should be a list")
+        for phrase in _string_tuple(phrases, "chatbot_keywords", where):
+            keywords.setdefault(phrase.lower(), response_key)
+
+    # Whole questions phrased the way visitors ask them, for answers that no
+    # keyword catches (see tour_guide/intents.py)
+    examples = {}
+    for response_key, questions in _optional(data, "chatbot_examples", dict, {}, where).items():
+        if response_key not in responses or response_key == DEFAULT_RESPONSE_KEY:
+            raise ContentError(f"{where}: chatbot examples for unknown response '{response_key}'")
+        if not isinstance(questions, list):
+            raise ContentError(f"{where}: chatbot examples for '{response_key}' should be a list")
+        examples[response_key] = _string_tuple(questions, "chatbot_examples", where)
+
+    return SiteContent(
+        key=_require(data, "key", str, where),
+        name=_require(data, "name", str, where),
+        map_center=_coordinates(_require(data, "map_center", list, where), "map_center", where),
+        map_zoom=_optional(data, "map_zoom", int, 17, where),
+        locations=MappingProxyType(locations),
+        tours=MappingProxyType(tours),
+        chatbot_responses=MappingProxyType(dict(responses)),
+        chatbot_keywords=MappingProxyType(keywords),
+        chatbot_examples=MappingProxyType(examples),
+        language=_optional(data, "language", str, DEFAULT_LANGUAGE, where),
+        icon=_optional(data, "icon", str, "", where),
+        heritage_status=_optional(data, "heritage_status", str, "", where),
+        address=_optional(data, "address", str, "", where),
+        opening_hours=_optional(data, "opening_hours", str, "", where),
+    )
+
+
+def _read_text(path, digest=None):
+    """Read a content file, adding the bytes read to digest"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        raise ContentError(f"content file not found: {path}") from None
+    if digest is not None:
+        digest.update(raw)
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as error:
+        raise ContentError(f"{path}: not UTF-8: {error}") from None
+
+
+def _read_json(path, digest=None):
+    """Decode a JSON content file, reporting problems as ContentError"""
+    text = _read_text(path, digest)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as error:
+        raise ContentError(f"{path}: invalid JSON: {error}") from None
+
+
+def site_path(site_key, data_dir=DATA_DIR):
+    """Return the content file path for a site key"""
+    return os.path.join(data_dir, "sites", f"{site_key}.json")
+
+
+def translation_path(site_key, language, data_dir=DATA_DIR):
+    """Return the translation overlay path for a site and language"""
+    return os.path.join(data_dir, "translations", site_key, f"{language}.json")
+
+
+def content_files(site_key, language=DEFAULT_LANGUAGE, data_dir=DATA_DIR):
+    """Return the files a site bundle is built from: its content, translation and footpaths"""
+    files = [site_path(site_key, data_dir)]
+    if language != DEFAULT_LANGUAGE:
+        files.append(translation_path(site_key, language, data_dir))
+    # Footpaths (tour_guide/paths.py) shape the walking estimates shown with the content
+    footpaths = footpaths_path(site_key, data_dir)
+    if os.path.exists(footpaths):
+        files.append(footpaths)
+    return files
+
+
+def footpaths_path(site_key, data_dir=DATA_DIR):
+    """Return the footpath GeoJSON path for a site"""
+    return os.path.join(data_dir, "paths", f"{site_key}.geojson")
+
+
+def content_version(site_key, language=DEFAULT_LANGUAGE, data_dir=DATA_DIR):
+    """Return the version a bundle loaded from the files as they are now would have"""
+    digest = hashlib.sha256()
+    for path in content_files(site_key, language, data_dir):
+        try:
+            with open(path, "rb") as content_file:
+                digest.update(content_file.read())
+        except FileNotFoundError:
+            raise ContentError(f"content file not found: {path}") from None
+    return digest.hexdigest()[:16]
+
+
+def site_languages(site_key, data_dir=DATA_DIR):
+    """Return the language codes a site can be shown in, the default first"""
+    directory = os.path.dirname(translation_path(site_key, DEFAULT_LANGUAGE, data_dir))
+    translated = []
+    if os.path.isdir(directory):
+        translated = sorted(
+            name[:-len(".json")] for name in os.listdir(directory)
+            if name.endswith(".json") and name != f"{DEFAULT_LANGUAGE}.json"
+        )
+    return (DEFAULT_LANGUAGE, *translated)
+
+
+def _overlay_fields(target, overlay, fields, where):
+    """Replace target's translatable fields with the overlay's, rejecting anything else"""
+    unknown = set(overlay) - set(fields)
+    if unknown:
+        raise ContentError(f"{where}: fields {sorted(unknown)} cannot be translated")
+    target.update(overlay)
+
+
+def apply_translation(data, overlay, where="translation"):
+    """Merge a translation overlay into decoded site JSON, returning a new dict"""
+    if not isinstance(overlay, dict):
+        raise ContentError(f"{where}: translation should be a JSON object")
+    merged = dict(data)
+    language = _require(overlay, "language", str, where)
+    sections = {"language", "locations", "tours", "chatbot_responses", "chatbot_keywords", "chatbot_examples"}
+    _overlay_fields(merged, {key: value for key, value in overlay.items() if key not in sections},
+                    TRANSLATABLE_SITE_FIELDS, where)
+    merged["language"] = language
+
+    for section, fields in (("locations", TRANSLATABLE_LOCATION_FIELDS), ("tours", TRANSLATABLE_TOUR_FIELDS)):
+        entries = dict(_require(data, section, dict, where))
+        for key, changes in _optional(overlay, section, dict, {}, where).items():
+            if key not in entries:
+                raise ContentError(f"{where}: translation for unknown {section[:-1]} '{key}'")
+            if not isinstance(changes, dict):
+                raise ContentError(f"{where}: translation for {section[:-1]} '{key}' should be an object")
+            entries[key] = dict(entries[key])
+            _overlay_fields(entries[key], changes, fields, f"{where}: {section[:-1]} '{key}'")
+        merged[section] = entries
+
+    responses = dict(_require(data, "chatbot_responses", dict, where))
+    translated = _optional(overlay, "chatbot_responses", dict, {}, where)
+    unknown = set(translated) - set(responses)
+    if unknown:
+        raise ContentError(f"{where}: translations for unknown chatbot responses {sorted(unknown)}")
+    # A response the overlay leaves out is answered in the site's own language
+    responses.update(translated)
+    merged["chatbot_responses"] = responses
+
+    # Keywords and examples in the bundle's language are added to the originals
+    for section, label in (("chatbot_keywords", "chatbot keywords"), ("chatbot_examples", "chatbot examples")):
+        phrases_by_key = {key: list(phrases) for key, phrases in _optional(data, section, dict, {}, where).items()}
+        for key, phrases in _optional(overlay, section, dict, {}, where).items():
+            if not isinstance(phrases, list):
+                raise ContentError(f"{where}: {label} for '{key}' should be a list")
+            phrases_by_key.setdefault(key, []).extend(phrases)
+        merged[section] = phrases_by_key
+    return merged
+
+
+def load_site_index(data_dir=DATA_DIR):
+    """Read the site manifest, returning a read-only {site key: site name} mapping"""
+    path = os.path.join(data_dir, SITE_INDEX_FILE)
+    data = _read_json(path)
+    sites = _require(data, "sites", list, path)
+    index = {}
+    for entry in sites:
+        if not isinstance(entry, dict):
+            raise ContentError(f"{path}: every site entry should be an object")
+        index[_require(entry, "key", str, path)] = _require(entry, "name", str, path)
+    if not index:
+        raise ContentError(f"{path}: no sites listed")
+    return MappingProxyType(index)
+
+
+def load_site(site_key=DEFAULT_SITE_KEY, data_dir=DATA_DIR, language=DEFAULT_LANGUAGE):
+    """Load and validate one site's content file, in the given language"""
+    # The version digests exactly the bytes parsed here, in content_files order,
+    # so an edit landing mid-load cannot give the bundle another file's version
+    digest = hashlib.sha256()
+    path = site_path(site_key, data_dir)
+    data = _read_json(path, digest)
+    if language != DEFAULT_LANGUAGE:
+        overlay_path = translation_path(site_key, language, data_dir)
+        data = apply_translation(data, _read_json(overlay_path, digest), where=overlay_path)
+        if data["language"] != language:
+            raise ContentError(f"{overlay_path}: file declares language '{data['language']}', expected '{language}'")
+        path = overlay_path
+    footpaths = None
+    if os.path.exists(footpaths_path(site_key, data_dir)):
+        footpaths = _read_text(footpaths_path(site_key, data_dir), digest)
+    site = parse_site(data, where=path)
+    if site.key != site_key:
+        raise ContentError(f"{path}: file declares key '{site.key}', expected '{site_key}'")
+    return dataclasses.replace(site, version=digest.hexdigest()[:16], data_dir=data_dir, footpaths=footpaths)
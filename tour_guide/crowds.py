@@ -0,0 +1,136 @@
+"""
+Crowd-aware scheduling
+Every script run reports where its visitor is (site, stop) to a process-wide
+OccupancyTracker, which counts each active session at the stop it reported
+last. Sessions silent for longer than the window (closed tabs, finished
+visits) drop out.
+
+The window is a ring of time buckets of at most 30 seconds. A report moves
+its session from the bucket of its previous report to the current one, and a
+bucket that falls out of the window is subtracted from the totals in one
+step, so each report costs O(1) however many sessions are active. Reading
+the occupancy of a site costs O(stops).
+
+The tracker only sees the sessions of its own process. Under
+tour_guide.cluster each of N workers counts the visitors it serves, about
+1/N of the crowd, so stops look quieter than they are and reordering starts
+later; the shared store is read-only and cannot hold live counts.
+
+When a visitor moves on, the remaining stops of their tour are reordered to
+put busy stops later (RoutePlanner.avoid_crowds), trading a little extra
+walking against the expected wait.
+
+TOUR_GUIDE_CROWD_WINDOW (seconds) turns tracking on.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+
+CROWD_WINDOW_ENV = "TOUR_GUIDE_CROWD_WINDOW"
+DEFAULT_BUCKET_SECONDS = 30
+# Visitors a stop takes without anyone waiting, and the wait each extra one adds
+FREE_VISITORS_PER_STOP = 5
+WAIT_SECONDS_PER_VISITOR = 20
+
+
+class _Bucket:
+    """Sessions whose last report fell in one bucket interval, and their stops"""
+    __slots__ = ("number", "counts", "sessions")
+
+    def __init__(self, number):
+        self.number = number
+        self.counts = {}
+        self.sessions = set()
+
+
+class OccupancyTracker:
+    """Live visitor counts per (site, stop) over a sliding window"""
+
+    def __init__(self, window_seconds, bucket_seconds=DEFAULT_BUCKET_SECONDS, clock=time.monotonic):
+        if window_seconds <= 0 or bucket_seconds <= 0:
+            raise ValueError("window and bucket sizes must be positive")
+        # Buckets are shrunk to fit the window exactly (a 10 s window is one
+        # 10 s bucket, a 45 s window two of 22.5 s), so sessions expire on time
+        self._bucket_count = math.ceil(window_seconds / bucket_seconds)
+        self._bucket_seconds = window_seconds / self._bucket_count
+        self._clock = clock
+        self._buckets = deque()
+        # session -> (place, bucket holding it); place is (site key, stop key)
+        self._sessions = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of active sessions"""
+        return len(self._sessions)
+
+    def _advance(self, now):
+        """Expire buckets that left the window and return the current bucket"""
+        number = int(now // self._bucket_seconds)
+        buckets = self._buckets
+        while buckets and buckets[0].number <= number - self._bucket_count:
+            expired = buckets.popleft()
+            for place, count in expired.counts.items():
+                remaining = self._totals[place] - count
+                if remaining:
+                    self._totals[place] = remaining
+                else:
+                    del self._totals[place]
+            for session in expired.sessions:
+                del self._sessions[session]
+        if not buckets or buckets[-1].number != number:
+            buckets.append(_Bucket(number))
+        return buckets[-1]
+
+    def _remove(self, session):
+        entry = self._sessions.pop(session, None)
+        if entry is None:
+            return
+        place, bucket = entry
+        bucket.sessions.discard(session)
+        for counts in (bucket.counts, self._totals):
+            remaining = counts[place] - 1
+            if remaining:
+                counts[place] = remaining
+            else:
+                del counts[place]
+
+    def record(self, session, site_key, location_key):
+        """Count session at a stop from now on, replacing its previous report"""
+        place = (site_key, location_key)
+        with self._lock:
+            bucket = self._advance(self._clock())
+            self._remove(session)
+            self._sessions[session] = (place, bucket)
+            bucket.sessions.add(session)
+            bucket.counts[place] = bucket.counts.get(place, 0) + 1
+            self._totals[place] = self._totals.get(place, 0) + 1
+
+    def leave(self, session):
+        """Stop counting session"""
+        with self._lock:
+            self._remove(session)
+
+    def occupancy(self, site_key):
+        """Return {stop key: active visitors} for a site's occupied stops"""
+        with self._lock:
+            self._advance(self._clock())
+            return {location_key: count for (site, location_key), count in self._totals.items() if site == site_key}
+
+
+def expected_wait_seconds(occupancy):
+    """Expected wait at each stop, in seconds, from its visitor count"""
+    return {
+        location_key: (count - FREE_VISITORS_PER_STOP) * WAIT_SECONDS_PER_VISITOR
+        for location_key, count in occupancy.items()
+        if count > FREE_VISITORS_PER_STOP
+    }
+
+
+def occupancy_tracker_from_env():
+    """Create an OccupancyTracker over TOUR_GUIDE_CROWD_WINDOW seconds, or return None if it is off"""
+    window = os.environ.get(CROWD_WINDOW_ENV)
+    return OccupancyTracker(float(window)) if window else None
@@ -0,0 +1,287 @@
+"""
+Static tour export
+Renders every stop of every tour, in every language, to plain files that a
+CDN or kiosk can serve without a Python process. Each stop is a small HTML
+page at a stable path (<site>/<language>/<tour>/<stop number>.html) that
+links its folium map, the stop's photos, the shared stylesheet and a JSON
+copy of the page (for kiosk front ends) as content-hashed assets under
+assets/, which can be cached forever. Photos are copied from the image
+cache built by tools/build_images.py, so run that first.
+
+manifest.json records a digest of each page's inputs (the stops, texts,
+photos, footpaths and tiles it shows). A later export re-renders only the
+pages whose inputs changed, on a process pool.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from html import escape
+
+import folium
+
+from tour_guide.content import DATA_DIR, load_site, load_site_index, site_languages
+from tour_guide.images import CACHE_DIR, CACHE_URL, site_image_sets
+from tour_guide.paths import paths_path, site_paths_dir
+from tour_guide.rendering import PAGE_CSS, build_map, render_location_panel
+
+# Bump when the page templates change so every page is rendered again
+EXPORT_VERSION = 3
+MANIFEST_FILE = "manifest.json"
+ASSET_DIR = "assets"
+# Pages sit at <site>/<language>/<tour>/, three folders below the export root
+PAGE_DEPTH = "../../../"
+PHOTO_TOUR_KEY = "photography"
+MAP_HEIGHT = 500
+
+_DEFAULT_TILES = ("OpenStreetMap", None)
+
+# Sites loaded by this worker process, by (site key, language, data dir)
+_worker_sites = {}
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _json_bytes(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def page_path(site_key, language, tour_key, position):
+    """Stable path of a stop's page within the export, counting stops from 1"""
+    return f"{site_key}/{language}/{tour_key}/{position + 1}.html"
+
+
+def write_asset(out_dir, data, extension):
+    """Store bytes under their content hash unless already there; returns the relative path"""
+    relative = f"{ASSET_DIR}/{_digest(data)[:20]}.{extension}"
+    path = os.path.join(out_dir, relative)
+    if not os.path.exists(path):
+        _write_file(path, data)
+    return relative
+
+
+def write_photo_assets(out_dir, image_set):
+    """Copy a photo's derivatives into the export as assets; returns {app URL: relative path}"""
+    assets = {}
+    for entries in image_set.derivatives.values():
+        for _, url in entries:
+            path = os.path.join(CACHE_DIR, url[len(CACHE_URL) + 1:])
+            with open(path, "rb") as photo_file:
+                assets[url] = write_asset(out_dir, photo_file.read(), os.path.splitext(path)[1][1:])
+    return assets
+
+
+def _write_file(path, data):
+    """Write bytes so a server never sees a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as output:
+        output.write(data)
+    os.replace(temporary, path)
+
+
+def tour_inputs(site, tour, tile_layer):
+    """Digest of everything the pages of a tour are rendered from"""
+    path = paths_path(site.key, site_paths_dir(site))
+    footpaths = None
+    if os.path.exists(path):
+        with open(path, "rb") as paths_file:
+            footpaths = _digest(paths_file.read())
+    image_sets = site_image_sets(site)
+    return _digest(_json_bytes({
+        "version": EXPORT_VERSION,
+        "css": PAGE_CSS,
+        "tiles": list(tile_layer),
+        "site": [site.key, site.language, site.name, site.icon, site.heritage_status, site.address,
+                 site.opening_hours, list(site.map_center), site.map_zoom],
+        "tour": [tour.key, tour.name, list(tour.locations)],
+        "stops": [asdict(site.locations[key]) for key in tour.locations],
+        "photos": [image_sets.get(key) for key in tour.locations],
+        "footpaths": footpaths,
+    }))
+
+
+def _page_html(site, tour, position, css_path, map_path, panel):
+    """The page shell for a stop: header, progress, map frame, details and navigation"""
+    count = len(tour.locations)
+    links = []
+    if position > 0:
+        links.append(f'<a href="{position}.html">⬅️ Previous</a>')
+    links.append(f'<a href="{PAGE_DEPTH}index.html">All tours</a>')
+    if position + 1 < count:
+        links.append(f'<a href="{position + 2}.html">Next ➡️</a>')
+    title = escape(f"{site.name} Virtual Tourist Guide")
+    return f"""<!doctype html>
+<html lang="{escape(site.language)}">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{escape(site.locations[tour.locations[position]].name)} | {title}</title>
+<link rel="stylesheet" href="{PAGE_DEPTH}{css_path}">
+<style>
+body {{ font-family: sans-serif; margin: 0 auto; max-width: 1200px; padding: 0 1rem; }}
+.columns {{ display: flex; flex-wrap: wrap; gap: 1.5rem; }}
+.columns > .map {{ flex: 3 1 420px; }}
+.columns > .details {{ flex: 2 1 320px; }}
+.map iframe {{ border: 0; width: 100%; height: {MAP_HEIGHT}px; }}
+nav {{ display: flex; justify-content: space-between; margin: 1.5rem 0; }}
+</style>
+</head>
+<body>
+<h1 class="main-header">{escape(site.icon)} {title}</h1>
+<div class="progress-indicator">Stop {position + 1} of {count} | {escape(tour.name)}</div>
+<div class="columns">
+<div class="map"><iframe src="{PAGE_DEPTH}{map_path}" title="Tour map" loading="lazy"></iframe></div>
+<div class="details">
+{panel}
+</div>
+</div>
+<nav>{" ".join(links)}</nav>
+<footer style="text-align: center; color: #666; padding: 1rem;">
+<p>{title} | {escape(site.heritage_status)}</p>
+<p style="font-size: 0.8rem;">⏰ Open: {escape(site.opening_hours)} | 📍 {escape(site.address)}</p>
+</footer>
+</body>
+</html>
+"""
+
+
+def render_page(site, tour, position, out_dir, tile_layer=_DEFAULT_TILES):
+    """Render one stop's page and its assets into out_dir; returns its manifest entry"""
+    location_key = tour.locations[position]
+    next_location_key = tour.locations[position + 1] if position + 1 < len(tour.locations) else None
+    panel = render_location_panel(site, location_key, next_location_key, tour.key == PHOTO_TOUR_KEY)
+    # The panel links photos at the app's static URL; point it at copies in the export
+    image_set = site_image_sets(site).get(location_key)
+    photos = write_photo_assets(out_dir, image_set) if image_set is not None else {}
+    page_panel = panel
+    for url, relative in photos.items():
+        panel = panel.replace(url, relative)
+        page_panel = page_panel.replace(url, PAGE_DEPTH + relative)
+
+    tiles, attribution = tile_layer
+    figure = folium.Figure().add_child(build_map(site, location_key, tour.locations, tiles, attribution))
+    map_path = write_asset(out_dir, figure.render().encode("utf-8"), "html")
+    css_path = write_asset(out_dir, PAGE_CSS.encode("utf-8"), "css")
+    data_path = write_asset(out_dir, _json_bytes({
+        "site": site.key,
+        "language": site.language,
+        "tour": tour.key,
+        "stop": location_key,
+        "position": position,
+        "count": len(tour.locations),
+        "title": site.locations[location_key].name,
+        "panel": panel,
+        "map": map_path,
+    }), "json")
+
+    path = page_path(site.key, site.language, tour.key, position)
+    _write_file(os.path.join(out_dir, path),
+                _page_html(site, tour, position, css_path, map_path, page_panel).encode("utf-8"))
+    return {"map": map_path, "css": css_path, "json": data_path, "photos": sorted(set(photos.values()))}
+
+
+def _render_task(task):
+    """Process pool entry point: render one page, loading its site once per worker"""
+    site_key, language, tour_key, position, out_dir, data_dir, tile_layer, inputs = task
+    site = _worker_sites.get((site_key, language, data_dir))
+    if site is None:
+        site = _worker_sites[site_key, language, data_dir] = load_site(site_key, data_dir, language)
+    entry = render_page(site, site.tours[tour_key], position, out_dir, tile_layer)
+    entry["inputs"] = inputs
+    return page_path(site_key, language, tour_key, position), entry
+
+
+def _index_html(tours):
+    """Landing page linking the first stop of every exported tour"""
+    items = []
+    for prefix, (site_name, language, tour_name) in sorted(tours.items()):
+        items.append(f'<li><a href="{prefix}/1.html">{escape(site_name)} ({escape(language)}): {escape(tour_name)}</a></li>')
+    return (
+        '<!doctype html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>Virtual Tourist Guide</title>\n</head>\n'
+        "<body>\n<h1>Virtual Tourist Guide</h1>\n<ul>\n" + "\n".join(items) + "\n</ul>\n</body>\n</html>\n"
+    )
+
+
+def export_tours(out_dir, site_keys=None, languages=None, data_dir=DATA_DIR, tile_layer=None,
+                 workers=None, force=False, progress=None):
+    """Export tours to out_dir, rendering only pages whose inputs changed
+
+    site_keys and languages default to every site and every language it has;
+    pages of other sites and languages already in out_dir are kept. tile_layer
+    is (URL template, attribution), or None for OpenStreetMap.
+    Returns (pages rendered, pages unchanged).
+    """
+    tile_layer = tuple(tile_layer or _DEFAULT_TILES)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    previous = manifest.get("pages", {})
+    # tour path prefix ("<site>/<language>/<tour>") -> (site name, language, tour name)
+    tours = {prefix: tuple(names) for prefix, names in manifest.get("tours", {}).items()}
+
+    pages = {}
+    tasks = []
+    unchanged = 0
+    for site_key in site_keys or load_site_index(data_dir):
+        available = site_languages(site_key, data_dir)
+        for language in languages or available:
+            if language not in available:
+                continue
+            # This site and language are exported afresh, so forget tours it no longer has
+            scope = f"{site_key}/{language}/"
+            tours = {prefix: names for prefix, names in tours.items() if not prefix.startswith(scope)}
+            previous_in_scope = {path: entry for path, entry in previous.items() if path.startswith(scope)}
+            previous = {path: entry for path, entry in previous.items() if not path.startswith(scope)}
+
+            site = load_site(site_key, data_dir, language)
+            for tour in site.tours.values():
+                tours[f"{site_key}/{language}/{tour.key}"] = (site.name, language, tour.name)
+                inputs = tour_inputs(site, tour, tile_layer)
+                for position in range(len(tour.locations)):
+                    path = page_path(site_key, language, tour.key, position)
+                    entry = previous_in_scope.get(path)
+                    if (not force and entry is not None and entry.get("inputs") == inputs and all(
+                            os.path.exists(os.path.join(out_dir, file))
+                            for file in (path, entry["map"], entry["json"], *entry.get("photos", ())))):
+                        pages[path] = entry
+                        unchanged += 1
+                        continue
+                    tasks.append((site_key, language, tour.key, position, out_dir, data_dir, tile_layer, inputs))
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for path, entry in executor.map(_render_task, tasks):
+                pages[path] = entry
+                if progress is not None:
+                    progress(path)
+    # Pages of sites and languages outside this export stay as they were
+    pages.update(previous)
+
+    _write_file(os.path.join(out_dir, "index.html"), _index_html(tours).encode("utf-8"))
+    # Written last, so an interrupted export is redone rather than trusted
+    _write_file(manifest_path, json.dumps({
+        "version": EXPORT_VERSION,
+        "tours": dict(sorted(tours.items())),
+        "pages": dict(sorted(pages.items())),
+    }, ensure_ascii=False, indent=1).encode("utf-8"))
+    prune_assets(out_dir, pages)
+    return len(tasks), unchanged
+
+
+def prune_assets(out_dir, pages):
+    """Delete assets no page refers to any more (replaced maps and photos, older stylesheets)"""
+    referenced = {
+        os.path.basename(path) for entry in pages.values()
+        for path in (entry["map"], entry["css"], entry["json"], *entry.get("photos", ()))
+    }
+    asset_dir = os.path.join(out_dir, ASSET_DIR)
+    for name in os.listdir(asset_dir) if os.path.isdir(asset_dir) else ():
+        if name not in referenced:
+            os.remove(os.path.join(asset_dir, name))
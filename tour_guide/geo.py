@@ -0,0 +1,157 @@
+"""
+Geographic helpers for tour stops
+Vectorized haversine distances and a uniform grid index over stop
+coordinates, for nearest-stop, radius and bulk distance queries. The grid
+keeps lookups local when a site has hundreds of points of interest.
+"""
+
+import math
+from collections import defaultdict
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Straight-line distance under-estimates paths around buildings and gardens;
+# used until real footpath data is available
+WALKING_DETOUR_FACTOR = 1.3
+WALKING_SPEED_M_PER_S = 1.2
+
+# Grid cell edge; small enough that a radius query touches a handful of cells.
+# Queries that would scan more rings than MAX_SEARCH_RINGS check every stop.
+DEFAULT_CELL_SIZE_M = 100.0
+MAX_SEARCH_RINGS = 8
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres; arguments broadcast like numpy arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=float)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def walking_estimate(distance_m):
+    """Return (walking distance in metres, walking time in seconds) for a straight-line distance"""
+    walking_m = distance_m * WALKING_DETOUR_FACTOR
+    return walking_m, walking_m / WALKING_SPEED_M_PER_S
+
+
+def format_distance(distance_m):
+    """Format a distance for display, e.g. '150 meters' or '1.2 km'"""
+    if distance_m >= 1000:
+        return f"{distance_m / 1000:.1f} km"
+    return f"{max(10, int(round(distance_m, -1)))} meters"
+
+
+def format_duration(seconds):
+    """Format a walking time for display, rounded up to whole minutes"""
+    minutes = max(1, math.ceil(seconds / 60))
+    return f"{minutes} minute" if minutes == 1 else f"{minutes} minutes"
+
+
+class StopIndex:
+    """Spatial index over the coordinates of a site's stops"""
+
+    def __init__(self, locations, cell_size_m=DEFAULT_CELL_SIZE_M):
+        self.keys = list(locations)
+        self._positions = {key: position for position, key in enumerate(self.keys)}
+        coordinates = np.array([locations[key].coordinates for key in self.keys], dtype=float).reshape(-1, 2)
+        self.latitudes = coordinates[:, 0]
+        self.longitudes = coordinates[:, 1]
+
+        # Cells are square in metres at the site's mean latitude
+        self.cell_size_m = cell_size_m
+        mean_latitude = float(self.latitudes.mean()) if self.keys else 0.0
+        self._cell_lat = cell_size_m / (math.pi * EARTH_RADIUS_M / 180)
+        self._cell_lon = self._cell_lat / max(math.cos(math.radians(mean_latitude)), 1e-6)
+        cells = [self._cell(latitude, longitude) for latitude, longitude in coordinates]
+        self._rows = np.array([row for row, _ in cells], dtype=int)
+        self._columns = np.array([column for _, column in cells], dtype=int)
+        self._cells = defaultdict(list)
+        for position, cell in enumerate(cells):
+            self._cells[cell].append(position)
+        self._cells = {cell: np.array(members) for cell, members in self._cells.items()}
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _cell(self, latitude, longitude):
+        """Return the grid cell containing a point"""
+        return (math.floor(latitude / self._cell_lat), math.floor(longitude / self._cell_lon))
+
+    def _candidates(self, latitude, longitude, rings):
+        """Positions of stops in the cells within rings cells of a point"""
+        row, column = self._cell(latitude, longitude)
+        found = [
+            self._cells[(row + d_row, column + d_column)]
+            for d_row in range(-rings, rings + 1)
+            for d_column in range(-rings, rings + 1)
+            if (row + d_row, column + d_column) in self._cells
+        ]
+        return np.concatenate(found) if found else np.empty(0, dtype=int)
+
+    def distance(self, from_key, to_key):
+        """Straight-line distance in metres between two stops"""
+        a, b = self._positions[from_key], self._positions[to_key]
+        return float(haversine_m(self.latitudes[a], self.longitudes[a], self.latitudes[b], self.longitudes[b]))
+
+    def _rings_to_cover(self, latitude, longitude):
+        """Number of rings around a point's cell that contain every stop"""
+        row, column = self._cell(latitude, longitude)
+        return int(max(np.abs(self._rows - row).max(), np.abs(self._columns - column).max()))
+
+    def nearest(self, latitude, longitude):
+        """Return (stop key, distance in metres) of the stop closest to a point"""
+        if not self.keys:
+            return None
+        # Any stop outside the square searched so far is at least
+        # rings * cell_size_m away, so widening stops once the best is closer
+        max_rings = self._rings_to_cover(latitude, longitude)
+        if max_rings <= MAX_SEARCH_RINGS:
+            for rings in range(max_rings + 1):
+                candidates = self._candidates(latitude, longitude, rings)
+                if not len(candidates):
+                    continue
+                distances = haversine_m(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+                best = int(np.argmin(distances))
+                if distances[best] <= rings * self.cell_size_m or rings == max_rings:
+                    return self.keys[candidates[best]], float(distances[best])
+        # Far from every stop: one vectorized pass is cheaper than walking rings
+        distances = haversine_m(latitude, longitude, self.latitudes, self.longitudes)
+        best = int(np.argmin(distances))
+        return self.keys[best], float(distances[best])
+
+    def within(self, latitude, longitude, radius_m):
+        """Return [(stop key, distance in metres)] for stops within radius_m, nearest first"""
+        if not self.keys:
+            return []
+        rings = int(math.ceil(radius_m / self.cell_size_m))
+        if rings > MAX_SEARCH_RINGS:
+            candidates = np.arange(len(self.keys))
+        else:
+            candidates = self._candidates(latitude, longitude, rings)
+        if not len(candidates):
+            return []
+        distances = haversine_m(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        inside = np.nonzero(distances <= radius_m)[0]
+        order = inside[np.argsort(distances[inside], kind="stable")]
+        return [(self.keys[candidates[i]], float(distances[i])) for i in order]
+
+    def distance_matrix(self, keys=None):
+        """Pairwise straight-line distances in metres, as an array ordered like keys"""
+        if keys is None:
+            if self._matrix is None:
+                self._matrix = haversine_m(
+                    self.latitudes[:, None], self.longitudes[:, None],
+                    self.latitudes[None, :], self.longitudes[None, :],
+                )
+                self._matrix.setflags(write=False)
+            return self._matrix
+        positions = np.array([self._positions[key] for key in keys], dtype=int)
+        return self.distance_matrix()[np.ix_(positions, positions)]
+
+
+def site_stop_index(site):
+    """Return the StopIndex for a site, built once and kept with the site"""
+    return site.derived("stop_index", lambda site: StopIndex(site.locations))
@@ -0,0 +1,74 @@
+"""
+Per-session chat history
+A fixed-size ring buffer of chat turns. Bot turns that came from the site's
+canned responses are stored by response ID and turned back into text only
+when displayed, so a session holds a few short strings per turn instead of
+copies of long answers. Turns pushed out of the buffer are dropped.
+
+Search answers are stored as text: their IDs are positions in one content
+version's passages, which a reload renumbers. Every turn records the
+version of the bundle it was added with.
+"""
+
+from collections import deque, namedtuple
+
+from tour_guide.chatbot import SEARCH_RESPONSE_PREFIX, response_text
+
+DEFAULT_HISTORY_SIZE = 20
+
+# Exactly one of text and response_id is set; turns saved before versions
+# were recorded restore with version None
+Turn = namedtuple("Turn", ["role", "site_key", "response_id", "text", "version"], defaults=(None,))
+
+
+class ChatHistory:
+    """Bounded chat history for one session"""
+
+    def __init__(self, capacity=DEFAULT_HISTORY_SIZE):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._turns = deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self._turns)
+
+    @property
+    def capacity(self):
+        return self._turns.maxlen
+
+    def add_user(self, site, text):
+        """Record a question from the visitor"""
+        self._turns.append(Turn("user", site.key, None, text, site.version))
+
+    def add_bot(self, site, response_id=None, text=None):
+        """Record an answer, by response ID when it has one, else by its text"""
+        if (response_id is None) == (text is None):
+            raise ValueError("give exactly one of response_id and text")
+        if response_id is not None and response_id.startswith(SEARCH_RESPONSE_PREFIX):
+            response_id, text = None, response_text(site, response_id)
+        self._turns.append(Turn("bot", site.key, response_id, text, site.version))
+
+    def recent(self, limit):
+        """Return the last limit turns, oldest first"""
+        start = max(0, len(self._turns) - limit)
+        return [self._turns[position] for position in range(start, len(self._turns))]
+
+    def turns(self):
+        """Return every buffered turn, oldest first"""
+        return list(self._turns)
+
+    def restore(self, turns):
+        """Append previously saved turns, e.g. when a session resumes"""
+        for turn in turns:
+            self._turns.append(Turn(*turn))
+
+    def messages(self, site, limit):
+        """Return the last limit turns as {'role', 'content'} dicts for display"""
+        return [
+            {"role": turn.role, "content": turn.text if turn.text is not None else response_text(site, turn.response_id, turn.version)}
+            for turn in self.recent(limit)
+        ]
+
+    def clear(self):
+        """Forget every turn"""
+        self._turns.clear()
@@ -0,0 +1,198 @@
+"""
+Location photos
+Source photos live in images/<site>/<location key>.<ext> under the data
+directory the site was loaded from (tour_guide/data by default).
+The batch build (tools/build_images.py) turns each one into resized WebP
+and JPEG derivatives plus a tiny blurred placeholder, stored in a
+content-addressed cache under static/images, which Streamlit serves at
+app/static/images (server.enableStaticServing). Stops are rendered as a
+lazily loaded <picture> with srcset, so browsers fetch the size that fits
+the viewport; stops without a built photo keep the text placeholder.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+
+from PIL import Image, ImageFilter, ImageOps
+
+from tour_guide.content import DATA_DIR
+
+IMAGE_DIR = os.path.join(DATA_DIR, "images")
+# Streamlit serves the static/ folder next to app.py
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(DATA_DIR)), "static", "images")
+CACHE_URL = "app/static/images"
+
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+DERIVATIVE_WIDTHS = (320, 640, 960, 1280)
+# (format, Pillow encoder, MIME type, quality), best compression first
+DERIVATIVE_FORMATS = (
+    ("webp", "WEBP", "image/webp", 80),
+    ("jpg", "JPEG", "image/jpeg", 82),
+)
+PLACEHOLDER_WIDTH = 24
+PLACEHOLDER_QUALITY = 40
+# Bump when derivative settings change so old cache entries are not reused
+PIPELINE_VERSION = 1
+
+# Layout width of the details column: full width on phones, 2/5 of the page otherwise
+PANEL_SIZES = "(max-width: 640px) 100vw, 40vw"
+
+# derivatives maps format to ((width, URL path), ...) in increasing width
+ImageSet = namedtuple("ImageSet", ["width", "height", "placeholder", "derivatives"])
+
+
+def site_image_dir(site):
+    """Return the source photo directory of the data directory a site was loaded from"""
+    return os.path.join(site.data_dir, "images")
+
+
+def source_images(site_key, image_dir=IMAGE_DIR):
+    """Return {location key: source photo path} for a site"""
+    directory = os.path.join(image_dir, site_key)
+    if not os.path.isdir(directory):
+        return {}
+    sources = {}
+    for name in sorted(os.listdir(directory)):
+        key, extension = os.path.splitext(name)
+        if extension.lower() in SOURCE_EXTENSIONS:
+            sources.setdefault(key, os.path.join(directory, name))
+    return sources
+
+
+def source_digest(path):
+    """Content address of a source photo under the current pipeline settings"""
+    digest = hashlib.sha256(f"v{PIPELINE_VERSION}:".encode())
+    with open(path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _manifest_path(digest, cache_dir):
+    return os.path.join(cache_dir, digest[:2], f"{digest}.json")
+
+
+def _write_atomic(path, data):
+    """Write bytes so concurrent builders never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as output:
+        output.write(data)
+    os.replace(temporary, path)
+
+
+def _encode(image, encoder, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, encoder, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def build_derivatives(source_path, cache_dir=CACHE_DIR):
+    """Build a photo's derivatives and placeholder if not cached; returns (digest, built)"""
+    digest = source_digest(source_path)
+    manifest_path = _manifest_path(digest, cache_dir)
+    if os.path.exists(manifest_path):
+        return digest, False
+
+    with Image.open(source_path) as opened:
+        # Respect camera rotation, and drop alpha so JPEG can encode it
+        image = ImageOps.exif_transpose(opened).convert("RGB")
+    width, height = image.size
+
+    # Never upscale; a photo narrower than every width gets one derivative at its own size
+    widths = [size for size in DERIVATIVE_WIDTHS if size <= width] or [width]
+    derivatives = {}
+    for target_width in widths:
+        resized = image if target_width == width else image.resize(
+            (target_width, max(1, round(height * target_width / width))), Image.LANCZOS
+        )
+        for extension, encoder, _, quality in DERIVATIVE_FORMATS:
+            name = f"{digest}-{target_width}.{extension}"
+            _write_atomic(os.path.join(cache_dir, digest[:2], name), _encode(resized, encoder, quality))
+            derivatives.setdefault(extension, []).append((target_width, f"{digest[:2]}/{name}"))
+
+    tiny = image.resize((PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))), Image.BILINEAR)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    placeholder = "data:image/jpeg;base64," + base64.b64encode(_encode(tiny, "JPEG", PLACEHOLDER_QUALITY)).decode()
+
+    manifest = {"width": width, "height": height, "placeholder": placeholder, "derivatives": derivatives}
+    # Written last: a manifest means every derivative is in place
+    _write_atomic(manifest_path, json.dumps(manifest).encode("utf-8"))
+    return digest, True
+
+
+def build_all(source_paths, cache_dir=CACHE_DIR, workers=None):
+    """Build derivatives for many photos on a process pool; returns {path: (digest, built)}"""
+    source_paths = list(source_paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(build_derivatives, source_paths, [cache_dir] * len(source_paths))
+        return dict(zip(source_paths, results))
+
+
+def load_image_set(source_path, cache_dir=CACHE_DIR, cache_url=CACHE_URL):
+    """Return the built ImageSet for a photo, or None if it has not been built"""
+    manifest_path = _manifest_path(source_digest(source_path), cache_dir)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    derivatives = {
+        extension: tuple((width, f"{cache_url}/{path}") for width, path in entries)
+        for extension, entries in manifest["derivatives"].items()
+    }
+    return ImageSet(manifest["width"], manifest["height"], manifest["placeholder"], derivatives)
+
+
+def site_image_sets(site):
+    """Return {location key: ImageSet} for the site's built photos"""
+    def build(site):
+        image_sets = {}
+        for key, path in source_images(site.key, site_image_dir(site)).items():
+            image_set = load_image_set(path)
+            if key in site.locations and image_set is not None:
+                image_sets[key] = image_set
+        return image_sets
+
+    return site.derived("image_sets", build)
+
+
+def picture_html(image_set, alt, sizes=PANEL_SIZES):
+    """Render a lazily loaded, responsive <picture> for an ImageSet"""
+    def srcset(entries):
+        return ", ".join(f"{url} {width}w" for width, url in entries)
+
+    sources = []
+    fallback = None
+    for extension, _, mime_type, _ in DERIVATIVE_FORMATS:
+        entries = image_set.derivatives.get(extension)
+        if not entries:
+            continue
+        if mime_type == "image/jpeg":
+            fallback = entries
+        else:
+            sources.append(f'<source type="{mime_type}" srcset="{srcset(entries)}" sizes="{sizes}">')
+    fallback = fallback or next(iter(image_set.derivatives.values()))
+    # Mid-size src for browsers without srcset; the placeholder shows until it loads
+    src = fallback[min(1, len(fallback) - 1)][1]
+    image = (
+        f'<img src="{src}" srcset="{srcset(fallback)}" sizes="{sizes}" '
+        f'width="{image_set.width}" height="{image_set.height}" alt="{escape(alt)}" '
+        f'loading="lazy" decoding="async" class="location-photo" '
+        f'style="background-image: url({image_set.placeholder});">'
+    )
+    return "<picture>" + "".join(sources) + image + "</picture>"
+
+
+def prefetch_link_html(image_set):
+    """Hint browsers to fetch a photo before it is shown, at the size the panel usually needs"""
+    for extension, _, _, _ in DERIVATIVE_FORMATS:
+        entries = image_set.derivatives.get(extension)
+        if entries:
+            return f'<link rel="prefetch" href="{entries[min(1, len(entries) - 1)][1]}" as="image">'
+    return ""
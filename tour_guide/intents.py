@@ -0,0 +1,166 @@
+"""
+Intent classifier for the chatbot
+A TF-IDF model over words, word pairs and character n-grams, trained per
+site bundle from each response key, its keywords and its example
+questions. Example vectors are the L2-normalised columns of one NumPy
+matrix (which a shared store can hand out without copying), so a question
+is classified with a single product: its n-grams select matrix rows and the
+most similar example names the response.
+Character n-grams let paraphrases and misspellings ("who made this?",
+"tikcet price") reach the right answer. Repeated questions are answered
+from an LRU cache.
+"""
+
+import math
+import threading
+from collections import Counter, OrderedDict, namedtuple
+
+import numpy as np
+
+from tour_guide.content import DEFAULT_RESPONSE_KEY
+from tour_guide.search import STOPWORDS, TOKEN_RE
+
+DEFAULT_CLASSIFY_CACHE_SIZE = 1024
+# Cosine similarity a question needs to be answered by an intent; tuned on
+# paraphrases of the Taj Mahal questions against unrelated location questions
+MIN_INTENT_SIMILARITY = 0.3
+CHAR_NGRAM_SIZES = (3, 4, 5)
+
+IntentMatch = namedtuple("IntentMatch", ["response_key", "score"])
+# response_keys[i] is the answer of example column i of matrix (features x examples)
+IntentModel = namedtuple("IntentModel", ["response_keys", "vocabulary", "idf", "matrix"])
+
+# Cached "no match" is None, so lookups need a different marker for absent
+_MISSING = object()
+
+
+def _words(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def features(words):
+    """Count a question's features: words, adjacent word pairs and character n-grams"""
+    counts = Counter(f"w:{word}" for word in words)
+    counts.update(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    # Question words matter ("who", "when") but only as whole words; their
+    # fragments would make every question look alike
+    for word in words:
+        if word in STOPWORDS:
+            continue
+        padded = f" {word} "
+        for size in CHAR_NGRAM_SIZES:
+            counts.update(f"c:{padded[start:start + size]}" for start in range(len(padded) - size + 1))
+    return counts
+
+
+def training_examples(site):
+    """Return (question, response key) pairs: every key, keyword and example question"""
+    examples = [(key, key) for key in site.chatbot_responses if key != DEFAULT_RESPONSE_KEY]
+    examples.extend(site.chatbot_keywords.items())
+    for response_key, questions in site.chatbot_examples.items():
+        examples.extend((question, response_key) for question in questions)
+    return examples
+
+
+def train_intent_model(examples):
+    """Build the IntentModel for (question, response key) pairs"""
+    examples = [(question, key) for question, key in examples if _words(question)]
+    example_counts = [features(_words(question)) for question, _ in examples]
+
+    document_frequency = Counter()
+    for counts in example_counts:
+        document_frequency.update(counts.keys())
+    vocabulary = {feature: row for row, feature in enumerate(sorted(document_frequency))}
+    total = len(example_counts)
+    idf = np.array([math.log((1 + total) / (1 + document_frequency[feature])) + 1 for feature in vocabulary],
+                   dtype=np.float32)
+
+    # One column per example; row t holds feature t's weight in every
+    # example, so a question only reads the rows of its own features
+    matrix = np.zeros((len(vocabulary), total), dtype=np.float32)
+    for column, counts in enumerate(example_counts):
+        rows = [vocabulary[feature] for feature in counts]
+        weights = np.array([1 + math.log(count) for count in counts.values()], dtype=np.float32) * idf[rows]
+        matrix[rows, column] = weights / np.linalg.norm(weights)
+    return IntentModel([key for _, key in examples], vocabulary, idf, matrix)
+
+
+def save_intent_model(writer, prefix, model):
+    """Add a model to a shared StoreWriter under prefix"""
+    writer.add_json(f"{prefix}/response_keys", list(model.response_keys))
+    writer.add_json(f"{prefix}/vocabulary", list(model.vocabulary))
+    writer.add_array(f"{prefix}/idf", model.idf)
+    writer.add_array(f"{prefix}/matrix", model.matrix)
+
+
+def load_intent_model(store, prefix):
+    """Return the model saved under prefix in a SharedStore, or None; the arrays are not copied"""
+    vocabulary = store.get_json(f"{prefix}/vocabulary")
+    if vocabulary is None:
+        return None
+    return IntentModel(
+        store.get_json(f"{prefix}/response_keys"),
+        {feature: row for row, feature in enumerate(vocabulary)},
+        store.get_array(f"{prefix}/idf"),
+        store.get_array(f"{prefix}/matrix"),
+    )
+
+
+class IntentClassifier:
+    """Nearest-example intent classifier over an IntentModel"""
+
+    def __init__(self, model, cache_size=DEFAULT_CLASSIFY_CACHE_SIZE):
+        self.response_keys = model.response_keys
+        self.vocabulary = model.vocabulary
+        self.idf = model.idf
+        self._matrix = model.matrix
+        # Features never seen in training still count towards a question's
+        # length, weighted as rare, so unrelated questions score low
+        self._unseen_idf = math.log(1 + len(self.response_keys)) + 1
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.response_keys)
+
+    def _best(self, words):
+        """Return the IntentMatch of the most similar example, or None"""
+        rows = []
+        weights = []
+        unseen = 0.0
+        for feature, count in features(words).items():
+            weight = 1 + math.log(count)
+            row = self.vocabulary.get(feature)
+            if row is None:
+                unseen += (weight * self._unseen_idf) ** 2
+            else:
+                rows.append(row)
+                weights.append(weight)
+        if not rows:
+            return None
+        weights = np.array(weights, dtype=np.float32) * self.idf[rows]
+        norm = math.sqrt(float(weights @ weights) + unseen)
+        scores = weights @ self._matrix[rows]
+        best = int(np.argmax(scores))
+        return IntentMatch(self.response_keys[best], float(scores[best]) / norm)
+
+    def classify(self, text, min_score=MIN_INTENT_SIMILARITY):
+        """Return the IntentMatch for a question, or None if no intent is similar enough"""
+        words = tuple(_words(text))
+        with self._lock:
+            match = self._cache.get(words, _MISSING)
+            if match is not _MISSING:
+                self._cache.move_to_end(words)
+
+        if match is _MISSING:
+            match = self._best(words)
+            with self._lock:
+                self._cache[words] = match
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+
+        if match is None or match.score < min_score:
+            return None
+        return match
@@ -0,0 +1,93 @@
+"""
+Live tour map
+A Leaflet component that stays mounted in the browser across reruns. A
+tour's layout (tiles, stops, popups and the footpath to each next stop) is
+published once as a content-addressed JSON file under static/maps, which
+Streamlit serves at app/static/maps; after that a rerun sends the
+component only the layout digest and the current stop index, and the
+browser restyles the markers in place instead of reloading a whole folium
+document. TOUR_GUIDE_MAP_MODE=live turns it on; the default "html" mode
+keeps the cached folium map.
+"""
+
+import hashlib
+import json
+import os
+
+import streamlit.components.v1 as components
+
+from tour_guide.content import DATA_DIR
+from tour_guide.paths import site_walking_paths
+from tour_guide.rendering import map_popup_html
+from tour_guide.tiles import OSM_TILE_URL, TILE_ATTRIBUTION
+
+MAP_MODE_ENV = "TOUR_GUIDE_MAP_MODE"
+HTML_MAP_MODE = "html"
+LIVE_MAP_MODE = "live"
+MAP_MODES = (HTML_MAP_MODE, LIVE_MAP_MODE)
+
+# Streamlit serves the static/ folder next to app.py
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(DATA_DIR)), "static", "maps")
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "tour_map")
+
+_component = components.declare_component("tour_map", path=FRONTEND_DIR)
+
+
+def map_mode_from_env():
+    """Return the map mode configured by TOUR_GUIDE_MAP_MODE"""
+    mode = os.environ.get(MAP_MODE_ENV, HTML_MAP_MODE)
+    if mode not in MAP_MODES:
+        raise ValueError(f"{MAP_MODE_ENV} must be one of {', '.join(MAP_MODES)}, not {mode!r}")
+    return mode
+
+
+def map_layout(site, tour_locations, tile_layer=None):
+    """Everything the live map draws for a tour, as JSON-ready data
+
+    tile_layer is (URL template, attribution), or None for OpenStreetMap.
+    legs[i] is the footpath from stop i to stop i + 1, or None without path data.
+    """
+    tiles, attribution = tile_layer or (OSM_TILE_URL, TILE_ATTRIBUTION)
+    walking_paths = site_walking_paths(site)
+    legs = []
+    for from_key, to_key in zip(tour_locations, tour_locations[1:]):
+        path = walking_paths.path(from_key, to_key) if walking_paths is not None else None
+        legs.append([list(point) for point in path] if path is not None and len(path) > 1 else None)
+    legs.append(None)
+    stops = []
+    for position, key in enumerate(tour_locations):
+        latitude, longitude = site.locations[key].coordinates
+        stops.append({
+            "name": site.locations[key].name,
+            "lat": latitude,
+            "lon": longitude,
+            "popup": map_popup_html(site, tour_locations, position),
+        })
+    return {
+        "center": list(site.map_center),
+        "zoom": site.map_zoom,
+        "tiles": tiles,
+        "attribution": attribution,
+        "stops": stops,
+        "legs": legs,
+    }
+
+
+def publish_layout(layout, cache_dir=CACHE_DIR):
+    """Write a layout to the static map cache if it is not there yet; returns its digest"""
+    data = json.dumps(layout, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(cache_dir, digest[:2], f"{digest}.json")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent sessions never serve a partial file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as layout_file:
+            layout_file.write(data)
+        os.replace(temporary, path)
+    return digest
+
+
+def live_map(layout_digest, current_index, height, key=None):
+    """Show the live map for a published layout with current_index as the current stop"""
+    return _component(layout=layout_digest, current=current_index, height=height, key=key, default=None)
@@ -0,0 +1,107 @@
+"""
+Keyword matcher for the chatbot
+An Aho-Corasick automaton compiled once from the knowledge base keywords, so
+matching costs one pass over the question regardless of how many keywords
+there are. A compiled automaton can be saved to a shared store, whose
+workers then load it instead of compiling their own.
+"""
+
+from array import array
+from collections import deque
+
+
+class KeywordMatcher:
+    """Find the best keyword contained in a piece of text in a single pass
+
+    Priority rule when several keywords occur: the longest keyword wins,
+    then the one that starts earliest in the text, then the one listed first.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = []
+        self._goto = [{}]
+        self._fail = [0]
+        # Index of the longest keyword ending at each node, following suffix
+        # links, or -1 when no keyword ends there
+        self._output = [-1]
+
+        seen = set()
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if not keyword or keyword in seen:
+                continue
+            seen.add(keyword)
+            self._add(keyword, len(self.keywords))
+            self.keywords.append(keyword)
+        self._build_links()
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def _add(self, keyword, index):
+        """Insert a keyword into the trie"""
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(-1)
+            node = next_node
+        self._output[node] = index
+
+    def _build_links(self):
+        """Compute failure links breadth-first and propagate outputs"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                if self._output[child] == -1:
+                    self._output[child] = self._output[self._fail[child]]
+                queue.append(child)
+
+    def best_match(self, text):
+        """Return the highest priority keyword found in text, or None"""
+        goto, fail, output = self._goto, self._fail, self._output
+        best = -1
+        best_length = 0
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            index = output[node]
+            # The node's own output is the longest (so earliest starting)
+            # keyword ending here; an equal length match found later in the
+            # scan starts later and loses
+            if index != -1 and len(self.keywords[index]) > best_length:
+                best = index
+                best_length = len(self.keywords[index])
+        return self.keywords[best] if best != -1 else None
+
+
+def save_keyword_matcher(writer, prefix, matcher):
+    """Add a compiled KeywordMatcher to a shared StoreWriter under prefix"""
+    writer.add_json(f"{prefix}/keywords", matcher.keywords)
+    writer.add_json(f"{prefix}/goto", matcher._goto)
+    writer.add_bytes(f"{prefix}/fail", array("i", matcher._fail).tobytes())
+    writer.add_bytes(f"{prefix}/output", array("i", matcher._output).tobytes())
+
+
+def load_keyword_matcher(store, prefix):
+    """Return the KeywordMatcher saved under prefix in a SharedStore, or None; the links are not copied"""
+    keywords = store.get_json(f"{prefix}/keywords")
+    if keywords is None:
+        return None
+    matcher = KeywordMatcher.__new__(KeywordMatcher)
+    matcher.keywords = keywords
+    matcher._goto = store.get_json(f"{prefix}/goto")
+    matcher._fail = store.get_bytes(f"{prefix}/fail").cast("i")
+    matcher._output = store.get_bytes(f"{prefix}/output").cast("i")
+    return matcher
@@ -0,0 +1,293 @@
+"""
+Opt-in instrumentation
+Phase timings and counters for the app's script runs, exported as
+Prometheus text over HTTP and/or appended to a JSON-lines file, plus an
+optional sampling profiler that writes collapsed stacks for flame graphs.
+Everything is off unless one of the environment variables below is set;
+when off, phase() hands back a shared no-op context manager.
+
+TOUR_GUIDE_METRICS=1              collect metrics (implied by the options below; 0/false/no/off is off)
+TOUR_GUIDE_METRICS_PORT=9464      serve Prometheus text at http://host:port/metrics
+TOUR_GUIDE_METRICS_HOST=127.0.0.1 interface the Prometheus endpoint listens on
+TOUR_GUIDE_METRICS_JSONL=path     append a snapshot to path every interval
+TOUR_GUIDE_METRICS_INTERVAL=60    seconds between JSONL snapshots and profile dumps
+TOUR_GUIDE_PROFILE=path           sample script threads, writing collapsed stacks to path
+"""
+
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENV = "TOUR_GUIDE_METRICS"
+METRICS_PORT_ENV = "TOUR_GUIDE_METRICS_PORT"
+METRICS_HOST_ENV = "TOUR_GUIDE_METRICS_HOST"
+METRICS_JSONL_ENV = "TOUR_GUIDE_METRICS_JSONL"
+METRICS_INTERVAL_ENV = "TOUR_GUIDE_METRICS_INTERVAL"
+PROFILE_ENV = "TOUR_GUIDE_PROFILE"
+
+DEFAULT_EXPORT_INTERVAL = 60.0
+# Only this machine can scrape unless TOUR_GUIDE_METRICS_HOST opens it up
+DEFAULT_METRICS_HOST = "127.0.0.1"
+FALSE_VALUES = ("", "0", "false", "no", "off")
+METRIC_PREFIX = "tour_guide_"
+# Upper bounds (seconds) of the phase timing histogram buckets
+TIMING_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Streamlit runs each session's script on a thread with this name prefix
+SCRIPT_THREAD_PREFIX = "ScriptRunner"
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_MAX_DEPTH = 64
+
+
+class _NullPhase:
+    """Context manager used for phases when metrics are off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """Times one phase and records it on exit"""
+
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        # st.rerun()/st.stop() end a phase with an exception; it still took the time
+        self.metrics.observe("phase_seconds", time.perf_counter() - self.started, phase=self.name)
+        return False
+
+
+class Metrics:
+    """Thread-safe counters and timing histograms shared by every session"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._counters = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def increment(self, name, amount=1, **labels):
+        """Add amount to a counter"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration in a timing histogram"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        bucket = bisect.bisect_left(TIMING_BUCKETS, seconds)
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                # Per-bucket counts (the last one is +Inf), then count and sum
+                timing = self._timings[key] = [0] * (len(TIMING_BUCKETS) + 1) + [0, 0.0]
+            timing[bucket] += 1
+            timing[-2] += 1
+            timing[-1] += seconds
+
+    def phase(self, name):
+        """Context manager timing a named phase of the script"""
+        return _Phase(self, name) if self.enabled else _NULL_PHASE
+
+    def snapshot(self):
+        """Return the current values as a JSON-serialisable dict"""
+        with self._lock:
+            counters = list(self._counters.items())
+            timings = [(key, list(timing)) for key, timing in self._timings.items()]
+        return {
+            "time": time.time(),
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in counters
+            ],
+            "timings": [
+                {"name": name, "labels": dict(labels), "count": timing[-2], "sum": timing[-1],
+                 "buckets": timing[:-2]}
+                for (name, labels), timing in timings
+            ],
+        }
+
+    def prometheus_text(self):
+        """Render the current values in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name in sorted({counter["name"] for counter in snapshot["counters"]}):
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+            for counter in snapshot["counters"]:
+                if counter["name"] == name:
+                    lines.append(f"{METRIC_PREFIX}{name}{_labels(counter['labels'])} {counter['value']}")
+        for name in sorted({timing["name"] for timing in snapshot["timings"]}):
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+            for timing in snapshot["timings"]:
+                if timing["name"] != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(TIMING_BUCKETS + ("+Inf",), timing["buckets"]):
+                    cumulative += count
+                    labels = _labels(dict(timing["labels"], le=str(bound)))
+                    lines.append(f"{METRIC_PREFIX}{name}_bucket{labels} {cumulative}")
+                labels = _labels(timing["labels"])
+                lines.append(f"{METRIC_PREFIX}{name}_count{labels} {timing['count']}")
+                lines.append(f"{METRIC_PREFIX}{name}_sum{labels} {timing['sum']:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    """Format a label dict as a Prometheus label set"""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
+
+
+def serve_prometheus(metrics, port, host=DEFAULT_METRICS_HOST):
+    """Serve metrics.prometheus_text() at /metrics on a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class _PeriodicThread(threading.Thread):
+    """Daemon thread calling tick() every interval seconds until stopped"""
+
+    def __init__(self, interval, name):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.tick()
+
+    def stop(self):
+        """Stop the thread after one last tick"""
+        self._stopped.set()
+        self.tick()
+
+    def tick(self):
+        raise NotImplementedError
+
+
+class JSONLWriter(_PeriodicThread):
+    """Appends a metrics snapshot to a JSON-lines file every interval"""
+
+    def __init__(self, metrics, path, interval=DEFAULT_EXPORT_INTERVAL):
+        super().__init__(interval, name="metrics-jsonl")
+        self.metrics = metrics
+        self.path = path
+
+    def tick(self):
+        with open(self.path, "a", encoding="utf-8") as jsonl_file:
+            jsonl_file.write(json.dumps(self.metrics.snapshot()) + "\n")
+
+
+class SamplingProfiler(_PeriodicThread):
+    """Samples the stacks of script threads and writes them as collapsed stacks
+
+    Each line of the output is "frame;frame;... count", the input format of
+    flamegraph.pl and speedscope. The file is rewritten every interval.
+    """
+
+    def __init__(self, path, interval=DEFAULT_EXPORT_INTERVAL, sample_interval=PROFILE_SAMPLE_INTERVAL,
+                 thread_prefix=SCRIPT_THREAD_PREFIX):
+        super().__init__(interval, name="metrics-profile-writer")
+        self.path = path
+        self.sample_interval = sample_interval
+        self.thread_prefix = thread_prefix
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._sampler = threading.Thread(target=self._sample_forever, name="metrics-profiler", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+        super().start()
+
+    def _sample_forever(self):
+        while not self._stopped.wait(self.sample_interval):
+            self.sample()
+
+    def sample(self):
+        """Record the current stack of every matching thread"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if not names.get(ident, "").startswith(self.thread_prefix):
+                continue
+            frames = []
+            while frame is not None and len(frames) < PROFILE_MAX_DEPTH:
+                code = frame.f_code
+                frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            with self._lock:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def tick(self):
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        with open(self.path, "w", encoding="utf-8") as profile_file:
+            profile_file.write("\n".join(lines) + ("\n" if lines else ""))
+
+
+def _env_flag(name):
+    """Whether an on/off environment variable is set to something other than 0/false/no/off"""
+    return os.environ.get(name, "").strip().lower() not in FALSE_VALUES
+
+
+def metrics_from_env():
+    """Create the Metrics instance and start the exporters configured in the environment"""
+    port = os.environ.get(METRICS_PORT_ENV)
+    jsonl_path = os.environ.get(METRICS_JSONL_ENV)
+    profile_path = os.environ.get(PROFILE_ENV)
+    interval = float(os.environ.get(METRICS_INTERVAL_ENV, DEFAULT_EXPORT_INTERVAL))
+    enabled = _env_flag(METRICS_ENV) or bool(port or jsonl_path)
+
+    metrics = Metrics(enabled=enabled)
+    if port:
+        serve_prometheus(metrics, int(port), os.environ.get(METRICS_HOST_ENV, DEFAULT_METRICS_HOST))
+    if jsonl_path:
+        JSONLWriter(metrics, jsonl_path, interval).start()
+    if profile_path:
+        SamplingProfiler(profile_path, interval).start()
+    return metrics
@@ -0,0 +1,233 @@
+"""
+Walking paths between stops
+Parses the footpaths read with a site's content from paths/<site>.geojson
+in its data directory (LineStrings, e.g. an OpenStreetMap footway extract),
+snaps every stop onto the network and runs Dijkstra once from each stop.
+The resulting table holds the walking distance and path polyline for every
+pair of stops, so requests only look results up. Sites without footpath data, and stops off the network, keep
+the straight-line estimate from tour_guide.geo.
+"""
+
+import heapq
+import json
+import math
+import os
+
+import numpy as np
+
+from tour_guide.content import DATA_DIR, ContentError
+from tour_guide.geo import WALKING_DETOUR_FACTOR, haversine_m
+
+PATHS_DIR = os.path.join(DATA_DIR, "paths")
+# Stops farther than this from every path vertex are treated as off the network
+SNAP_RADIUS_M = 60.0
+# Vertices closer than this (about 1 cm) are the same junction
+_COORDINATE_DIGITS = 7
+
+
+def paths_path(site_key, paths_dir=PATHS_DIR):
+    """Return the footpath GeoJSON path for a site"""
+    return os.path.join(paths_dir, f"{site_key}.geojson")
+
+
+def _position(position, where):
+    """Validate a GeoJSON [longitude, latitude, (altitude)] position as a (lat, lon) point"""
+    if (not isinstance(position, list) or len(position) < 2
+            or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in position)):
+        raise ContentError(f"{where}: a position should be a list of numbers [longitude, latitude], got {position!r}")
+    longitude, latitude = float(position[0]), float(position[1])
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ContentError(f"{where}: position out of range: {position}")
+    return (latitude, longitude)
+
+
+def _line(positions, where):
+    """Validate a LineString's positions as a list of (lat, lon) points"""
+    if not isinstance(positions, list) or len(positions) < 2:
+        raise ContentError(f"{where}: a line should be a list of at least two positions")
+    return [_position(position, where) for position in positions]
+
+
+def _geometries(data, where):
+    """Return the geometry objects of a GeoJSON object"""
+    if not isinstance(data, dict):
+        raise ContentError(f"{where}: GeoJSON should be an object, got {type(data).__name__}")
+    if data.get("type") == "FeatureCollection":
+        features = data.get("features")
+        if not isinstance(features, list):
+            raise ContentError(f"{where}: a FeatureCollection should have a list of features")
+    elif data.get("type") == "Feature":
+        features = [data]
+    else:
+        return [data]
+
+    geometries = []
+    for number, feature in enumerate(features):
+        if not isinstance(feature, dict):
+            raise ContentError(f"{where}: feature {number} should be an object")
+        geometry = feature.get("geometry")
+        # GeoJSON allows features without a location
+        if geometry is None:
+            continue
+        if not isinstance(geometry, dict):
+            raise ContentError(f"{where}: the geometry of feature {number} should be an object")
+        geometries.append(geometry)
+    return geometries
+
+
+def read_lines(path):
+    """Return the footpaths in a GeoJSON file as lists of (lat, lon) points"""
+    with open(path, encoding="utf-8") as geojson_file:
+        return parse_lines(geojson_file.read(), path)
+
+
+def parse_lines(text, path):
+    """Return the footpaths in GeoJSON text read from path as lists of (lat, lon) points"""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as error:
+        raise ContentError(f"{path}: invalid JSON: {error}") from None
+
+    lines = []
+    for geometry in _geometries(data, path):
+        coordinates = geometry.get("coordinates")
+        if geometry.get("type") == "LineString":
+            lines.append(_line(coordinates, path))
+        elif geometry.get("type") == "MultiLineString":
+            if not isinstance(coordinates, list):
+                raise ContentError(f"{path}: a MultiLineString should have a list of lines")
+            lines.extend(_line(part, path) for part in coordinates)
+        # Points and areas (e.g. building outlines in an OSM extract) are not walkable lines
+    if not lines:
+        raise ContentError(f"{path}: no LineString footpaths found")
+    return lines
+
+
+class WalkingPaths:
+    """All-pairs walking distances and polylines between a site's stops"""
+
+    def __init__(self, locations, lines, snap_radius_m=SNAP_RADIUS_M):
+        self.keys = tuple(locations)
+        self._positions = {key: position for position, key in enumerate(self.keys)}
+
+        # Graph vertices are the distinct path points; edges are path segments
+        vertices = {}
+        points = []
+        adjacency = []
+
+        def vertex(point):
+            rounded = (round(point[0], _COORDINATE_DIGITS), round(point[1], _COORDINATE_DIGITS))
+            index = vertices.get(rounded)
+            if index is None:
+                index = vertices[rounded] = len(points)
+                points.append(rounded)
+                adjacency.append([])
+            return index
+
+        def connect(first, second):
+            length = float(haversine_m(*points[first], *points[second]))
+            adjacency[first].append((second, length))
+            adjacency[second].append((first, length))
+
+        for line in lines:
+            indices = [vertex(point) for point in line]
+            for first, second in zip(indices, indices[1:]):
+                if first != second:
+                    connect(first, second)
+
+        # Each stop joins the network at its nearest vertex, by a straight walk
+        path_points = np.array(points, dtype=float).reshape(-1, 2)
+        stop_vertices = {}
+        for key in self.keys:
+            latitude, longitude = locations[key].coordinates
+            distances = haversine_m(latitude, longitude, path_points[:, 0], path_points[:, 1])
+            nearest = int(np.argmin(distances))
+            if distances[nearest] > snap_radius_m:
+                continue
+            stop_vertex = vertex((latitude, longitude))
+            if stop_vertex != nearest:
+                connect(stop_vertex, nearest)
+            stop_vertices[key] = stop_vertex
+
+        count = len(self.keys)
+        self._metres = np.full((count, count), np.nan)
+        self._polylines = {}
+        for key, source in stop_vertices.items():
+            distances, previous = self._dijkstra(adjacency, source)
+            for target_key, target in stop_vertices.items():
+                if target not in distances:
+                    continue
+                self._metres[self._positions[key], self._positions[target_key]] = distances[target]
+                self._polylines[key, target_key] = self._trace(previous, points, target)
+        self._metres.setflags(write=False)
+
+    @staticmethod
+    def _dijkstra(adjacency, source):
+        """Shortest distances and predecessors from source to every reachable vertex"""
+        distances = {source: 0.0}
+        previous = {source: None}
+        queue = [(0.0, source)]
+        while queue:
+            distance, current = heapq.heappop(queue)
+            if distance > distances[current]:
+                continue
+            for neighbour, length in adjacency[current]:
+                candidate = distance + length
+                if candidate < distances.get(neighbour, math.inf):
+                    distances[neighbour] = candidate
+                    previous[neighbour] = current
+                    heapq.heappush(queue, (candidate, neighbour))
+        return distances, previous
+
+    @staticmethod
+    def _trace(previous, points, target):
+        """Follow predecessors back from target, returning the (lat, lon) polyline from the source"""
+        polyline = []
+        while target is not None:
+            polyline.append(points[target])
+            target = previous[target]
+        return tuple(reversed(polyline))
+
+    def distance(self, from_key, to_key):
+        """Walking distance in metres between two stops, or None if there is no path"""
+        metres = self._metres[self._positions[from_key], self._positions[to_key]]
+        return None if np.isnan(metres) else float(metres)
+
+    def path(self, from_key, to_key):
+        """The walking route between two stops as (lat, lon) points, or None if there is no path"""
+        return self._polylines.get((from_key, to_key))
+
+    def walking_matrix(self, straight_matrix):
+        """Walking metres between every pair of stops, estimating pairs without a path
+
+        straight_matrix is the straight-line distance matrix in the same key
+        order (StopIndex.distance_matrix()); missing pairs use the detour factor.
+        """
+        matrix = np.where(np.isnan(self._metres), straight_matrix * WALKING_DETOUR_FACTOR, self._metres)
+        matrix.setflags(write=False)
+        return matrix
+
+
+def site_paths_dir(site):
+    """Return the footpath directory of the data directory a site was loaded from"""
+    return os.path.join(site.data_dir, "paths")
+
+
+def load_walking_paths(site, paths_dir=None):
+    """Build the WalkingPaths for a site, or return None if it has no footpath data
+
+    Without paths_dir, the footpaths read together with the site's content are used.
+    """
+    if paths_dir is None:
+        if site.footpaths is None:
+            return None
+        return WalkingPaths(site.locations, parse_lines(site.footpaths, paths_path(site.key, site_paths_dir(site))))
+    path = paths_path(site.key, paths_dir)
+    if not os.path.exists(path):
+        return None
+    return WalkingPaths(site.locations, read_lines(path))
+
+
+def site_walking_paths(site):
+    """Return the site's WalkingPaths (or None), built once and kept with the site"""
+    return site.derived("walking_paths", load_walking_paths)
@@ -0,0 +1,120 @@
+"""
+Session persistence
+Keeps each visitor's place (site, language, tour, stop, custom tour and chat)
+in SQLite so a dropped connection can resume from the token in the page URL.
+Saves only replace an in-memory pending entry; a background thread writes
+all pending sessions in one transaction every flush interval, so clicks
+never wait on the disk and a burst of reruns costs a single row write.
+The database runs in WAL mode, so reads are not blocked by a flush.
+
+TOUR_GUIDE_SESSION_DB sets the database path (for example
+~/.cache/tour_guide/sessions.sqlite3) and turns persistence on; without it
+nothing is written and reconnecting starts a new session.
+"""
+
+import atexit
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+SESSION_DB_ENV = "TOUR_GUIDE_SESSION_DB"
+DEFAULT_FLUSH_INTERVAL = 2.0
+# Sessions untouched for this long are deleted when the store opens
+DEFAULT_SESSION_TTL = 7 * 24 * 3600
+TOKEN_BYTES = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+"""
+
+
+def new_session_token():
+    """Return a fresh, unguessable session token"""
+    return secrets.token_urlsafe(TOKEN_BYTES)
+
+
+class SessionStore:
+    """SQLite-backed session states with debounced, batched writes"""
+
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL, ttl=DEFAULT_SESSION_TTL):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps committed data safe across crashes at NORMAL without an fsync per commit
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        with self._connection:
+            self._connection.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - ttl,))
+        self._db_lock = threading.Lock()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._writer = threading.Thread(target=self._flush_forever, name="session-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def save(self, token, state):
+        """Queue a session's state for the next flush; later saves replace earlier ones"""
+        with self._pending_lock:
+            self._pending[token] = (state, time.time())
+
+    def load(self, token):
+        """Return a session's latest state, or None if the token is unknown"""
+        with self._pending_lock:
+            pending = self._pending.get(token)
+        if pending is not None:
+            return pending[0]
+        with self._db_lock:
+            row = self._connection.execute("SELECT state FROM sessions WHERE token=?", (token,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def flush(self):
+        """Write every pending session now; returns how many were written"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        rows = [(token, json.dumps(state, ensure_ascii=False), updated) for token, (state, updated) in pending.items()]
+        with self._db_lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO sessions (token, state, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(token) DO UPDATE SET state=excluded.state, updated=excluded.updated",
+                rows,
+            )
+        return len(rows)
+
+    def _flush_forever(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Keep serving; the failed batch is lost but later saves are retried
+                pass
+
+    def close(self):
+        """Stop the writer and flush what is pending"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._writer.join()
+        self.flush()
+        with self._db_lock:
+            self._connection.close()
+
+
+def session_store_from_env():
+    """Open the session store at TOUR_GUIDE_SESSION_DB, or return None if it is unset"""
+    path = os.environ.get(SESSION_DB_ENV)
+    return SessionStore(path) if path else None
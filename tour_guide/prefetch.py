@@ -0,0 +1,123 @@
+"""
+Speculative prefetch
+While a visitor reads a stop, the next stop's assets are built on a
+background thread so pressing Next serves them ready-made. Results are kept
+in a cache bounded by total size (least recently used go first), and the
+queue of jobs waiting to run is bounded too; when it is full new prefetches
+are dropped, since they are only guesses. A job that returns None only
+warms a cache of its own (such as the site's rendered panels) and stores
+nothing here.
+
+Jobs belong to owners (sessions). Sessions headed for the same stop share
+one job, and it keeps track of each of them. Cancelling an owner, when its
+visitor switches tour, site or language, withdraws it from its jobs; a job
+left with no owners is dropped if it has not started, or finishes with its
+result discarded.
+
+TOUR_GUIDE_PREFETCH_MB (e.g. 32) sets the cache size and turns prefetching
+on; unset or 0 leaves it off.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PREFETCH_MB_ENV = "TOUR_GUIDE_PREFETCH_MB"
+DEFAULT_MAX_PENDING = 64
+
+
+def _size(value):
+    return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+
+class Prefetcher:
+    """Builds values on a background thread into a size-bounded LRU cache"""
+
+    def __init__(self, max_bytes, max_pending=DEFAULT_MAX_PENDING, max_workers=1):
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        # key -> (value, size in bytes)
+        self._cache = OrderedDict()
+        self._bytes = 0
+        # key -> (owners, ticket, future) for jobs not finished yet; the ticket
+        # tells a job whether it is still the one wanted for its key
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def cached_bytes(self):
+        return self._bytes
+
+    def prefetch(self, owner, key, build):
+        """Queue build() to produce the value for key, unless it is cached, queued or the queue is full
+
+        When key is already queued, owner joins the job instead.
+        """
+        with self._lock:
+            if key in self._pending:
+                self._pending[key][0].add(owner)
+                return False
+            if key in self._cache or len(self._pending) >= self.max_pending:
+                return False
+            ticket = object()
+            # The job cannot finish before this lock is released, so its entry is always found
+            self._pending[key] = ({owner}, ticket, self._executor.submit(self._run, key, ticket, build))
+            return True
+
+    def _run(self, key, ticket, build):
+        try:
+            value = build()
+        finally:
+            with self._lock:
+                wanted = key in self._pending and self._pending[key][1] is ticket
+                if wanted:
+                    del self._pending[key]
+        if wanted and value is not None:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._cache[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._cache.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get(self, key):
+        """Return the prefetched value for key, or None"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            self._cache.move_to_end(key)
+            return entry[0]
+
+    def cancel(self, owner):
+        """Withdraw owner from its jobs; a job no one else wants is dropped, or its result discarded"""
+        with self._lock:
+            for key, (owners, _, future) in list(self._pending.items()):
+                owners.discard(owner)
+                if not owners:
+                    del self._pending[key]
+                    future.cancel()
+
+    def shutdown(self):
+        """Stop accepting jobs and release the worker thread"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def prefetcher_from_env():
+    """Create a Prefetcher bounded by TOUR_GUIDE_PREFETCH_MB, or return None if it is unset or 0"""
+    megabytes = float(os.environ.get(PREFETCH_MB_ENV) or 0)
+    return Prefetcher(int(megabytes * 1024 * 1024)) if megabytes > 0 else None
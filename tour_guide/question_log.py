@@ -0,0 +1,139 @@
+"""
+Chatbot question log
+Records every question visitors ask and the response ID it got, so an
+offline report (tools/question_report.py) can list the questions that fell
+through to the 'default' answer and need new chatbot responses.
+
+record() only updates an in-memory batch, where repeats of the same question
+and answer are merged into one entry with a count; a background thread
+appends each batch as compact JSON lines every flush interval, so logging
+adds no disk I/O to a rerun. The file is rotated at a size limit, keeping a
+few old files (questions.jsonl.1, .2, ...).
+
+TOUR_GUIDE_QUESTION_LOG sets the log path (for example
+~/.cache/tour_guide/questions.jsonl) and turns logging on; without it no
+questions are recorded.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+from tour_guide.chatbot import answer_kind, normalize_question
+
+QUESTION_LOG_ENV = "TOUR_GUIDE_QUESTION_LOG"
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+# Distinct (question, answer) entries held between flushes; more are counted as dropped
+DEFAULT_MAX_PENDING = 10000
+
+
+def rotated_paths(path, backups=DEFAULT_BACKUPS):
+    """The log and its rotated files that exist, oldest first"""
+    paths = [f"{path}.{number}" for number in range(backups, 0, -1)] + [path]
+    return [candidate for candidate in paths if os.path.exists(candidate)]
+
+
+def read_entries(path, backups=DEFAULT_BACKUPS):
+    """Yield the entries of a log and its rotated files, oldest first, skipping damaged lines"""
+    for log_path in rotated_paths(path, backups):
+        with open(log_path, encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash mid-write
+                    continue
+
+
+class QuestionLog:
+    """Batched, deduplicated, rotating JSON-lines log of chatbot questions"""
+
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL, max_bytes=DEFAULT_MAX_BYTES,
+                 backups=DEFAULT_BACKUPS, max_pending=DEFAULT_MAX_PENDING):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_pending = max_pending
+        self.dropped = 0
+        # (site, language, question, response ID, source) -> [count, last asked]
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._writer = threading.Thread(target=self._flush_forever, name="question-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def record(self, site, question, response_id, source):
+        """Count a question and the response it got in the next batch"""
+        key = (site.key, site.language, normalize_question(question), response_id, source)
+        with self._pending_lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[0] += 1
+                entry[1] = time.time()
+            elif len(self._pending) < self.max_pending:
+                self._pending[key] = [1, time.time()]
+            else:
+                self.dropped += 1
+
+    def flush(self):
+        """Append the pending batch to the log now; returns how many entries were written"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        lines = []
+        for (site_key, language, question, response_id, source), (count, asked) in pending.items():
+            lines.append(json.dumps({
+                "t": round(asked), "site": site_key, "lang": language, "q": question,
+                "r": response_id, "kind": answer_kind(response_id), "src": source, "n": count,
+            }, ensure_ascii=False, separators=(",", ":")))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with self._write_lock:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as log_file:
+                log_file.write(data)
+        return len(lines)
+
+    def _rotate(self):
+        """Shift questions.jsonl to .1, .1 to .2 and so on, dropping the oldest"""
+        for number in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{number}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{number + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _flush_forever(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                # Keep serving; the failed batch is lost but later batches are retried
+                pass
+
+    def close(self):
+        """Stop the writer and flush what is pending"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._writer.join()
+        self.flush()
+
+
+def question_log_from_env():
+    """Open the question log at TOUR_GUIDE_QUESTION_LOG, or return None if it is unset"""
+    path = os.environ.get(QUESTION_LOG_ENV)
+    return QuestionLog(path) if path else None
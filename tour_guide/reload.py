@@ -0,0 +1,161 @@
+"""
+Content hot reload
+A ContentWatcher thread polls the content files (site JSON, translations,
+footpaths) for changes. When the files of a bundle in memory change, it loads
+a new snapshot, builds its derived structures (matchers, indexes, rendered
+panels and whatever else the app adds) within a time budget, and swaps it
+into the registry in one step, all off the request path. A script run that
+already holds the old snapshot finishes with it; the next run gets the new
+one, whose version keys every cache kept outside the bundle.
+
+A replaced snapshot is freed once nothing holds it. While more than
+max_retired are still alive, further reloads wait, which bounds the memory
+held by concurrent snapshots. A file that fails to load or warm leaves the
+current snapshot in place until it is fixed.
+
+TOUR_GUIDE_RELOAD_INTERVAL (seconds between polls) turns watching on.
+"""
+
+import os
+import threading
+import time
+
+from tour_guide.chatbot import site_intent_classifier, site_keyword_matcher, site_search_index
+from tour_guide.content import ContentError, content_version
+from tour_guide.geo import site_stop_index
+from tour_guide.images import site_image_sets
+from tour_guide.paths import site_walking_paths
+from tour_guide.rendering import render_location_panel
+
+RELOAD_INTERVAL_ENV = "TOUR_GUIDE_RELOAD_INTERVAL"
+# Seconds a reload may spend building derived structures; the rest are built on first use
+DEFAULT_WARM_BUDGET = 10.0
+DEFAULT_MAX_RETIRED = 4
+PHOTO_TOUR_KEY = "photography"
+# Content lives in these folders of the data directory, plus the site index
+WATCHED_DIRS = ("sites", "translations", "paths")
+
+
+def warm_panels(site):
+    """Render the details panel of every stop of every tour"""
+    for tour in site.tours.values():
+        stops = tour.locations
+        for position, location_key in enumerate(stops):
+            next_location_key = stops[position + 1] if position + 1 < len(stops) else None
+            render_location_panel(site, location_key, next_location_key, tour.key == PHOTO_TOUR_KEY)
+
+
+DEFAULT_WARM_STEPS = (
+    site_keyword_matcher,
+    site_intent_classifier,
+    site_search_index,
+    site_stop_index,
+    site_walking_paths,
+    site_image_sets,
+    warm_panels,
+)
+
+
+def warm_site(site, steps=DEFAULT_WARM_STEPS, budget_seconds=DEFAULT_WARM_BUDGET):
+    """Run warm steps on a bundle until they are done or the budget is spent; returns how many ran"""
+    deadline = time.monotonic() + budget_seconds
+    done = 0
+    for step in steps:
+        if time.monotonic() > deadline:
+            break
+        step(site)
+        done += 1
+    return done
+
+
+def content_stats(data_dir):
+    """Return {path: (modification time, size)} for every content file"""
+    stats = {}
+    index = os.path.join(data_dir, "sites.json")
+    paths = [index] if os.path.exists(index) else []
+    for name in WATCHED_DIRS:
+        for root, _, files in os.walk(os.path.join(data_dir, name)):
+            paths.extend(os.path.join(root, file) for file in files)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        stats[path] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+
+class ContentWatcher(threading.Thread):
+    """Daemon thread reloading changed site bundles into a SiteRegistry"""
+
+    def __init__(self, registry, interval, warm_steps=DEFAULT_WARM_STEPS, warm_budget=DEFAULT_WARM_BUDGET,
+                 max_retired=DEFAULT_MAX_RETIRED, on_reload=None):
+        super().__init__(name="content-watcher", daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self.warm_steps = tuple(warm_steps)
+        self.warm_budget = warm_budget
+        self.max_retired = max_retired
+        self.on_reload = on_reload
+        self.reloads = 0
+        self.last_error = None
+        self._stats = content_stats(registry.data_dir)
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _stale_bundles(self):
+        """(site key, language) of loaded bundles whose files no longer match their version"""
+        stale = []
+        for site_key, language in self.registry.loaded():
+            site = self.registry.peek(site_key, language)
+            try:
+                if site is not None and content_version(site_key, language, self.registry.data_dir) != site.version:
+                    stale.append((site_key, language))
+            except ContentError as error:
+                # Deleted or renamed mid-edit; keep serving what is loaded
+                self.last_error = error
+        return stale
+
+    def check(self):
+        """Reload every loaded bundle whose files changed; returns [(site key, language, seconds)]"""
+        stats = content_stats(self.registry.data_dir)
+        if stats == self._stats:
+            return []
+        self.registry.refresh_index()
+        reloaded = []
+        for site_key, language in self._stale_bundles():
+            if self.registry.retired() >= self.max_retired:
+                # Too many old snapshots still in use; try again next poll
+                return reloaded
+            started = time.monotonic()
+            try:
+                site = self.registry.reload(
+                    site_key, language, warm=lambda site: warm_site(site, self.warm_steps, self.warm_budget)
+                )
+            except (OSError, ValueError) as error:
+                # Invalid content (ContentError) or a warm step failing on it
+                self.last_error = error
+                continue
+            seconds = time.monotonic() - started
+            self.reloads += 1
+            reloaded.append((site_key, language, seconds))
+            if self.on_reload is not None:
+                self.on_reload(site, seconds)
+        self._stats = stats
+        return reloaded
+
+
+def content_watcher_from_env(registry, **options):
+    """Start a ContentWatcher polling every TOUR_GUIDE_RELOAD_INTERVAL seconds, or return None if unset"""
+    interval = os.environ.get(RELOAD_INTERVAL_ENV)
+    if not interval:
+        return None
+    watcher = ContentWatcher(registry, float(interval), **options)
+    watcher.start()
+    return watcher
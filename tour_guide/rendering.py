@@ -0,0 +1,290 @@
+"""
+Pre-rendered page fragments
+The location details panel is rendered to a single HTML fragment once per
+(stop, next stop, photo tour) and kept with the site, so a rerun sends one
+element instead of a few dozen separate markdown calls. The page styles and
+the folium tour map live here too, shared by the app and the static export.
+"""
+
+from html import escape
+
+import folium
+
+from tour_guide.content import NOT_APPLICABLE
+from tour_guide.geo import WALKING_SPEED_M_PER_S, format_distance, format_duration, site_stop_index, walking_estimate
+from tour_guide.images import picture_html, site_image_sets
+from tour_guide.paths import site_walking_paths
+from tour_guide.shared_store import attached_store, panel_key
+
+PHOTO_SECTION_STYLE = "border-left: 4px solid #DAA520; background-color: #FFFACD;"
+
+PAGE_CSS = """\
+.main-header {
+    font-size: 2.5rem;
+    color: #8B4513;
+    text-align: center;
+    padding: 1rem 0;
+    border-bottom: 3px solid #DAA520;
+    margin-bottom: 1rem;
+}
+.location-title {
+    font-size: 2rem;
+    color: #8B4513;
+    margin-bottom: 1rem;
+}
+.progress-indicator {
+    background-color: #f0f2f6;
+    padding: 1rem;
+    border-radius: 0.5rem;
+    text-align: center;
+    margin-bottom: 1rem;
+    font-size: 1.2rem;
+    color: #8B4513;
+}
+.info-section {
+    background-color: #FFF8DC;
+    padding: 1.5rem;
+    border-radius: 0.5rem;
+    margin-bottom: 1rem;
+    border-left: 4px solid #DAA520;
+}
+.image-placeholder {
+    background-color: #E8F4FD;
+    color: #0B4F8A;
+    padding: 1rem;
+    border-radius: 0.5rem;
+    margin-bottom: 0.5rem;
+}
+.image-caption {
+    font-size: 0.85rem;
+    color: #808495;
+}
+.location-photo {
+    width: 100%;
+    height: auto;
+    border-radius: 0.5rem;
+    background-size: cover;
+}
+.navigation-section {
+    background-color: #E6F3FF;
+    padding: 1rem;
+    border-radius: 0.5rem;
+    margin-top: 1rem;
+    border-left: 4px solid #4682B4;
+}
+.chatbot-message {
+    padding: 0.8rem;
+    border-radius: 0.5rem;
+    margin-bottom: 0.5rem;
+}
+.user-message {
+    background-color: #E3F2FD;
+    text-align: right;
+}
+.bot-message {
+    background-color: #F5F5F5;
+}
+.stButton>button {
+    width: 100%;
+    background-color: #8B4513;
+    color: white;
+    font-weight: bold;
+    border-radius: 0.5rem;
+    padding: 0.5rem 1rem;
+}
+.stButton>button:hover {
+    background-color: #A0522D;
+}
+"""
+
+
+def walking_to_next(site, location_key, next_location_key):
+    """Return display strings (walking distance, walking time) between two stops"""
+    if next_location_key is None:
+        return NOT_APPLICABLE, NOT_APPLICABLE
+    walking_paths = site_walking_paths(site)
+    path_m = walking_paths.distance(location_key, next_location_key) if walking_paths is not None else None
+    if path_m is not None:
+        distance_m = path_m
+    else:
+        distance_m = site_stop_index(site).distance(location_key, next_location_key)
+    # Stops that share coordinates (e.g. inside one building) cannot be
+    # measured, so fall back to the hand-written estimate
+    if distance_m < 1:
+        location = site.locations[location_key]
+        return location.walking_distance, location.walking_time
+    if path_m is not None:
+        walking_m, walking_s = path_m, path_m / WALKING_SPEED_M_PER_S
+    else:
+        walking_m, walking_s = walking_estimate(distance_m)
+    return format_distance(walking_m), format_duration(walking_s)
+
+
+def next_directions(site, location_key, next_location_key):
+    """Return the directions from a stop to the tour's next stop
+
+    A stop's hand-written next_directions describe the walk to the stop listed
+    after it in the site's content (the complete tour). Tours that go
+    elsewhere, custom and crowd-reordered ones included, get a generated line.
+    """
+    location = site.locations[location_key]
+    keys = list(site.locations)
+    position = keys.index(location_key)
+    successor = keys[position + 1] if position + 1 < len(keys) else None
+    if next_location_key == successor:
+        return location.next_directions
+    if next_location_key is None:
+        return "This is the last stop of the tour."
+    name = site.locations[next_location_key].name
+    walking_distance, _ = walking_to_next(site, location_key, next_location_key)
+    if walking_distance == NOT_APPLICABLE:
+        return f"Walk to {name}."
+    return f"Walk to {name} (~{walking_distance})."
+
+
+def _section(title, body, css_class="info-section", style=None):
+    """Wrap a section body in its styled container"""
+    style_attribute = f' style="{style}"' if style else ""
+    return f'<div class="{css_class}"{style_attribute}>\n<h3>{title}</h3>\n{body}\n</div>'
+
+
+def _paragraph(text):
+    """Escape text into a paragraph"""
+    return f"<p>{escape(text, quote=False)}</p>"
+
+
+def _labelled(label, text):
+    """Escape text into a paragraph with a bold label"""
+    return f"<p><strong>{label}:</strong> {escape(text, quote=False)}</p>"
+
+
+def _bullets(items):
+    """Escape items into a bulleted list"""
+    return "<ul>\n" + "\n".join(f"<li>{escape(item, quote=False)}</li>" for item in items) + "\n</ul>"
+
+
+def _render_location_panel(site, location_key, next_location_key, is_photo_tour):
+    """Build the details panel HTML for a stop"""
+    location = site.locations[location_key]
+    parts = [f'<h2 class="location-title">{escape(location.name, quote=False)}</h2>']
+
+    parts.append(_section("Overview", _paragraph(location.description)))
+    parts.append(_section("Historical Significance", _paragraph(location.historical_significance)))
+
+    if location.architectural_features:
+        parts.append(_section("Architectural Features", _bullets(location.architectural_features)))
+
+    # Photography tips for photo tour
+    if is_photo_tour and location.best_photo_spot:
+        body = _labelled("Best Spot", location.best_photo_spot)
+        if location.camera_settings:
+            body += "\n<p><strong>Camera Settings:</strong></p>\n" + _bullets(location.camera_settings)
+        parts.append(_section("📸 Photography Tips", body, style=PHOTO_SECTION_STYLE))
+
+    if location.visitor_tips:
+        parts.append(_section("Visitor Tips", _bullets(location.visitor_tips)))
+
+    # Navigation to next location, with distance and time computed from the
+    # stop coordinates
+    walking_distance, walking_time = walking_to_next(site, location_key, next_location_key)
+    if walking_distance != NOT_APPLICABLE and walking_time != NOT_APPLICABLE:
+        body = []
+        directions = next_directions(site, location_key, next_location_key)
+        if directions != NOT_APPLICABLE:
+            body.append(_labelled("Directions", directions))
+        body.append(_labelled("Walking Distance", walking_distance))
+        body.append(_labelled("Estimated Time", walking_time))
+        parts.append(_section("🚶 Navigation to Next Stop", "\n".join(body), css_class="navigation-section"))
+
+    # Photo of the stop, or a placeholder until one has been built
+    name = escape(location.name, quote=False)
+    image_set = site_image_sets(site).get(location_key)
+    if image_set is not None:
+        parts.append(_section("📷 Location View", picture_html(image_set, location.name)))
+    else:
+        parts.append(_section("📷 Location View", (
+            f'<div class="image-placeholder">[Image Placeholder: 400x300px view of {name}]</div>\n'
+            f'<p class="image-caption">Visual representation of {name} would be displayed here</p>'
+        )))
+
+    # Blank lines would end the markdown HTML block the fragment is sent in
+    return "\n".join(parts)
+
+
+def render_location_panel(site, location_key, next_location_key=None, is_photo_tour=False):
+    """Return the details panel for a stop as one HTML fragment, rendered once per site
+
+    A panel pre-rendered into the attached shared store is used as is.
+    """
+    panels = site.derived("location_panels", lambda site: {})
+    key = (location_key, next_location_key, bool(is_photo_tour))
+    fragment = panels.get(key)
+    if fragment is None:
+        store = attached_store()
+        if store is not None:
+            fragment = store.get_text(panel_key(site, location_key, next_location_key, is_photo_tour))
+        if fragment is None:
+            fragment = _render_location_panel(site, location_key, next_location_key, is_photo_tour)
+        fragment = panels.setdefault(key, fragment)
+    return fragment
+
+
+def map_popup_html(site, tour_locations, position):
+    """Popup for the stop at position in a tour: name, place in the tour, excerpt and next walk"""
+    location = site.locations[tour_locations[position]]
+    next_location_key = tour_locations[position + 1] if position + 1 < len(tour_locations) else None
+    _, walking_time = walking_to_next(site, tour_locations[position], next_location_key)
+    directions = next_directions(site, tour_locations[position], next_location_key)
+    return (
+        '<div style="width: 250px;">'
+        f'<h4 style="color: #8B4513; margin-bottom: 10px;">{escape(location.name)}</h4>'
+        f'<p style="font-size: 12px;"><strong>Stop {position + 1} of {len(tour_locations)}</strong></p>'
+        f'<p style="font-size: 11px;">{escape(location.description[:150])}...</p>'
+        '<hr style="margin: 8px 0;">'
+        f'<p style="font-size: 11px;"><strong>Next:</strong> {escape(directions[:100])}</p>'
+        f'<p style="font-size: 11px;"><strong>Walking time:</strong> {escape(walking_time)}</p>'
+        '</div>'
+    )
+
+
+def build_map(site, current_location, tour_locations, tiles="OpenStreetMap", attribution=None):
+    """Create a Folium map of a tour, marking stops done, current and ahead"""
+    m = folium.Map(
+        location=list(site.map_center),
+        zoom_start=site.map_zoom,
+        tiles=tiles,
+        attr=attribution,
+        max_zoom=19,
+    )
+
+    current_position = tour_locations.index(current_location)
+    for position, location_key in enumerate(tour_locations):
+        if position == current_position:
+            color, icon = "red", "star"
+        elif position < current_position:
+            color, icon = "green", "check"
+        else:
+            color, icon = "blue", "info-sign"
+        location = site.locations[location_key]
+        folium.Marker(
+            location=list(location.coordinates),
+            popup=folium.Popup(map_popup_html(site, tour_locations, position), max_width=300),
+            tooltip=location.name,
+            icon=folium.Icon(color=color, icon=icon),
+        ).add_to(m)
+
+    # Trace the footpath to the next stop when the site has path data
+    walking_paths = site_walking_paths(site)
+    if walking_paths is not None and current_position + 1 < len(tour_locations):
+        path = walking_paths.path(current_location, tour_locations[current_position + 1])
+        if path is not None and len(path) > 1:
+            folium.PolyLine(
+                locations=[list(point) for point in path],
+                color="#8B4513",
+                weight=4,
+                opacity=0.8,
+                dash_array="8, 6",
+                tooltip="Walking route to the next stop",
+            ).add_to(m)
+
+    return m
@@ -0,0 +1,201 @@
+"""
+Custom tour planning
+Orders any selection of stops into a walkable tour between a chosen start
+and end, dropping stops when the selection does not fit a time budget. A
+nearest-neighbour route is refined with 2-opt over the site's cached walking
+time matrix (footpath distances where the site has them), and plans are
+memoized per request signature. The rest of a tour in progress can be
+reordered to put crowded stops later (see tour_guide/crowds.py).
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from tour_guide.geo import WALKING_DETOUR_FACTOR, WALKING_SPEED_M_PER_S
+
+DEFAULT_PLAN_CACHE_SIZE = 256
+# Crowds move on: a stop's expected wait counts in full for the next stop and
+# by this factor less for each stop after it
+CROWD_WAIT_DECAY = 0.5
+# Reorder a tour only when that saves at least this many seconds
+MIN_REORDER_GAIN_SECONDS = 60
+
+# Improvements smaller than this (seconds) are treated as noise
+_EPSILON = 1e-9
+
+
+class Route(namedtuple("Route", ["stops", "walking_seconds", "dwell_seconds", "skipped", "within_budget"])):
+    """A planned tour: ordered stop keys, time totals and any stops left out"""
+    __slots__ = ()
+
+    @property
+    def total_seconds(self):
+        return self.walking_seconds + self.dwell_seconds
+
+
+class RoutePlanner:
+    """Plans tours over one site's stops"""
+
+    def __init__(self, stop_index, dwell_seconds, cache_size=DEFAULT_PLAN_CACHE_SIZE, walking_metres=None):
+        self.keys = list(stop_index.keys)
+        self._positions = {key: position for position, key in enumerate(self.keys)}
+        # walking_metres, in stop_index key order, replaces the straight-line estimate
+        if walking_metres is None:
+            walking_metres = stop_index.distance_matrix() * WALKING_DETOUR_FACTOR
+        self._travel = walking_metres / WALKING_SPEED_M_PER_S
+        self._dwell = np.array([dwell_seconds[key] for key in self.keys], dtype=float)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def plan(self, stops, start, end, budget_seconds=None):
+        """Return the Route through stops from start to end, within budget_seconds if given"""
+        for key in (start, end, *stops):
+            if key not in self._positions:
+                raise KeyError(f"unknown stop '{key}'")
+        middle = frozenset(stops) - {start, end}
+        signature = (middle, start, end, budget_seconds)
+        with self._lock:
+            route = self._cache.get(signature)
+            if route is not None:
+                self._cache.move_to_end(signature)
+                return route
+
+        route = self._solve(middle, start, end, budget_seconds)
+
+        with self._lock:
+            self._cache[signature] = route
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return route
+
+    def avoid_crowds(self, current, remaining, wait_seconds, keep_last=True):
+        """Reorder the stops left after current so crowded ones come later
+
+        wait_seconds maps stops to their expected wait now. Stops are moved
+        one at a time while that lowers walking plus (decaying) waiting time;
+        the tour's order is kept unless the saving is worth it. With
+        keep_last, the final stop (usually an exit) stays last.
+        """
+        remaining = tuple(remaining)
+        movable = remaining[:-1] if keep_last else remaining
+        if len(movable) < 2 or not any(wait_seconds.get(key) for key in movable):
+            return remaining
+        fixed = [self._positions[key] for key in remaining[len(movable):]]
+        waits = np.array([wait_seconds.get(key, 0) for key in self.keys], dtype=float)
+        decay = CROWD_WAIT_DECAY ** np.arange(len(remaining))
+        start = self._positions[current]
+
+        def cost(order):
+            route = [start, *order, *fixed]
+            return float(self._travel[route[:-1], route[1:]].sum() + (waits[route[1:]] * decay).sum())
+
+        order = [self._positions[key] for key in movable]
+        best = original = cost(order)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(order)):
+                for j in range(len(order)):
+                    if i == j:
+                        continue
+                    candidate = order[:i] + order[i + 1:]
+                    candidate.insert(j, order[i])
+                    candidate_cost = cost(candidate)
+                    if candidate_cost < best - _EPSILON:
+                        order, best, improved = candidate, candidate_cost, True
+        if original - best < MIN_REORDER_GAIN_SECONDS:
+            return remaining
+        return tuple(self.keys[position] for position in order + fixed)
+
+    def _solve(self, middle, start, end, budget_seconds):
+        """Nearest-neighbour construction, 2-opt, then greedy drops to fit the budget"""
+        # Sorted so the plan does not depend on the order stops were picked
+        pending = sorted(self._positions[key] for key in middle)
+        route = self._nearest_neighbour(self._positions[start], pending, self._positions[end])
+        route = self._two_opt(route)
+
+        skipped = []
+        if budget_seconds is not None:
+            while len(route) > 2 and self._cost(route) > budget_seconds:
+                route, dropped = self._drop_one(route)
+                skipped.append(dropped)
+            if skipped:
+                route = self._two_opt(route)
+                # Greedy drops can overshoot; put back whatever still fits
+                for position in list(skipped):
+                    candidate = self._cheapest_insertion(route, position)
+                    if self._cost(candidate) <= budget_seconds:
+                        route = candidate
+                        skipped.remove(position)
+
+        walking = float(self._travel[route[:-1], route[1:]].sum())
+        dwell = float(self._dwell[self._unique(route)].sum())
+        return Route(
+            stops=tuple(self.keys[position] for position in self._unique(route)),
+            walking_seconds=walking,
+            dwell_seconds=dwell,
+            skipped=tuple(self.keys[position] for position in skipped),
+            within_budget=budget_seconds is None or walking + dwell <= budget_seconds,
+        )
+
+    @staticmethod
+    def _unique(route):
+        """Route positions with a repeated start/end (round trip) listed once"""
+        return route[:-1] if len(route) > 1 and route[0] == route[-1] else route
+
+    def _cost(self, route):
+        """Walking plus dwell time of a route, in seconds"""
+        return float(self._travel[route[:-1], route[1:]].sum() + self._dwell[self._unique(route)].sum())
+
+    def _nearest_neighbour(self, start, pending, end):
+        """Greedy route that always walks to the closest unvisited stop"""
+        route = [start]
+        remaining = np.array(pending, dtype=int)
+        while len(remaining):
+            nearest = int(np.argmin(self._travel[route[-1], remaining]))
+            route.append(int(remaining[nearest]))
+            remaining = np.delete(remaining, nearest)
+        route.append(end)
+        return np.array(route, dtype=int)
+
+    def _two_opt(self, route):
+        """Reverse route segments while that shortens the walk; endpoints stay fixed"""
+        route = route.copy()
+        travel = self._travel
+        last = len(route) - 1
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, last - 1):
+                a, b = route[i - 1], route[i]
+                candidates = np.arange(i + 1, last)
+                c, d = route[candidates], route[candidates + 1]
+                # Gain of reversing route[i..j] for every j at once
+                deltas = travel[a, c] + travel[b, d] - travel[a, b] - travel[c, d]
+                best = int(np.argmin(deltas))
+                if deltas[best] < -_EPSILON:
+                    j = int(candidates[best])
+                    route[i:j + 1] = route[i:j + 1][::-1]
+                    improved = True
+        return route
+
+    def _drop_one(self, route):
+        """Remove the intermediate stop whose removal saves the most time"""
+        previous, current, following = route[:-2], route[1:-1], route[2:]
+        savings = (
+            self._dwell[current]
+            + self._travel[previous, current]
+            + self._travel[current, following]
+            - self._travel[previous, following]
+        )
+        index = int(np.argmax(savings)) + 1
+        return np.delete(route, index), int(route[index])
+
+    def _cheapest_insertion(self, route, position):
+        """Insert a stop where it adds the least walking time"""
+        previous, following = route[:-1], route[1:]
+        added = self._travel[previous, position] + self._travel[position, following] - self._travel[previous, following]
+        return np.insert(route, int(np.argmin(added)) + 1, position)
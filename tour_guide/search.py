@@ -0,0 +1,158 @@
+"""
+Ranked retrieval over location content
+A BM25 index built once over the descriptive text of every stop, so the
+chatbot can answer free-form questions from content the guide already has.
+Postings are stored CSR-style in flat arrays rather than per-term lists to
+keep the index compact as the number of sites grows; a shared store can
+hand those arrays out without copying.
+"""
+
+import heapq
+import math
+import re
+from array import array
+from collections import Counter, namedtuple
+
+# Location fields that are searched, in the order passages are generated
+PROSE_FIELDS = ("description", "historical_significance")
+LIST_FIELDS = ("architectural_features", "visitor_tips")
+
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do
+does for from had has have how i if in into is it its me my of on or our she
+he should so than that the their them there these they this those to was we
+were what when where which who whom why will with would you your
+""".split())
+
+# Letters and digits of any script; Indic vowel signs and viramas are not
+# word characters to re, so the Devanagari-Sinhala blocks are added whole
+# (minus the danda punctuation)
+TOKEN_RE = re.compile(r"(?:[^\W_]|[\u0900-\u0963\u0966-\u0dff])+")
+SENTENCE_RE = re.compile(r"(?<=[.!?\u0964])\s+(?=[A-Z0-9'\"\u0900-\u0dff])")
+
+Passage = namedtuple("Passage", ["location_key", "field", "text"])
+SearchResult = namedtuple("SearchResult", ["passage", "score", "passage_id"])
+
+# Flat arrays of a SearchIndex and their typecodes, as saved to a shared store
+_INDEX_ARRAYS = (
+    ("doc_lengths", "I"), ("offsets", "I"), ("doc_ids", "I"), ("term_frequencies", "H"),
+    ("idf", "d"), ("_norms", "d"),
+)
+
+
+def tokenize(text):
+    """Lowercase text and split it into index terms"""
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        # Cheap plural folding so "tickets" finds "ticket" and "domes" finds "dome"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def build_passages(locations):
+    """Split every location's searchable fields into sentence or item passages"""
+    passages = []
+    for location_key, location in locations.items():
+        for field in PROSE_FIELDS:
+            for sentence in SENTENCE_RE.split(getattr(location, field)):
+                if sentence.strip():
+                    passages.append(Passage(location_key, field, sentence.strip()))
+        for field in LIST_FIELDS:
+            for item in getattr(location, field):
+                passages.append(Passage(location_key, field, item))
+    return passages
+
+
+class SearchIndex:
+    """Okapi BM25 index over a fixed list of passages"""
+
+    def __init__(self, passages, k1=1.2, b=0.75):
+        self.passages = list(passages)
+        self.k1 = k1
+        self.b = b
+
+        doc_terms = [Counter(tokenize(passage.text)) for passage in self.passages]
+        self.doc_lengths = array("I", (sum(terms.values()) for terms in doc_terms))
+        self.avg_doc_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.passages else 0.0
+
+        postings = {}
+        for doc_id, terms in enumerate(doc_terms):
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append((doc_id, frequency))
+
+        # term -> id, then postings for term id t live in
+        # doc_ids[offsets[t]:offsets[t + 1]] with matching term_frequencies
+        self.vocabulary = {}
+        self.offsets = array("I", [0])
+        self.doc_ids = array("I")
+        self.term_frequencies = array("H")
+        self.idf = array("d")
+        total_docs = len(self.passages)
+        for term_id, (term, entries) in enumerate(sorted(postings.items())):
+            self.vocabulary[term] = term_id
+            for doc_id, frequency in entries:
+                self.doc_ids.append(doc_id)
+                self.term_frequencies.append(min(frequency, 0xFFFF))
+            self.offsets.append(len(self.doc_ids))
+            doc_frequency = len(entries)
+            self.idf.append(math.log(1 + (total_docs - doc_frequency + 0.5) / (doc_frequency + 0.5)))
+
+        # Per-document length normalisation, precomputed once
+        self._norms = array("d", (
+            k1 * (1 - b + b * length / self.avg_doc_length) if self.avg_doc_length else k1
+            for length in self.doc_lengths
+        ))
+
+    def __len__(self):
+        return len(self.passages)
+
+    def search(self, query, limit=3, min_score=0.0):
+        """Return up to limit SearchResults for query, best first"""
+        scores = {}
+        k1_plus_one = self.k1 + 1
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            idf = self.idf[term_id]
+            for position in range(self.offsets[term_id], self.offsets[term_id + 1]):
+                doc_id = self.doc_ids[position]
+                frequency = self.term_frequencies[position]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * k1_plus_one / (frequency + self._norms[doc_id])
+
+        # Ties are broken by passage order so results are deterministic
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [SearchResult(self.passages[doc_id], score, doc_id) for doc_id, score in best if score > min_score]
+
+
+def save_search_index(writer, prefix, index):
+    """Add a SearchIndex to a shared StoreWriter under prefix"""
+    writer.add_json(f"{prefix}/meta", {"k1": index.k1, "b": index.b, "avg_doc_length": index.avg_doc_length})
+    writer.add_json(f"{prefix}/passages", [list(passage) for passage in index.passages])
+    # Terms in id order
+    writer.add_json(f"{prefix}/vocabulary", sorted(index.vocabulary, key=index.vocabulary.get))
+    for name, _ in _INDEX_ARRAYS:
+        writer.add_bytes(f"{prefix}/{name}", getattr(index, name).tobytes())
+
+
+def load_search_index(store, prefix):
+    """Return the SearchIndex saved under prefix in a SharedStore, or None; the arrays are not copied"""
+    meta = store.get_json(f"{prefix}/meta")
+    if meta is None:
+        return None
+    index = SearchIndex.__new__(SearchIndex)
+    index.k1, index.b, index.avg_doc_length = meta["k1"], meta["b"], meta["avg_doc_length"]
+    index.passages = [Passage(*passage) for passage in store.get_json(f"{prefix}/passages")]
+    index.vocabulary = {term: term_id for term_id, term in enumerate(store.get_json(f"{prefix}/vocabulary"))}
+    for name, typecode in _INDEX_ARRAYS:
+        setattr(index, name, store.get_bytes(f"{prefix}/{name}").cast(typecode))
+    return index
+
+
+def build_location_index(locations):
+    """Build a SearchIndex over all searchable location text"""
+    return SearchIndex(build_passages(locations))
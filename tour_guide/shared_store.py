@@ -0,0 +1,161 @@
+"""
+Shared read-only store
+One file of pre-built blobs (rendered HTML, JSON, NumPy arrays) that every
+worker process maps into memory read-only, so N workers share one copy in
+the page cache instead of each building and holding its own. Arrays come
+back as NumPy views on the mapping (no copy); text is decoded on demand.
+
+The file is built once by the cluster launcher (tour_guide/cluster.py) and
+never changes while workers run. TOUR_GUIDE_SHARED_STORE names it; workers
+attach at startup and fall back to building things themselves for keys the
+store does not have. Keys include the site bundle's version, so content
+reloaded after the store was built is never served from it.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+SHARED_STORE_ENV = "TOUR_GUIDE_SHARED_STORE"
+
+_MAGIC = b"TGSTORE1"
+_HEADER = struct.Struct("<8sQ")
+# Arrays start on cache-line boundaries so views are aligned for any dtype
+_ALIGNMENT = 64
+
+# The store this process attached to, if any
+_attached = None
+
+
+def map_key(site, tour_locations, location_key):
+    """Key of the rendered map HTML for a stop of a tour, in one version of a site bundle"""
+    return f"map/{site.key}/{site.language}/{site.version}/{','.join(tour_locations)}/{location_key}"
+
+
+def panel_key(site, location_key, next_location_key, is_photo_tour):
+    """Key of the rendered details panel for a stop, in one version of a site bundle"""
+    return (f"panel/{site.key}/{site.language}/{site.version}/"
+            f"{location_key}/{next_location_key or ''}/{int(bool(is_photo_tour))}")
+
+
+class StoreWriter:
+    """Collects blobs and writes them as one store file"""
+
+    def __init__(self):
+        self._blobs = {}
+
+    def __len__(self):
+        return len(self._blobs)
+
+    def add_bytes(self, key, data):
+        self._blobs[key] = ("bytes", bytes(data), None, None)
+
+    def add_text(self, key, text):
+        self._blobs[key] = ("text", text.encode("utf-8"), None, None)
+
+    def add_json(self, key, value):
+        self._blobs[key] = ("json", json.dumps(value, ensure_ascii=False).encode("utf-8"), None, None)
+
+    def add_array(self, key, array):
+        array = np.ascontiguousarray(array)
+        self._blobs[key] = ("array", array.tobytes(), array.dtype.str, list(array.shape))
+
+    def write(self, path, meta=None):
+        """Write the store atomically; returns its size in bytes"""
+        # Offsets are relative to the first blob, which follows the header and index
+        entries = {}
+        offset = 0
+        for key, (kind, data, dtype, shape) in self._blobs.items():
+            offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+            entries[key] = [kind, offset, len(data), dtype, shape]
+            offset += len(data)
+        index = json.dumps({"meta": meta or {}, "entries": entries}, ensure_ascii=False).encode("utf-8")
+        data_start = -(-(_HEADER.size + len(index)) // _ALIGNMENT) * _ALIGNMENT
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as store_file:
+            store_file.write(_HEADER.pack(_MAGIC, len(index)))
+            store_file.write(index)
+            for key, (_, data, _, _) in self._blobs.items():
+                store_file.seek(data_start + entries[key][1])
+                store_file.write(data)
+            size = store_file.tell()
+        os.replace(temporary, path)
+        return size
+
+
+class SharedStore:
+    """Read-only, memory-mapped view of a store file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as store_file:
+            self._map = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a shared store file")
+        index = json.loads(self._map[_HEADER.size:_HEADER.size + index_length])
+        self.meta = index["meta"]
+        self._entries = index["entries"]
+        self._data_start = -(-(_HEADER.size + index_length) // _ALIGNMENT) * _ALIGNMENT
+        self._view = memoryview(self._map)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _slice(self, entry):
+        start = self._data_start + entry[1]
+        return self._view[start:start + entry[2]]
+
+    def get_bytes(self, key):
+        """Return a blob as a zero-copy memoryview, or None"""
+        entry = self._entries.get(key)
+        return None if entry is None else self._slice(entry)
+
+    def get_text(self, key):
+        """Return a text blob, or None"""
+        entry = self._entries.get(key)
+        return None if entry is None else str(self._slice(entry), "utf-8")
+
+    def get_json(self, key):
+        """Return a decoded JSON blob, or None"""
+        entry = self._entries.get(key)
+        return None if entry is None else json.loads(str(self._slice(entry), "utf-8"))
+
+    def get_array(self, key):
+        """Return an array as a read-only NumPy view on the mapping, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        _, _, _, dtype, shape = entry
+        return np.frombuffer(self._slice(entry), dtype=np.dtype(dtype)).reshape(shape)
+
+
+def attach_store(store):
+    """Make store the one this process reads pre-built content from"""
+    global _attached
+    _attached = store
+
+
+def attached_store():
+    """Return the store this process attached to, or None"""
+    return _attached
+
+
+def shared_store_from_env():
+    """Open and attach the store named by TOUR_GUIDE_SHARED_STORE, or return None if unset"""
+    path = os.environ.get(SHARED_STORE_ENV)
+    if not path:
+        return None
+    store = SharedStore(path)
+    attach_store(store)
+    return store
@@ -0,0 +1,137 @@
+"""
+Site registry
+Loads a site's content only when a session first asks for it and keeps the
+most recently used sites in memory, evicting cold ones. Each language of a
+site is its own bundle, cached under (site key, language), so only the
+languages sessions actually use are loaded and every session shares them.
+Derived structures (keyword matcher, search index, rendered panels) hang
+off the SiteContent object, so they are built per language and evicted
+with it.
+
+A bundle is never changed in place: reload() builds a new snapshot and swaps
+it in, and the one it replaces lives on only while something still holds it
+(see tour_guide/reload.py).
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+from tour_guide.content import DATA_DIR, DEFAULT_LANGUAGE, ContentError, load_site, load_site_index, site_languages
+
+DEFAULT_CAPACITY = 8
+
+
+class SiteRegistry:
+    """Thread-safe LRU cache of loaded sites"""
+
+    def __init__(self, data_dir=DATA_DIR, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.data_dir = data_dir
+        self.capacity = capacity
+        self._sites = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per site being loaded, so two sessions asking for the same
+        # cold site parse it once while other sites stay available
+        self._loading = {}
+        self._index = None
+        self._languages = {}
+        # Weak references to snapshots replaced by reload()
+        self._retired = []
+
+    def available(self):
+        """Return a {site key: site name} mapping of every known site"""
+        if self._index is None:
+            self._index = load_site_index(self.data_dir)
+        return self._index
+
+    def languages(self, site_key):
+        """Return the language codes site_key is available in, the default first"""
+        languages = self._languages.get(site_key)
+        if languages is None:
+            languages = self._languages[site_key] = site_languages(site_key, self.data_dir)
+        return languages
+
+    def loaded(self):
+        """Return the (site key, language) bundles currently in memory, coldest first"""
+        with self._lock:
+            return list(self._sites)
+
+    def get(self, site_key, language=DEFAULT_LANGUAGE):
+        """Return the SiteContent for site_key in language, loading it on first use"""
+        bundle = (site_key, language)
+        with self._lock:
+            site = self._sites.get(bundle)
+            if site is not None:
+                self._sites.move_to_end(bundle)
+                return site
+            load_lock = self._loading.setdefault(bundle, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                site = self._sites.get(bundle)
+                if site is not None:
+                    self._sites.move_to_end(bundle)
+                    return site
+            try:
+                if site_key not in self.available():
+                    raise ContentError(f"unknown site '{site_key}'")
+                if language not in self.languages(site_key):
+                    raise ContentError(f"site '{site_key}' has no '{language}' translation")
+                site = load_site(site_key, self.data_dir, language)
+                with self._lock:
+                    self._sites[bundle] = site
+                    while len(self._sites) > self.capacity:
+                        self._sites.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._loading.pop(bundle, None)
+            return site
+
+    def peek(self, site_key, language=DEFAULT_LANGUAGE):
+        """Return the bundle if it is in memory, without loading it or marking it used"""
+        with self._lock:
+            return self._sites.get((site_key, language))
+
+    def reload(self, site_key, language=DEFAULT_LANGUAGE, warm=None):
+        """Load a new snapshot of a bundle, warm(site) it, then swap it in; returns it
+
+        Callers already holding the previous snapshot keep using it.
+        """
+        site = load_site(site_key, self.data_dir, language)
+        if warm is not None:
+            warm(site)
+        bundle = (site_key, language)
+        with self._lock:
+            previous = self._sites.get(bundle)
+            self._sites[bundle] = site
+            if previous is not None:
+                self._retired.append(weakref.ref(previous))
+            while len(self._sites) > self.capacity:
+                self._sites.popitem(last=False)
+        return site
+
+    def retired(self):
+        """Return how many replaced snapshots are still alive (held by running scripts or jobs)"""
+        with self._lock:
+            self._retired = [reference for reference in self._retired if reference() is not None]
+            return len(self._retired)
+
+    def refresh_index(self):
+        """Forget the site index and language lists, so added sites and translations are found"""
+        self._index = None
+        self._languages = {}
+
+    def evict(self, site_key, language=None):
+        """Drop a site (one language, or all of them) from memory; it is reloaded on next use"""
+        with self._lock:
+            for bundle in list(self._sites):
+                if bundle[0] == site_key and language in (None, bundle[1]):
+                    del self._sites[bundle]
+
+    def clear(self):
+        """Drop every loaded site"""
+        with self._lock:
+            self._sites.clear()
+            self._languages.clear()
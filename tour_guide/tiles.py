@@ -0,0 +1,274 @@
+"""
+Offline map tiles
+An MBTiles (SQLite) tile store covering the area around a site's stops,
+filled by importing a z/x/y directory of tiles or fetching them once from a
+tile server, and a small HTTP endpoint that serves the stored tiles with
+long-lived caching headers. Point the map at it with TOUR_GUIDE_TILES (an
+.mbtiles file served in-process) and/or TOUR_GUIDE_TILE_URL (the URL
+browsers fetch tiles from).
+
+tools/tile_cache.py builds, inspects and serves tile stores.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TILES_ENV = "TOUR_GUIDE_TILES"
+TILE_URL_ENV = "TOUR_GUIDE_TILE_URL"
+TILE_PORT_ENV = "TOUR_GUIDE_TILE_PORT"
+TILE_HOST_ENV = "TOUR_GUIDE_TILE_HOST"
+
+DEFAULT_ZOOMS = range(15, 20)
+DEFAULT_MARGIN_M = 300
+DEFAULT_TILE_PORT = 8766
+# Only browsers on this machine can load tiles unless TOUR_GUIDE_TILE_HOST opens it up
+DEFAULT_TILE_HOST = "127.0.0.1"
+TILE_PATH_TEMPLATE = "/tiles/{z}/{x}/{y}.png"
+TILE_ATTRIBUTION = '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+# Tiles for a fixed area never change once stored
+TILE_CACHE_SECONDS = 30 * 24 * 3600
+
+OSM_TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+FETCH_USER_AGENT = "smart-tourist-assistant-tile-cache/1.0"
+FETCH_TIMEOUT = 10
+# OSM's tile usage policy asks bulk downloaders to go slowly
+FETCH_DELAY = 0.1
+
+_METERS_PER_DEGREE_LAT = 111320.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+);
+"""
+
+
+def tile_for(lat, lon, zoom):
+    """Return the (x, y) XYZ tile containing a point"""
+    scale = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * scale)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * scale)
+    return min(max(x, 0), scale - 1), min(max(y, 0), scale - 1)
+
+
+def site_bounds(site, margin_m=DEFAULT_MARGIN_M):
+    """Return (south, west, north, east) around a site's stops, padded by margin_m"""
+    lats = [location.coordinates[0] for location in site.locations.values()]
+    lons = [location.coordinates[1] for location in site.locations.values()]
+    lat_margin = margin_m / _METERS_PER_DEGREE_LAT
+    lon_margin = margin_m / (_METERS_PER_DEGREE_LAT * math.cos(math.radians(sum(lats) / len(lats))))
+    return min(lats) - lat_margin, min(lons) - lon_margin, max(lats) + lat_margin, max(lons) + lon_margin
+
+
+def tiles_in_bounds(bounds, zooms=DEFAULT_ZOOMS):
+    """Yield every (z, x, y) tile covering bounds at each zoom"""
+    south, west, north, east = bounds
+    for zoom in zooms:
+        min_x, min_y = tile_for(north, west, zoom)
+        max_x, max_y = tile_for(south, east, zoom)
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                yield zoom, x, y
+
+
+class TileStore:
+    """Read/write access to an MBTiles file, shareable between threads"""
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    # MBTiles rows count from the bottom (TMS); XYZ rows count from the top
+    @staticmethod
+    def _tms_row(zoom, y):
+        return (2 ** zoom) - 1 - y
+
+    def get(self, zoom, x, y):
+        """Return a tile's image bytes, or None if it is not stored"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (zoom, x, self._tms_row(zoom, y)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def has(self, zoom, x, y):
+        """Whether a tile is stored"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (zoom, x, self._tms_row(zoom, y)),
+            ).fetchone() is not None
+
+    def put_many(self, tiles):
+        """Store (z, x, y, image bytes) tuples in one transaction"""
+        rows = [(zoom, x, self._tms_row(zoom, y), sqlite3.Binary(data)) for zoom, x, y, data in tiles]
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def set_metadata(self, **values):
+        """Write MBTiles metadata entries"""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?)", [(name, str(value)) for name, value in values.items()]
+            )
+
+    def metadata(self):
+        """Return the metadata table as a dict"""
+        with self._lock:
+            return dict(self._connection.execute("SELECT name, value FROM metadata").fetchall())
+
+    def counts(self):
+        """Return {zoom: number of stored tiles}"""
+        with self._lock:
+            return dict(self._connection.execute(
+                "SELECT zoom_level, COUNT(*) FROM tiles GROUP BY zoom_level ORDER BY zoom_level"
+            ).fetchall())
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def describe_area(store, name, bounds, zooms):
+    """Record the MBTiles metadata for a tile area"""
+    south, west, north, east = bounds
+    store.set_metadata(
+        name=name,
+        format="png",
+        type="baselayer",
+        bounds=f"{west},{south},{east},{north}",
+        minzoom=min(zooms),
+        maxzoom=max(zooms),
+        attribution=TILE_ATTRIBUTION,
+    )
+
+
+def import_directory(store, root, bounds=None, zooms=DEFAULT_ZOOMS):
+    """Copy z/x/y.png tiles from a directory into the store, optionally only those in bounds"""
+    if bounds is not None:
+        wanted = tiles_in_bounds(bounds, zooms)
+    else:
+        wanted = (
+            (int(zoom), int(x), int(os.path.splitext(name)[0]))
+            for zoom in os.listdir(root) if zoom.isdigit()
+            for x in os.listdir(os.path.join(root, zoom)) if x.isdigit()
+            for name in os.listdir(os.path.join(root, zoom, x)) if name.endswith(".png")
+        )
+    batch = []
+    for zoom, x, y in wanted:
+        path = os.path.join(root, str(zoom), str(x), f"{y}.png")
+        if os.path.exists(path):
+            with open(path, "rb") as tile_file:
+                batch.append((zoom, x, y, tile_file.read()))
+    return store.put_many(batch)
+
+
+def fetch_tiles(store, bounds, zooms=DEFAULT_ZOOMS, url_template=OSM_TILE_URL, delay=FETCH_DELAY, progress=None):
+    """Download the tiles in bounds that the store does not have yet; returns the number fetched"""
+    fetched = 0
+    for zoom, x, y in tiles_in_bounds(bounds, zooms):
+        if store.has(zoom, x, y):
+            continue
+        request = urllib.request.Request(url_template.format(z=zoom, x=x, y=y), headers={"User-Agent": FETCH_USER_AGENT})
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            store.put_many([(zoom, x, y, response.read())])
+        fetched += 1
+        if progress is not None:
+            progress(zoom, x, y)
+        time.sleep(delay)
+    return fetched
+
+
+class TileServer:
+    """Serves a TileStore at /tiles/{z}/{x}/{y}.png on a daemon thread"""
+
+    def __init__(self, store, host=DEFAULT_TILE_HOST, port=DEFAULT_TILE_PORT):
+        self.store = store
+        handler = self._make_handler(store)
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="tile-server", daemon=True)
+
+    @staticmethod
+    def _make_handler(store):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.split("?", 1)[0].strip("/").split("/")
+                if len(parts) != 4 or parts[0] != "tiles" or not parts[3].endswith(".png"):
+                    self.send_error(404)
+                    return
+                try:
+                    zoom, x, y = int(parts[1]), int(parts[2]), int(parts[3][:-4])
+                except ValueError:
+                    self.send_error(404)
+                    return
+                data = store.get(zoom, x, y)
+                if data is None:
+                    self.send_error(404)
+                    return
+                etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Cache-Control", f"public, max-age={TILE_CACHE_SECONDS}, immutable")
+                self.send_header("ETag", etag)
+                # The map is embedded in an iframe on the Streamlit origin
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url_template(self):
+        """Tile URL template for this server on localhost"""
+        return f"http://localhost:{self.port}{TILE_PATH_TEMPLATE}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def tile_layer_from_env():
+    """Return (tiles URL template, attribution) for the map, or None to use OpenStreetMap
+
+    TOUR_GUIDE_TILES starts a TileServer for that file on TOUR_GUIDE_TILE_PORT,
+    listening on TOUR_GUIDE_TILE_HOST (localhost by default).
+    TOUR_GUIDE_TILE_URL sets the URL browsers load tiles from; it is needed
+    when they cannot reach this machine as localhost, or to use another server.
+    """
+    url = os.environ.get(TILE_URL_ENV)
+    path = os.environ.get(TILES_ENV)
+    if path:
+        port = int(os.environ.get(TILE_PORT_ENV, DEFAULT_TILE_PORT))
+        host = os.environ.get(TILE_HOST_ENV, DEFAULT_TILE_HOST)
+        server = TileServer(TileStore(path), host=host, port=port).start()
+        url = url or server.url_template
+    if url:
+        return url, TILE_ATTRIBUTION
+    return None